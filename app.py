@@ -1,25 +1,72 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
 from flask_wtf.csrf import CSRFProtect
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import os
+import time
 import uuid
+import json
 import logging
 from werkzeug.utils import secure_filename
 from flask_login import LoginManager, login_user, logout_user, current_user, login_required
-from models import db, User, Laptop, Favorite
+from models import db, User, Laptop, Favorite, LaptopScore
+import db_profile
 from forms import LaptopForm, UserForm, LoginForm, RegisterForm, ImageUploadForm, SearchForm
-from utils import save_uploaded_image, validate_price_range, sanitize_search_query, format_price, calculate_performance_score
+from utils import save_uploaded_image, validate_price_range, sanitize_search_query, format_price
 from config import Config
 from PIL import Image
 import io
 import anthropic
-from chatbot_service import ChatbotService
+from chatbot_service import ChatbotService, ChatTurn
+from upstream_gate import UpstreamBusy
+from response_cache import response_cache
+from conversation_store import conversation_store
+from chat_analytics import chat_analytics, chat_event
+from catalog_snapshot import catalog_store
+from catalog_sync import catalog_sync
+import search_index
+from suggest_index import suggest_index
+from facets import facet_index
+from retrieval_index import retrieval_index
+from laptop_summaries import summary_store
+from keyset import keyset_paginate, count_cache, InvalidCursor, KeysetPage
+from catalog_version import catalog_version, conditional_get
+import recommendation
+from recommendation import RECOMMEND_CRITERIA
+from comparison import build_comparison
 
 def create_app():
     app = Flask(__name__, static_folder='static', static_url_path='/static')
     app.config.from_object(Config)
+    # WAL + pragma, pool đọc riêng và một writer (engine options phải có trước db.init_app)
+    db_profile.configure(app)
     db.init_app(app)
+    db_profile.init_app(app)
+    
+    # Nhật ký catalog_changes: đồng bộ cache trong process giữa các worker
+    # (trước catalog_store: phiên bản snapshot là MAX(catalog_changes.id))
+    catalog_sync.init_app(app)
+    
+    # Snapshot catalog trong bộ nhớ cho các API đọc
+    catalog_store.init_app(app)
+    
+    # Chỉ mục full-text FTS5 (tạo cho database cũ nếu chưa có)
+    search_index.init_app(app)
+    
+    # Chỉ mục prefix cho autocomplete (sau catalog_store)
+    suggest_index.init_app(app)
+    
+    # Bitmap facet cho bộ lọc (sau catalog_store)
+    facet_index.init_app(app)
+    
+    # Chỉ mục vector n-gram cho chatbot (sau catalog_store)
+    retrieval_index.init_app(app)
+    
+    # Điểm gợi ý tính sẵn cho /recommend
+    recommendation.init_app(app)
+    
+    # Tóm tắt laptop tạo sẵn cho prompt chatbot (python manage_data.py summaries)
+    summary_store.init_app(app)
     
     # Cấu hình logging
     logging.basicConfig(level=logging.INFO)
@@ -34,6 +81,9 @@ def create_app():
         key_func=get_remote_address,
         default_limits=["200 per day", "50 per hour"]
     )
+    # Route đã decorate chỉ giữ weakref tới limiter; khi RATELIMIT_ENABLED=False Flask-Limiter
+    # cũng không lưu instance vào app, nên phải giữ tham chiếu ở đây
+    app.extensions['rate_limiter'] = limiter
 
     login_manager = LoginManager(app)
     login_manager.login_view = "login"
@@ -61,8 +111,8 @@ def create_app():
 
     @app.route("/")
     def index():
-        brands = db.session.query(Laptop.brand).distinct().all()
-        return render_template("index.html", brands=[b[0] for b in brands])
+        return render_template("index.html", brands=catalog_store.get().brands,
+                             catalog_version=catalog_version.token)
 
     @app.route("/laptops")
     def laptops():
@@ -74,6 +124,7 @@ def create_app():
         category = request.args.get("category")
         search = sanitize_search_query(request.args.get("q", ""))
         page = request.args.get("page", 1, type=int)
+        cursor = request.args.get("cursor")  # chế độ keyset (opt-in)
         
         # Validate price range
         if not validate_price_range(price_min, price_max):
@@ -82,7 +133,7 @@ def create_app():
             price_max = None
         
         # Sử dụng method tối ưu hóa
-        laptops_pagination = Laptop.get_filtered_laptops(
+        filters = dict(
             brand=brand,
             price_min=price_min,
             price_max=price_max,
@@ -92,12 +143,27 @@ def create_app():
             page=page,
             per_page=20
         )
+        try:
+            laptops_pagination = Laptop.get_filtered_laptops(cursor=cursor, **filters)
+        except InvalidCursor:
+            flash("Liên kết phân trang không hợp lệ, đã quay về trang đầu", "warning")
+            laptops_pagination = Laptop.get_filtered_laptops(cursor='', **filters)
         
-        brands = db.session.query(Laptop.brand).distinct().all()
+        # Số laptop theo thương hiệu dưới các filter còn lại (bitmap, cache theo phiên bản catalog)
+        facet_counts = facet_index.counts(
+            brand=brand, category=category, price_min=price_min, price_max=price_max,
+            ram_min=ram_gb, search=search
+        )
+        # Tham số lọc giữ nguyên trên link phân trang
+        page_args = {k: v for k, v in request.args.items() if k not in ('page', 'cursor')}
         return render_template("laptops.html", 
                              items=laptops_pagination.items, 
                              pagination=laptops_pagination,
-                             brands=[b[0] for b in brands])
+                             cursor_mode=isinstance(laptops_pagination, KeysetPage),
+                             page_args=page_args,
+                             highlights=laptops_pagination.highlights,
+                             brands=catalog_store.get().brands,
+                             brand_counts=facet_counts['facets']['brand'])
 
     @app.route("/laptop/<int:laptop_id>")
     def laptop_detail(laptop_id):
@@ -116,92 +182,38 @@ def create_app():
     @app.route("/compare")
     def compare():
         ids = request.args.getlist("id", type=int)
-        items = Laptop.query.filter(Laptop.id.in_(ids)).all() if ids else []
+        comparison = build_comparison(ids)
+        items = comparison['items']
         
         # Tính toán thống kê so sánh
         if len(items) >= 2:
-            # Tìm laptop có hiệu năng tốt nhất
-            best_performance = max(items, key=lambda x: calculate_performance_score(x))
-            
-            # Tìm laptop có giá trị tốt nhất
-            best_value = min(items, key=lambda x: x.price)
-            
-            # Tìm laptop có giá cao nhất và thấp nhất
-            price_range = {
-                'min': min(items, key=lambda x: x.price),
-                'max': max(items, key=lambda x: x.price)
-            }
-            
-            # Phân tích theo nhu cầu
-            category_analysis = {}
-            for item in items:
-                if item.category not in category_analysis:
-                    category_analysis[item.category] = []
-                category_analysis[item.category].append(item)
-            
-            # Nhận xét theo tiêu chí
-            # Điểm hiệu năng tổng hợp dùng calculate_performance_score (đã có)
-            # Tỷ lệ giá/hiệu năng: price_performance = price / (score + 1) để tránh chia 0
-            scored = [(it, calculate_performance_score(it)) for it in items]
-            best_price_performance = min(scored, key=lambda t: (t[0].price / (t[1] + 1)))[0]
-            
             return render_template("compare.html", 
                                  items=items, 
-                                 best_performance=best_performance,
-                                 best_value=best_value,
-                                 price_range=price_range,
-                                 category_analysis=category_analysis,
-                                 best_price_performance=best_price_performance)
+                                 best_performance=comparison['best_performance'],
+                                 best_value=comparison['best_value'],
+                                 price_range=comparison['price_range'],
+                                 category_analysis=comparison['category_analysis'],
+                                 best_price_performance=comparison['best_price_performance'],
+                                 series=comparison['series'])
         
-        return render_template("compare.html", items=items)
+        return render_template("compare.html", items=items, series=comparison['series'])
 
     @app.route("/api/compare_data")
+    @conditional_get(max_age=3600)
     def api_compare_data():
-        """API để lấy dữ liệu so sánh theo mode"""
-        laptop_ids = request.args.getlist('id')
+        """API để lấy dữ liệu so sánh (cả hai chế độ cắm sạc và dùng pin)"""
+        laptop_ids = request.args.getlist('id', type=int)
         mode = request.args.get('mode', 'plugged')  # plugged hoặc battery
+        if mode not in ('plugged', 'battery'):
+            mode = 'plugged'
         
-        items = []
-        for laptop_id in laptop_ids:
-            laptop = Laptop.query.get(laptop_id)
-            if laptop:
-                items.append(laptop)
-        
-        # Chuẩn bị dữ liệu theo mode
-        data = {
-            'cpu_single_core': [],
-            'cpu_multi_core': [],
-            'gpu_score': []
-        }
-        
-        for laptop in items:
-            if mode == 'battery':
-                data['cpu_single_core'].append({
-                    'name': laptop.name,
-                    'score': laptop.cpu_single_core_battery or 0
-                })
-                data['cpu_multi_core'].append({
-                    'name': laptop.name,
-                    'score': laptop.cpu_multi_core_battery or 0
-                })
-                data['gpu_score'].append({
-                    'name': laptop.name,
-                    'score': laptop.gpu_score_battery or 0
-                })
-            else:  # plugged
-                data['cpu_single_core'].append({
-                    'name': laptop.name,
-                    'score': laptop.cpu_single_core_plugged or 0
-                })
-                data['cpu_multi_core'].append({
-                    'name': laptop.name,
-                    'score': laptop.cpu_multi_core_plugged or 0
-                })
-                data['gpu_score'].append({
-                    'name': laptop.name,
-                    'score': laptop.gpu_score_plugged or 0
-                })
+        comparison = build_comparison(laptop_ids)
+        series = comparison['series']
         
+        # Giữ các key cũ theo mode cho client cũ, kèm series của cả hai chế độ
+        data = dict(series[mode])
+        data.update(series)
+        data['performance_scores'] = comparison.get('performance_scores', {})
         return jsonify(data)
 
     # Admin routes
@@ -220,13 +232,23 @@ def create_app():
     @admin_required
     def admin_dashboard():
         """Trang dashboard admin"""
-        page = request.args.get('page', 1, type=int)
+        page = request.args.get('page', type=int)
+        # Mặc định phân trang keyset theo (price, id); ?page=N vẫn dùng OFFSET như cũ
+        cursor = request.args.get('cursor', '' if page is None else None)
         per_page = 20
         
         # Lấy danh sách laptop với phân trang
-        pagination = Laptop.query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        if cursor is not None:
+            # Keyset theo (price, id): không OFFSET, không COUNT mỗi trang
+            try:
+                pagination = keyset_paginate(Laptop.query, Laptop, cursor=cursor, per_page=per_page)
+            except InvalidCursor:
+                flash('Liên kết phân trang không hợp lệ, đã quay về trang đầu', 'warning')
+                pagination = keyset_paginate(Laptop.query, Laptop, per_page=per_page)
+        else:
+            pagination = Laptop.query.paginate(
+                page=page, per_page=per_page, error_out=False
+            )
         laptops = pagination.items
         
         # Thống kê
@@ -234,15 +256,16 @@ def create_app():
             'total_laptops': Laptop.query.count(),
             'total_users': User.query.count(),
             'total_favorites': Favorite.query.count(),
-            'total_brands': db.session.query(Laptop.brand).distinct().count()
+            'total_brands': len(catalog_store.get().brands)
         }
         
-        # Danh sách thương hiệu
-        brands = [brand[0] for brand in db.session.query(Laptop.brand).distinct().all()]
+        # Danh sách thương hiệu (từ snapshot, không cần query DISTINCT)
+        brands = catalog_store.get().brands
         
         return render_template('admin/dashboard.html', 
                              laptops=laptops, 
                              pagination=pagination,
+                             cursor_mode=cursor is not None,
                              stats=stats,
                              brands=brands)
 
@@ -379,39 +402,6 @@ def create_app():
         
         return redirect(url_for('admin_dashboard'))
 
-    def calculate_performance_score(laptop):
-        """Tính điểm hiệu năng cho laptop"""
-        score = 0
-        
-        # Điểm cho CPU
-        if 'H' in laptop.cpu or 'HX' in laptop.cpu or 'HK' in laptop.cpu:
-            score += 30
-        elif 'P' in laptop.cpu:
-            score += 20
-        else:
-            score += 10
-        
-        # Điểm cho RAM
-        if laptop.ram_gb >= 16:
-            score += 25
-        elif laptop.ram_gb >= 8:
-            score += 15
-        else:
-            score += 5
-        
-        # Điểm cho GPU
-        if laptop.gpu:
-            if 'rtx' in laptop.gpu.lower() or 'gtx' in laptop.gpu.lower():
-                score += 30
-            elif 'mx' in laptop.gpu.lower() or 'iris' in laptop.gpu.lower():
-                score += 15
-        
-        # Điểm cho storage
-        if 'ssd' in laptop.storage.lower():
-            score += 15
-        
-        return score
-
     @app.route("/register", methods=["GET","POST"])
     def register():
         # Use WTForms for validation and CSRF
@@ -554,75 +544,8 @@ def create_app():
         
         query = Laptop.query
         
-        # Định nghĩa tiêu chí cho từng loại nhu cầu
-        criteria = {
-            "gaming": {
-                "min_ram": 16,
-                "cpu_series": ["H", "HX", "HK"],  # CPU hiệu năng cao
-                "gpu_required": True,  # Yêu cầu GPU rời
-                "min_price": 15000000,  # Tối thiểu 15 triệu
-                "weight": {
-                    "gpu": 0.3,
-                    "cpu": 0.25,
-                    "ram": 0.2,
-                    "price": 0.15,
-                    "storage": 0.1
-                }
-            },
-            "design": {
-                "min_ram": 16,
-                "cpu_series": ["H", "HX", "HK", "P"],  # CPU hiệu năng cao hoặc P-series
-                "gpu_required": True,
-                "min_price": 20000000,  # Tối thiểu 20 triệu
-                "weight": {
-                    "gpu": 0.25,
-                    "cpu": 0.25,
-                    "ram": 0.2,
-                    "screen": 0.2,
-                    "price": 0.1
-                }
-            },
-            "dev": {
-                "min_ram": 16,
-                "cpu_series": ["H", "HX", "HK", "P", "U"],  # Linh hoạt hơn
-                "gpu_required": False,
-                "min_price": 12000000,  # Tối thiểu 12 triệu
-                "weight": {
-                    "cpu": 0.3,
-                    "ram": 0.25,
-                    "storage": 0.2,
-                    "price": 0.15,
-                    "gpu": 0.1
-                }
-            },
-            "student": {
-                "min_ram": 8,
-                "cpu_series": ["U", "P", "H"],  # Linh hoạt
-                "gpu_required": False,
-                "min_price": 8000000,  # Tối thiểu 8 triệu
-                "weight": {
-                    "price": 0.4,
-                    "cpu": 0.25,
-                    "ram": 0.2,
-                    "storage": 0.15
-                }
-            },
-            "office": {
-                "min_ram": 8,
-                "cpu_series": ["U", "P"],  # CPU tiết kiệm điện
-                "gpu_required": False,
-                "min_price": 6000000,  # Tối thiểu 6 triệu
-                "weight": {
-                    "price": 0.5,
-                    "cpu": 0.2,
-                    "ram": 0.2,
-                    "storage": 0.1
-                }
-            }
-        }
-        
-        if need and need in criteria:
-            crit = criteria[need]
+        if need and need in RECOMMEND_CRITERIA:
+            crit = RECOMMEND_CRITERIA[need]
             
             # Áp dụng các bộ lọc cơ bản
             if crit["min_ram"]:
@@ -641,20 +564,13 @@ def create_app():
             elif crit["min_price"]:
                 query = query.filter(Laptop.price >= crit["min_price"])
             
-            # Lấy tất cả laptop phù hợp
-            candidates = query.all()
-            
-            # Tính điểm cho từng laptop
-            scored_laptops = []
-            for laptop in candidates:
-                score = calculate_laptop_score(laptop, crit, priority)
-                scored_laptops.append((laptop, score))
-            
-            # Sắp xếp theo điểm số
-            scored_laptops.sort(key=lambda x: x[1], reverse=True)
-            
-            # Trả về top 10 laptop tốt nhất
-            items = [laptop for laptop, score in scored_laptops[:10]]
+            # Top 10 theo điểm đã tính sẵn khi ghi (priority chỉ nhân hệ số nên không đổi thứ tự);
+            # laptop insert ngoài ORM chưa có điểm thì xếp cuối tới khi chạy manage_data.py scores
+            score_column = getattr(LaptopScore, need)
+            items = (query.outerjoin(LaptopScore)
+                     .order_by(score_column.desc().nulls_last(), Laptop.id.asc())
+                     .limit(10)
+                     .all())
             
         else:
             # Nếu không có nhu cầu cụ thể, trả về tất cả laptop
@@ -672,24 +588,8 @@ def create_app():
         limit = max(1, min(raw_limit, 10))
         suggestions = []
         if len(q) >= 2:
-            like = f"%{q.lower()}%"
-            results = (Laptop.query
-                       .filter(db.or_(
-                           db.func.lower(Laptop.name).like(like),
-                           db.func.lower(Laptop.brand).like(like)
-                       ))
-                       .order_by(Laptop.price.asc())
-                       .limit(limit)
-                       .all())
-            for it in results:
-                suggestions.append({
-                    "id": it.id,
-                    "name": it.name,
-                    "brand": it.brand,
-                    "cpu": it.cpu,
-                    "image_url": it.image_url,
-                    "price": it.price
-                })
+            # Tra cứu chỉ mục prefix trong bộ nhớ (không query DB)
+            suggestions = suggest_index.suggest(q, limit=limit)
         return jsonify({"items": suggestions})
 
     @app.route("/api/products_legacy")
@@ -697,11 +597,21 @@ def create_app():
         """API cũ để lấy danh sách sản phẩm cho trang chủ (đã deprecated)"""
         page = request.args.get("page", 1, type=int)
         per_page = request.args.get("per_page", 9, type=int)
+        cursor = request.args.get("cursor")  # chế độ keyset (opt-in)
         
         # Lấy sản phẩm với phân trang
-        pagination = Laptop.query.order_by(Laptop.price.asc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        if cursor is not None:
+            try:
+                pagination = keyset_paginate(
+                    Laptop.query, Laptop, cursor=cursor, per_page=max(per_page, 1),
+                    total=count_cache.get('products_legacy', Laptop.query)
+                )
+            except InvalidCursor:
+                return jsonify({"error": "Cursor không hợp lệ"}), 400
+        else:
+            pagination = Laptop.query.order_by(Laptop.price.asc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
         
         products = []
         for laptop in pagination.items:
@@ -719,6 +629,16 @@ def create_app():
                 "image_url": laptop.image_url
             })
         
+        if cursor is not None:
+            return jsonify({
+                "products": products,
+                "has_next": pagination.has_next,
+                "has_prev": pagination.has_prev,
+                "next_cursor": pagination.next_cursor,
+                "prev_cursor": pagination.prev_cursor,
+                "total": pagination.total
+            })
+        
         return jsonify({
             "products": products,
             "has_next": pagination.has_next,
@@ -771,6 +691,7 @@ def create_app():
             }), 500
 
     @app.route("/api/products", methods=["GET", "POST"])
+    @conditional_get(max_age=3600)
     def api_products_crud():
         """API endpoint cho CRUD operations của sản phẩm"""
         if request.method == "GET":
@@ -782,51 +703,45 @@ def create_app():
             min_price = request.args.get("min_price", type=int)
             max_price = request.args.get("max_price", type=int)
             search = request.args.get("search")
+            cursor = request.args.get("cursor")  # chế độ keyset (opt-in), trang đầu: cursor=
             
-            query = Laptop.query
+            # Lọc và phân trang trên snapshot catalog (không query DB)
+            snapshot = catalog_store.get()
+            filters = dict(
+                brand=brand or None,
+                category=category or None,
+                price_min=min_price or None,
+                price_max=max_price or None,
+                per_page=per_page
+            )
+            if cursor is not None and not search:
+                # Keyset theo (price, id), trả về next_cursor/prev_cursor
+                try:
+                    keyset_page = snapshot.keyset(cursor=cursor, **filters)
+                except InvalidCursor:
+                    return jsonify({
+                        "success": False,
+                        "error": "Cursor không hợp lệ"
+                    }), 400
+                return jsonify({
+                    "success": True,
+                    "products": [laptop.to_dict() for laptop in keyset_page.items],
+                    "pagination": keyset_page.to_dict()
+                })
             
-            # Áp dụng filters
-            if brand:
-                query = query.filter(Laptop.brand == brand)
-            if category:
-                query = query.filter(Laptop.category == category)
-            if min_price:
-                query = query.filter(Laptop.price >= min_price)
-            if max_price:
-                query = query.filter(Laptop.price <= max_price)
+            filters["page"] = page
             if search:
-                like = f"%{search.lower()}%"
-                query = query.filter(db.func.lower(Laptop.name).like(like))
-            
-            # Phân trang
-            pagination = query.order_by(Laptop.price.asc()).paginate(
-                page=page, per_page=per_page, error_out=False
-            )
+                # Tìm full-text, xếp theo độ liên quan (BM25)
+                pagination = snapshot.search(search, **filters)
+            else:
+                pagination = snapshot.query(sort='price_asc', **filters)
             
             products = []
             for laptop in pagination.items:
-                products.append({
-                    "id": laptop.id,
-                    "name": laptop.name,
-                    "brand": laptop.brand,
-                    "cpu": laptop.cpu,
-                    "ram_gb": laptop.ram_gb,
-                    "gpu": laptop.gpu,
-                    "storage": laptop.storage,
-                    "screen": laptop.screen,
-                    "price": laptop.price,
-                    "category": laptop.category,
-                    "image_url": laptop.image_url,
-                    "battery_capacity": laptop.battery_capacity,
-                    "battery_life_office": laptop.battery_life_office,
-                    "battery_life_gaming": laptop.battery_life_gaming,
-                    "cpu_single_core_plugged": laptop.cpu_single_core_plugged,
-                    "cpu_multi_core_plugged": laptop.cpu_multi_core_plugged,
-                    "cpu_single_core_battery": laptop.cpu_single_core_battery,
-                    "cpu_multi_core_battery": laptop.cpu_multi_core_battery,
-                    "gpu_score_plugged": laptop.gpu_score_plugged,
-                    "gpu_score_battery": laptop.gpu_score_battery
-                })
+                product = laptop.to_dict()
+                if laptop.id in pagination.highlights:
+                    product["highlights"] = pagination.highlights[laptop.id]
+                products.append(product)
             
             return jsonify({
                 "success": True,
@@ -906,6 +821,7 @@ def create_app():
                 }), 500
 
     @app.route("/api/products/<int:product_id>", methods=["GET", "PUT", "DELETE"])
+    @conditional_get(max_age=3600)
     def api_product_detail(product_id):
         """API endpoint cho chi tiết sản phẩm"""
         laptop = Laptop.query.get_or_404(product_id)
@@ -1034,30 +950,99 @@ def create_app():
                 }), 500
 
     @app.route("/api/brands")
+    @conditional_get(max_age=3600)
     def api_brands():
-        """API endpoint để lấy danh sách thương hiệu"""
-        brands = [brand[0] for brand in db.session.query(Laptop.brand).distinct().all()]
+        """API endpoint để lấy danh sách thương hiệu (từ điển brand của snapshot)"""
         return jsonify({
             "success": True,
-            "brands": brands
+            "brands": catalog_store.get().brands
         })
 
     @app.route("/api/categories")
+    @conditional_get(max_age=3600)
     def api_categories():
-        """API endpoint để lấy danh sách danh mục"""
-        categories = [cat[0] for cat in db.session.query(Laptop.category).distinct().all()]
+        """API endpoint để lấy danh sách danh mục (từ điển category của snapshot)"""
         return jsonify({
             "success": True,
-            "categories": categories
+            "categories": catalog_store.get().categories
+        })
+
+    @app.route("/api/facets")
+    @conditional_get(max_age=3600)
+    def api_facets():
+        """API đếm số laptop theo brand, category, RAM, mức giá, pin dưới bộ filter hiện tại"""
+        price_min = request.args.get("price_min", type=int)
+        price_max = request.args.get("price_max", type=int)
+        if not validate_price_range(price_min, price_max):
+            return jsonify({
+                "success": False,
+                "error": "Giá tối thiểu không được lớn hơn giá tối đa"
+            }), 400
+        
+        result = facet_index.counts(
+            brand=request.args.get("brand"),
+            category=request.args.get("category"),
+            ram_tier=request.args.get("ram_tier"),
+            price_bucket=request.args.get("price_bucket"),
+            battery=request.args.get("battery"),
+            price_min=price_min,
+            price_max=price_max,
+            ram_min=request.args.get("ram_gb", type=int),
+            search=sanitize_search_query(request.args.get("q", ""))
+        )
+        return jsonify({
+            "success": True,
+            "total": result["total"],
+            "facets": result["facets"]
         })
 
     # ========== AI CHATBOT ENDPOINTS ==========
     
+    # Một ChatbotService cho cả worker: dùng lại client và connection pool giữa các request
+    # Cache câu trả lời cho câu hỏi đầu tiên (không có lịch sử), theo phiên bản catalog
+    response_cache.init_app(app)
+    chatbot = ChatbotService.from_config(app.config, response_cache=response_cache)
+    app.extensions['chatbot'] = chatbot
+    
+    # Lịch sử chat lưu phía server, cookie chỉ giữ id hội thoại
+    conversation_store.init_app(app)
+    
+    # Sự kiện analytics vào buffer trong bộ nhớ, thread nền ghi xuống DB theo lô
+    chat_analytics.init_app(app)
+    
+    def track_chat(endpoint, started, result=None, status=None):
+        """Ghi một sự kiện analytics cho lượt chat (không query DB)"""
+        chat_analytics.record(chat_event(endpoint, result or {}, (time.perf_counter() - started) * 1000, status))
+    
+    def chat_conversation_id():
+        """Id hội thoại trong session (tạo mới nếu chưa có)"""
+        # Cookie cũ còn giữ cả lịch sử: bỏ đi cho nhẹ
+        session.pop('chat_history', None)
+        session.pop('chat_stream_pending', None)
+        if 'chat_id' not in session:
+            session['chat_id'] = conversation_store.new_id()
+        return session['chat_id']
+    
+    def chat_busy(error):
+        """503 nhanh khi hàng đợi gọi model đã đầy, để không chiếm hết thread của worker"""
+        response = jsonify({
+            "success": False,
+            "error": "Trợ lý AI đang quá tải. Vui lòng thử lại sau ít giây."
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+    
+    def sse_event(event, data):
+        """Định dạng một sự kiện Server-Sent Events"""
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
     @app.route("/api/chat", methods=["POST"])
     @limiter.limit("10 per minute")
     @csrf.exempt
     def api_chat():
         """Enhanced AI chatbot with conversation memory and smart context"""
+        started = time.perf_counter()
         try:
             data = request.get_json()
             user_message = data.get('message', '').strip()
@@ -1068,30 +1053,17 @@ def create_app():
                     "error": "Tin nhắn không được để trống"
                 }), 400
             
-            # Initialize chatbot service
-            chatbot = ChatbotService(app.config['ANTHROPIC_API_KEY'])
-            
-            # Get conversation history from session
-            conversation_history = session.get('chat_history', [])
+            # Get conversation history from the server-side store
+            chat_id = chat_conversation_id()
+            conversation_history = conversation_store.load(chat_id)
             
             # Generate response with enhanced context
             result = chatbot.generate_response(user_message, conversation_history)
+            track_chat('chat', started, result)
             
             if result['success']:
                 # Update conversation history
-                conversation_history.append({"role": "user", "content": user_message})
-                conversation_history.append({"role": "assistant", "content": result['response']})
-                
-                # Keep only last 10 messages to prevent session bloat
-                if len(conversation_history) > 10:
-                    conversation_history = conversation_history[-10:]
-                
-                session['chat_history'] = conversation_history
-                
-                # Log analytics
-                app.logger.info(f"Chatbot Analytics - Intent: {result.get('intent', 'general')}, "
-                              f"Laptops found: {result.get('relevant_laptops_count', 0)}, "
-                              f"Message length: {len(user_message)}")
+                conversation_store.append_turn(chat_id, conversation_history, user_message, result['response'])
                 
                 # Validate laptops in response
                 if result.get('relevant_laptops'):
@@ -1104,7 +1076,12 @@ def create_app():
                     "response": result['response'],
                     "intent": result.get('intent', 'general'),
                     "relevant_laptops_count": result.get('relevant_laptops_count', 0),
-                    "model": result.get('model', 'claude-3-haiku')
+                    "model": result.get('model', 'claude-3-haiku'),
+                    "cached": result.get('cached', False),
+                    "fallback": result.get('fallback'),
+                    "route": result.get('route'),
+                    "prompt_tokens": result.get('prompt_tokens'),
+                    "timings": result.get('timings')
                 })
             else:
                 return jsonify({
@@ -1112,18 +1089,70 @@ def create_app():
                     "error": result.get('error', 'Có lỗi xảy ra. Vui lòng thử lại.')
                 }), 500
             
+        except UpstreamBusy as e:
+            track_chat('chat', started, status='busy')
+            return chat_busy(e)
         except Exception as e:
+            track_chat('chat', started, status='error')
             app.logger.error(f"Chatbot Error: {e}")
             return jsonify({
                 "success": False,
                 "error": "Có lỗi xảy ra. Vui lòng thử lại."
             }), 500
 
+    @app.route("/api/chat/stream", methods=["POST"])
+    @limiter.limit("10 per minute")
+    @csrf.exempt
+    def api_chat_stream():
+        """Chat trả lời dạng stream (SSE): laptops -> token... -> done"""
+        started = time.perf_counter()
+        data = request.get_json(silent=True) or {}
+        user_message = data.get('message', '').strip()
+        
+        if not user_message:
+            return jsonify({
+                "success": False,
+                "error": "Tin nhắn không được để trống"
+            }), 400
+        
+        # Id được đặt vào session trước khi gửi header; lịch sử ghi thẳng vào store khi stream xong
+        chat_id = chat_conversation_id()
+        conversation_history = conversation_store.load(chat_id)
+        
+        def generate():
+            for event, payload in chatbot.stream_response(user_message, conversation_history):
+                if event in ('done', 'error'):
+                    track_chat('stream', started, payload)
+                if event == 'done':
+                    if payload.get('success') and not payload.get('blocked'):
+                        conversation_store.append_turn(chat_id, conversation_history, user_message, payload['response'])
+                    payload = {
+                        "success": payload.get('success', False),
+                        "response": payload.get('response'),
+                        "error": payload.get('error'),
+                        "intent": payload.get('intent', 'general'),
+                        "relevant_laptops_count": payload.get('relevant_laptops_count', 0),
+                        "model": payload.get('model', 'claude-3-haiku'),
+                        "blocked": payload.get('blocked', False),
+                        "cached": payload.get('cached', False),
+                        "fallback": payload.get('fallback'),
+                        "route": payload.get('route'),
+                        "prompt_tokens": payload.get('prompt_tokens'),
+                        "timings": payload.get('timings')
+                    }
+                yield sse_event(event, payload)
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
     @app.route("/api/chat/search", methods=["POST"])
     @limiter.limit("10 per minute")
     @csrf.exempt
     def api_chat_search():
         """Enhanced AI search with better matching"""
+        started = time.perf_counter()
         try:
             data = request.get_json()
             search_query = data.get('query', '').strip()
@@ -1134,19 +1163,26 @@ def create_app():
                     "error": "Truy vấn tìm kiếm không được để trống"
                 }), 400
             
-            # Initialize chatbot service for enhanced search
-            chatbot = ChatbotService(app.config['ANTHROPIC_API_KEY'])
-            
             # Use enhanced search
-            search_results = chatbot.search_laptops(search_query, limit=10)
+            turn = ChatTurn(search_query)
+            search_results = chatbot.search_laptops(search_query, limit=10, turn=turn)
+            track_chat('search', started, {
+                "success": True,
+                "intent": "search",
+                "relevant_laptops_count": len(search_results),
+                "blocked": turn.blocked[0],
+                "category": turn.blocked[1]
+            })
             
             return jsonify({
                 "success": True,
                 "results": search_results,
-                "count": len(search_results)
+                "count": len(search_results),
+                "timings": turn.timings
             })
             
         except Exception as e:
+            track_chat('search', started, status='error')
             app.logger.error(f"Search Error: {e}")
             return jsonify({
                 "success": False,
@@ -1158,7 +1194,9 @@ def create_app():
     def api_chat_clear():
         """Clear conversation history"""
         try:
+            conversation_store.clear(session.pop('chat_id', None))
             session.pop('chat_history', None)
+            session.pop('chat_stream_pending', None)
             return jsonify({
                 "success": True,
                 "message": "Đã xóa lịch sử trò chuyện"
@@ -1175,6 +1213,7 @@ def create_app():
     @csrf.exempt
     def api_chat_recommend():
         """Get AI-powered laptop recommendations"""
+        started = time.perf_counter()
         try:
             data = request.get_json()
             user_message = data.get('message', '').strip()
@@ -1185,25 +1224,19 @@ def create_app():
                     "error": "Tin nhắn không được để trống"
                 }), 400
             
-            # Initialize chatbot service
-            chatbot = ChatbotService(app.config['ANTHROPIC_API_KEY'])
-            
-            # Extract preferences from message
-            preferences = chatbot.extract_user_preferences(user_message, [])
-            
-            # Get relevant laptops
-            relevant_laptops = chatbot.get_relevant_laptops(preferences, limit=5)
-            
-            # Generate AI recommendation
-            result = chatbot.generate_response(user_message, [])
+            # One pipeline run: preferences and laptops come from the same turn as the answer
+            turn = ChatTurn(user_message)
+            result = chatbot.run(turn)
+            track_chat('recommend', started, result)
             
             if result['success']:
                 return jsonify({
                     "success": True,
                     "recommendation": result['response'],
-                    "laptops": relevant_laptops,
+                    "laptops": turn.laptops,
                     "intent": result.get('intent', 'recommend'),
-                    "preferences": preferences
+                    "preferences": turn.preferences,
+                    "timings": result.get('timings')
                 })
             else:
                 return jsonify({
@@ -1211,7 +1244,11 @@ def create_app():
                     "error": result.get('error', 'Có lỗi xảy ra khi tạo gợi ý')
                 }), 500
             
+        except UpstreamBusy as e:
+            track_chat('recommend', started, status='busy')
+            return chat_busy(e)
         except Exception as e:
+            track_chat('recommend', started, status='error')
             app.logger.error(f"Recommendation Error: {e}")
             return jsonify({
                 "success": False,
@@ -1223,45 +1260,15 @@ def create_app():
     def api_chat_analytics():
         """Get chatbot analytics (Admin only)"""
         try:
-            # Get basic stats
-            total_laptops = Laptop.query.count()
-            total_brands = db.session.query(Laptop.brand).distinct().count()
-            total_categories = db.session.query(Laptop.category).distinct().count()
-            
-            # Get price range
-            price_stats = db.session.query(
-                db.func.min(Laptop.price).label('min_price'),
-                db.func.max(Laptop.price).label('max_price'),
-                db.func.avg(Laptop.price).label('avg_price')
-            ).first()
-            
-            # Get category distribution
-            category_dist = db.session.query(
-                Laptop.category, 
-                db.func.count(Laptop.id).label('count')
-            ).group_by(Laptop.category).all()
-            
-            # Get brand distribution
-            brand_dist = db.session.query(
-                Laptop.brand, 
-                db.func.count(Laptop.id).label('count')
-            ).group_by(Laptop.brand).all()
-            
+            # Thống kê catalog tính sẵn theo snapshot, số liệu chat từ bộ đếm tổng hợp: không query DB
             analytics = {
-                "total_laptops": total_laptops,
-                "total_brands": total_brands,
-                "total_categories": total_categories,
-                "price_stats": {
-                    "min": int(price_stats.min_price) if price_stats.min_price else 0,
-                    "max": int(price_stats.max_price) if price_stats.max_price else 0,
-                    "avg": int(price_stats.avg_price) if price_stats.avg_price else 0
-                },
-                "category_distribution": [
-                    {"category": cat, "count": count} for cat, count in category_dist
-                ],
-                "brand_distribution": [
-                    {"brand": brand, "count": count} for brand, count in brand_dist
-                ]
+                **catalog_store.get().summary(),
+                "chat": chat_analytics.report(),
+                "response_cache": response_cache.stats(),
+                "circuit_breaker": chatbot.breaker.stats(),
+                "fallbacks": dict(chatbot.fallbacks),
+                "upstream_gate": chatbot.gate.stats(),
+                "knowledge_base": chatbot.knowledge.stats() if chatbot.knowledge else None
             }
             
             return jsonify({
@@ -1278,65 +1285,6 @@ def create_app():
 
     return app
 
-def calculate_laptop_score(laptop, criteria, priority):
-    """
-    Tính điểm cho laptop dựa trên tiêu chí và ưu tiên
-    """
-    score = 0
-    weights = criteria["weight"]
-    
-    # Điểm cho CPU
-    cpu_score = 0
-    cpu_series = criteria.get("cpu_series", [])
-    for series in cpu_series:
-        if series in laptop.cpu.upper():
-            cpu_score = 1.0
-            break
-    if not cpu_score and "U" in laptop.cpu.upper():
-        cpu_score = 0.5  # CPU U-series cơ bản
-    
-    # Điểm cho RAM
-    ram_score = min(laptop.ram_gb / 32.0, 1.0)  # Chuẩn hóa theo 32GB
-    
-    # Điểm cho GPU
-    gpu_score = 0
-    if laptop.gpu:
-        gpu_lower = laptop.gpu.lower()
-        if any(gpu in gpu_lower for gpu in ['rtx', 'gtx', 'rx', 'radeon']):
-            gpu_score = 1.0
-        elif any(gpu in gpu_lower for gpu in ['mx', 'iris xe']):
-            gpu_score = 0.6
-        else:
-            gpu_score = 0.3
-    
-    # Điểm cho giá (càng thấp càng tốt)
-    price_score = 1.0 - (laptop.price / 50000000.0)  # Chuẩn hóa theo 50 triệu
-    price_score = max(0, price_score)
-    
-    # Điểm cho storage
-    storage_score = 0.5  # Mặc định
-    if "ssd" in laptop.storage.lower():
-        storage_score = 1.0
-    elif "hdd" in laptop.storage.lower():
-        storage_score = 0.3
-    
-    # Tính điểm tổng hợp
-    score = (
-        cpu_score * weights.get("cpu", 0.2) +
-        ram_score * weights.get("ram", 0.2) +
-        gpu_score * weights.get("gpu", 0.1) +
-        price_score * weights.get("price", 0.3) +
-        storage_score * weights.get("storage", 0.1)
-    )
-    
-    # Điều chỉnh theo ưu tiên
-    if priority == "performance":
-        score *= 1.2  # Tăng 20% cho laptop hiệu năng cao
-    elif priority == "budget":
-        score *= 0.8  # Giảm 20% cho laptop giá rẻ
-    
-    return score
-
 if __name__ == "__main__":
     app = create_app()
     with app.app_context():
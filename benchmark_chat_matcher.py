@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark matcher chatbot: cách quét tuần tự cũ so với matcher đã biên dịch (chat_matcher.py)
+Dùng bộ câu mẫu và bản tham chiếu trong test_chat_matcher.py
+Chạy: python benchmark_chat_matcher.py [số_vòng]   (mặc định 20)
+"""
+
+import sys
+import time
+import logging
+from chatbot_service import SecurityFilter, ChatbotService
+from test_chat_matcher import (
+    CORPUS, generated_corpus, legacy_is_query_blocked, legacy_classify_intent,
+    legacy_extract_user_preferences
+)
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    security_filter = SecurityFilter()
+    chatbot = ChatbotService("benchmark-key")
+    corpus = CORPUS + generated_corpus()
+    print("🚀 Benchmark matcher chatbot")
+    print("=" * 50)
+    print(f"📦 {len(corpus)} câu x {rounds} vòng")
+    logging.disable(logging.WARNING)  # không tính thời gian ghi log câu bị chặn
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in corpus:
+            legacy_is_query_blocked(security_filter, message)
+            legacy_classify_intent(chatbot, message)
+            legacy_extract_user_preferences(chatbot, message)
+    legacy = (time.perf_counter() - start) * 1e6 / (rounds * len(corpus))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in corpus:
+            chatbot.analyze(message)
+    single_pass = (time.perf_counter() - start) * 1e6 / (rounds * len(corpus))
+    logging.disable(logging.NOTSET)
+
+    print(f"🐢 Quét tuần tự: {legacy:.1f} µs/câu")
+    print(f"⚡ Đã biên dịch: {single_pass:.1f} µs/câu (nhanh hơn {legacy / single_pass:.1f}x)")
+    print("\n🎉 Hoàn thành!")
+
+if __name__ == "__main__":
+    main()
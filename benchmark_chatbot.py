@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark ChatbotService: tạo service mới mỗi request so với dùng chung một instance
+Gọi tới một server Messages API giả lập chạy local nên không cần API key hay mạng
+Chạy: python benchmark_chatbot.py [số_request]   (mặc định 200)
+"""
+
+import sys
+import time
+from chatbot_service import ChatbotService
+from mock_anthropic import MockAnthropicServer
+
+def call(service):
+    return service.client.messages.create(
+        model=service.model,
+        max_tokens=service.max_tokens,
+        messages=[{"role": "user", "content": "tư vấn laptop gaming"}]
+    )
+
+def run(server, label, count, get_service):
+    server.reset()
+    start = time.perf_counter()
+    for _ in range(count):
+        call(get_service())
+    elapsed = time.perf_counter() - start
+    print(f"   {label}: {elapsed * 1000 / count:8.2f} ms/request, "
+          f"{len(server.connections)} kết nối TCP")
+    return elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    server = MockAnthropicServer().start()
+    base_url = server.base_url
+
+    print("🚀 Benchmark khởi tạo ChatbotService")
+    print("=" * 50)
+
+    # Chỉ chi phí khởi tạo (client, connection pool, SecurityFilter, pattern)
+    start = time.perf_counter()
+    for _ in range(count):
+        ChatbotService("benchmark-key", base_url=base_url)
+    construct = (time.perf_counter() - start) * 1000 / count
+    print(f"\n🧱 Khởi tạo một ChatbotService: {construct:.2f} ms")
+
+    print(f"\n📊 {count} request tới Messages API giả lập:")
+    per_request = run(server, "🐢 Service mới mỗi request", count,
+                      lambda: ChatbotService("benchmark-key", base_url=base_url))
+    shared_service = ChatbotService("benchmark-key", base_url=base_url)
+    shared = run(server, "⚡ Service dùng chung     ", count, lambda: shared_service)
+
+    print(f"\n✅ Tiết kiệm {(per_request - shared) * 1000 / count:.2f} ms/request "
+          f"(nhanh hơn {per_request / shared:.1f}x)")
+    server.stop()
+
+if __name__ == "__main__":
+    main()
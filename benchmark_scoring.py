@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark chấm điểm gợi ý: vòng lặp calculate_laptop_score từng laptop so với engine NumPy
+Chạy: python benchmark_scoring.py [số_laptop ...]   (mặc định 10000 100000)
+"""
+
+import sys
+import time
+import random
+from types import SimpleNamespace
+import numpy as np
+from recommendation import RECOMMEND_CRITERIA, calculate_laptop_score
+from scoring_engine import LaptopArrays, need_scores, NEEDS
+
+# Hệ số theo ưu tiên (giống calculate_laptop_score): chỉ nhân điểm nên không đổi thứ tự
+PRIORITY_FACTORS = {'balanced': 1.0, 'performance': 1.2, 'budget': 0.8}
+
+CPUS = ['Intel Core i5-1235U', 'Intel Core i7-12700H', 'AMD Ryzen 7 6800HS', 'Intel Core i7-1260P',
+        'AMD Ryzen 5 5500U', 'Intel Core i9-13980HX', 'Apple M2']
+GPUS = ['NVIDIA RTX 4060', 'NVIDIA GTX 1650', 'Intel Iris Xe', 'NVIDIA MX550', 'AMD Radeon 680M',
+        'Apple GPU 10-core', None]
+STORAGES = ['512GB SSD', '1TB SSD', '1TB HDD', '256GB eMMC']
+
+def make_laptops(count, seed=42):
+    """Sinh dữ liệu laptop giả lập"""
+    rng = random.Random(seed)
+    return [SimpleNamespace(
+        id=i + 1,
+        price=rng.randrange(6000000, 80000000, 100000),
+        ram_gb=rng.choice([4, 8, 16, 32, 64]),
+        cpu=rng.choice(CPUS),
+        gpu=rng.choice(GPUS),
+        storage=rng.choice(STORAGES),
+        cpu_single_core_plugged=rng.choice([None, rng.randint(1000, 3000)]),
+        cpu_multi_core_plugged=rng.randint(4000, 20000),
+        gpu_score_plugged=rng.choice([None, rng.randint(1000, 15000)]),
+        battery_life_office=rng.choice([None, rng.randint(200, 900)])
+    ) for i in range(count)]
+
+def loop_top10(laptops):
+    """Cách cũ: tính điểm từng laptop cho mọi nhu cầu/ưu tiên rồi sort"""
+    result = {}
+    for need in NEEDS:
+        crit = RECOMMEND_CRITERIA[need]
+        for priority in PRIORITY_FACTORS:
+            scored = [(calculate_laptop_score(l, crit, priority), l.id) for l in laptops]
+            scored.sort(key=lambda t: (-t[0], t[1]))
+            result[(need, priority)] = [laptop_id for _, laptop_id in scored[:10]]
+    return result
+
+def engine_top10(arrays):
+    """Engine NumPy: điểm mọi nhu cầu trong một lượt, nhân hệ số ưu tiên rồi lấy top 10"""
+    scores = need_scores(arrays)
+    result = {}
+    for j, need in enumerate(NEEDS):
+        for priority, factor in PRIORITY_FACTORS.items():
+            # Sắp theo điểm giảm dần, hòa điểm thì id nhỏ trước (giống vòng lặp cũ)
+            top = np.lexsort((arrays.ids, -(scores[:, j] * factor)))[:10]
+            result[(need, priority)] = arrays.ids[top].tolist()
+    return result
+
+def run(count):
+    print(f"\n📊 {count:,} laptop ({len(NEEDS)} nhu cầu x {len(PRIORITY_FACTORS)} ưu tiên)")
+    laptops = make_laptops(count)
+
+    start = time.perf_counter()
+    expected = loop_top10(laptops)
+    loop_time = time.perf_counter() - start
+    print(f"   🐢 Vòng lặp Python:       {loop_time * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    arrays = LaptopArrays(laptops)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = engine_top10(arrays)
+    engine_time = time.perf_counter() - start
+    print(f"   🧱 Dựng mảng (một lần):   {build_time * 1000:10.1f} ms")
+    print(f"   ⚡ Engine NumPy:          {engine_time * 1000:10.1f} ms "
+          f"(nhanh hơn {loop_time / engine_time:.0f}x)")
+
+    if actual == expected:
+        print("   ✅ Kết quả top 10 trùng khớp")
+    else:
+        print("   ❌ Kết quả top 10 KHÔNG khớp")
+    return actual == expected
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    print("🚀 Benchmark chấm điểm gợi ý laptop")
+    print("=" * 50)
+    ok = all([run(count) for count in counts])
+    print("\n🎉 Hoàn thành!" if ok else "\n⚠️ Có kết quả không khớp!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark SQLite: đọc đồng thời trong lúc ghi, trước và sau profile db_profile.py
+Mỗi lượt chạy trên một bản sao của cùng database sinh sẵn: các thread đọc chạy truy vấn như
+route GET (danh sách laptop theo giá, thống kê theo category, trang favorites) trong khi các
+thread ghi liên tục cập nhật giá hàng loạt (như admin/import) và thêm/xóa favorite
+Chạy: python benchmark_sqlite.py [số_giây] [số_thread_đọc] [số_thread_ghi]   (mặc định 5 8 2)
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from flask import Flask
+from sqlalchemy import func, insert
+from werkzeug.security import generate_password_hash
+from config import Config
+from models import db, Laptop, User, Favorite
+import db_profile
+
+LAPTOPS = 20000
+USERS = 500
+BULK_UPDATE_ROWS = 500
+FAVORITES_PER_USER = 5
+BRANDS = ['ASUS', 'Dell', 'HP', 'Lenovo', 'Acer', 'MSI', 'Apple']
+CATEGORIES = ['gaming', 'design', 'dev', 'student', 'office']
+
+def make_app(path, tuned):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}", SQLITE_TUNING=tuned)
+    db_profile.configure(app)
+    db.init_app(app)
+    db_profile.init_app(app)
+    return app
+
+def seed(path, seed=42):
+    """Sinh database mẫu (rollback journal, như database chưa dùng profile)"""
+    rng = random.Random(seed)
+    app = make_app(path, tuned=False)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Laptop), [dict(
+            name=f"{rng.choice(BRANDS)} Model {i}",
+            brand=rng.choice(BRANDS),
+            cpu=rng.choice(['Core i5-1335U', 'Core i7-13700H', 'Ryzen 7 7840HS', 'Apple M2']),
+            ram_gb=rng.choice([8, 16, 32]),
+            gpu=rng.choice(['Iris Xe', 'RTX 4050', 'RTX 4060', 'Radeon Graphics']),
+            storage=rng.choice(['256GB SSD', '512GB SSD', '1TB SSD']),
+            screen=rng.choice(['14 FHD', '15.6 FHD 144Hz', '16 2.5K 120Hz']),
+            price=rng.randrange(6_000_000, 60_000_000, 100_000),
+            category=rng.choice(CATEGORIES)
+        ) for i in range(LAPTOPS)])
+        # Hash mật khẩu một lần (chậm có chủ đích), dùng chung cho mọi user
+        password_hash = generate_password_hash('benchmark')
+        db.session.execute(insert(User), [
+            dict(username=f"user{i}", email=f"user{i}@example.com", password_hash=password_hash)
+            for i in range(USERS)
+        ])
+        db.session.execute(insert(Favorite), [
+            dict(user_id=user_id, laptop_id=laptop_id)
+            for user_id in range(1, USERS + 1)
+            for laptop_id in rng.sample(range(1, LAPTOPS + 1), FAVORITES_PER_USER)
+        ])
+        db.session.commit()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+def read_once(rng):
+    """Truy vấn của một lượt GET: danh sách theo giá, thống kê theo category, user, trang favorites"""
+    low = rng.randrange(6, 50) * 1_000_000
+    Laptop.query.filter(Laptop.price.between(low, low + 5_000_000)).order_by(Laptop.price).limit(20).all()
+    db.session.query(Laptop.category, func.count(Laptop.id), func.avg(Laptop.price)).group_by(Laptop.category).all()
+    user = db.session.get(User, rng.randint(1, USERS))
+    Laptop.query.join(Favorite).filter(Favorite.user_id == user.id).all()
+
+def write_once(rng):
+    """Một thao tác ghi: cập nhật giá một lô laptop, thêm hoặc bỏ một favorite"""
+    first = rng.randint(1, LAPTOPS - BULK_UPDATE_ROWS)
+    db.session.execute(
+        db.update(Laptop)
+        .where(Laptop.id.between(first, first + BULK_UPDATE_ROWS - 1))
+        .values(price=Laptop.price + 100_000)
+    )
+    user_id, laptop_id = rng.randint(1, USERS), rng.randint(1, LAPTOPS)
+    favorite = Favorite.query.filter_by(user_id=user_id, laptop_id=laptop_id).first()
+    if favorite:
+        db.session.delete(favorite)
+    else:
+        db.session.add(Favorite(user_id=user_id, laptop_id=laptop_id))
+    db.session.commit()
+
+def worker(app, method, action, deadline, latencies, errors, seed):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with app.test_request_context('/', method=method):
+                action(rng)
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors[str(e).splitlines()[0][:60]] += 1
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+def run(label, template, tuned, seconds, readers, writers):
+    print(f"\n{label}")
+    workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+    path = os.path.join(workdir, 'app.db')
+    shutil.copy(template, path)
+    app = make_app(path, tuned)
+
+    reads, writes, errors = [], [], Counter()
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=worker, args=(app, 'GET', read_once, deadline, reads, errors, i))
+               for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=(app, 'POST', write_once, deadline, writes, errors, 1000 + i))
+                for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        'reads': len(reads) / seconds,
+        'read_p50': percentile(reads, 50),
+        'read_p99': percentile(reads, 99),
+        'writes': len(writes) / seconds,
+        'write_p99': percentile(writes, 99),
+        'errors': sum(errors.values())
+    }
+    print(f"   Đọc: {len(reads):8,} lượt ({result['reads']:8,.0f}/s)   "
+          f"p50 {result['read_p50']:7.2f} ms   p95 {percentile(reads, 95):7.2f} ms   p99 {result['read_p99']:7.2f} ms")
+    print(f"   Ghi: {len(writes):8,} lượt ({result['writes']:8,.0f}/s)   "
+          f"p50 {percentile(writes, 50):7.2f} ms   p95 {percentile(writes, 95):7.2f} ms   p99 {result['write_p99']:7.2f} ms")
+    if errors:
+        for message, count in errors.most_common(3):
+            print(f"   ❌ {count} lỗi: {message}")
+    else:
+        print("   ✅ Không có lỗi")
+    return result
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    print("🚀 Benchmark SQLite: đọc đồng thời trong lúc ghi")
+    print("=" * 50)
+    print(f"📦 {LAPTOPS:,} laptop, {USERS} user, {readers} thread đọc, {writers} thread ghi, {seconds:g} giây mỗi lượt")
+
+    workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+    template = os.path.join(workdir, 'template.db')
+    try:
+        seed(template)
+        before = run("🐢 Trước: rollback journal, một pool chung (SQLITE_TUNING = False)",
+                     template, False, seconds, readers, writers)
+        after = run("⚡ Sau: WAL + pragma, pool đọc riêng, một writer (SQLITE_TUNING = True)",
+                    template, True, seconds, readers, writers)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n📊 Sau so với trước:")
+    print(f"   Lượt đọc/giây: x{after['reads'] / max(before['reads'], 1e-9):.2f}   "
+          f"p99 đọc: {before['read_p99']:.2f} -> {after['read_p99']:.2f} ms")
+    print(f"   Lượt ghi/giây: x{after['writes'] / max(before['writes'], 1e-9):.2f}   "
+          f"lỗi: {before['errors']} -> {after['errors']}")
+    print("\n🎉 Hoàn thành!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Theo dõi thay đổi bảng laptops và phát sự kiện sau khi commit
+Các cache trong process (snapshot, index...) đăng ký callback qua on_catalog_change
+Mỗi thay đổi cũng được ghi vào bảng catalog_changes trong cùng transaction
+để worker khác đồng bộ cache (xem catalog_sync.py)
+"""
+
+import uuid
+import logging
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Laptop, CatalogChange
+
+logger = logging.getLogger(__name__)
+
+# Định danh process hiện tại, ghi vào catalog_changes.origin
+ORIGIN = uuid.uuid4().hex[:16]
+
+_listeners = []
+_installed = False
+_changelog_enabled = False
+
+def on_catalog_change(callback):
+    """Đăng ký callback(changes) được gọi sau mỗi commit có thay đổi laptop
+
+    changes là dict {'insert': set(ids), 'update': set(ids), 'delete': set(ids)}
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+    install()
+    return callback
+
+def _pending_changes(session):
+    return session.info.setdefault('catalog_changes', {
+        'insert': set(),
+        'update': set(),
+        'delete': set()
+    })
+
+def enable_changelog():
+    """Bật ghi nhật ký catalog_changes (gọi sau khi bảng đã được tạo)"""
+    global _changelog_enabled
+    _changelog_enabled = True
+
+def changelog_enabled():
+    return _changelog_enabled
+
+def _after_flush(session, flush_context):
+    """Ghi lại id laptop bị thêm/sửa/xóa trong lần flush này"""
+    flushed = []
+    for obj in session.new:
+        if isinstance(obj, Laptop):
+            flushed.append(('insert', obj.id))
+    for obj in session.dirty:
+        if isinstance(obj, Laptop) and session.is_modified(obj, include_collections=False):
+            flushed.append(('update', obj.id))
+    for obj in session.deleted:
+        if isinstance(obj, Laptop):
+            flushed.append(('delete', obj.id))
+    if not flushed:
+        return
+
+    changes = _pending_changes(session)
+    for op, laptop_id in flushed:
+        changes[op].add(laptop_id)
+
+    if _changelog_enabled:
+        # Cùng connection/transaction với thao tác ghi laptop: rollback thì nhật ký cũng mất
+        session.connection().execute(CatalogChange.__table__.insert(), [
+            {'laptop_id': laptop_id, 'op': op, 'origin': ORIGIN}
+            for op, laptop_id in flushed
+        ])
+
+def mark_updated(session, laptop_ids):
+    """Báo laptop đã đổi dữ liệu phụ (ví dụ tóm tắt) dù dòng laptops không đổi
+
+    Cache trong process nhận sự kiện 'update' sau commit; worker khác nhận qua catalog_changes.
+    """
+    laptop_ids = set(laptop_ids)
+    if not laptop_ids:
+        return
+    _pending_changes(session)['update'].update(laptop_ids)
+    if _changelog_enabled:
+        session.connection().execute(CatalogChange.__table__.insert(), [
+            {'laptop_id': laptop_id, 'op': 'update', 'origin': ORIGIN}
+            for laptop_id in sorted(laptop_ids)
+        ])
+
+def dispatch(changes):
+    """Chuẩn hóa changes rồi gọi mọi callback đã đăng ký"""
+    # Laptop vừa thêm rồi xóa trong cùng transaction chỉ tính là xóa
+    changes['insert'] -= changes['delete']
+    changes['update'] -= changes['insert'] | changes['delete']
+    for callback in list(_listeners):
+        try:
+            callback(changes)
+        except Exception as e:
+            logger.error(f"Catalog listener error ({getattr(callback, '__name__', callback)}): {e}")
+
+def _after_commit(session):
+    changes = session.info.pop('catalog_changes', None)
+    if changes:
+        dispatch(changes)
+
+def _after_rollback(session):
+    session.info.pop('catalog_changes', None)
+
+def install():
+    """Gắn event listener vào mọi SQLAlchemy Session (chỉ một lần)"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    _installed = True
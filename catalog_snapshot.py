@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot dạng cột (columnar) của bảng laptops nằm trong bộ nhớ process
+Dùng cho trang /laptops và GET /api/products: lọc, sắp xếp, phân trang không cần query DB
+"""
+
+import math
+import zlib
+import threading
+import logging
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from sqlalchemy import select, func
+from models import Laptop, CatalogChange
+from db_profile import read_engine
+from catalog_events import on_catalog_change, changelog_enabled
+import search_index
+from keyset import KeysetPage, decode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Thứ tự cột giống Laptop.to_dict()
+COLUMNS = (
+    'id', 'name', 'brand', 'cpu', 'ram_gb', 'gpu', 'storage', 'screen', 'price',
+    'category', 'image_url', 'battery_capacity', 'battery_life_office',
+    'battery_life_gaming', 'cpu_single_core_plugged', 'cpu_multi_core_plugged',
+    'cpu_single_core_battery', 'cpu_multi_core_battery', 'gpu_score_plugged',
+    'gpu_score_battery'
+)
+
+# Các cột lưu nguyên dạng list (text hoặc số có thể NULL)
+PLAIN_COLUMNS = tuple(c for c in COLUMNS if c not in ('id', 'price', 'ram_gb', 'brand', 'category'))
+
+SORT_KEYS = ('id', 'price_asc', 'price_desc', 'name_asc', 'name_desc')
+
+# Thay đổi lớn hơn ngưỡng này (ví dụ import hàng loạt) thì build lại toàn bộ thay vì vá
+PATCH_MAX_ROWS = 1000
+
+def _drop(seq, positions):
+    """Bản sao của seq (array hoặc list) đã bỏ các vị trí positions (tăng dần)"""
+    out = seq[:0]
+    start = 0
+    for pos in positions:
+        out += seq[start:pos]
+        start = pos + 1
+    return out + seq[start:]
+
+class LaptopRow:
+    """Bản ghi laptop chỉ đọc, dùng thay cho ORM object khi render/serialize"""
+    __slots__ = COLUMNS
+
+    def __init__(self, **values):
+        for column in COLUMNS:
+            setattr(self, column, values.get(column))
+
+    def to_dict(self):
+        """Chuyển đổi laptop thành dictionary cho API (giống Laptop.to_dict)"""
+        return {column: getattr(self, column) for column in COLUMNS}
+
+class SnapshotPage:
+    """Kết quả phân trang, cùng thuộc tính với Pagination của Flask-SQLAlchemy"""
+
+    def __init__(self, items, total, page, per_page, highlights=None):
+        self.items = items
+        self.highlights = highlights or {}
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+        self.pages = int(math.ceil(total / per_page)) if per_page else 0
+        self.has_prev = page > 1
+        self.has_next = page < self.pages
+        self.prev_num = page - 1 if self.has_prev else None
+        self.next_num = page + 1 if self.has_next else None
+
+class CatalogSnapshot:
+    """Bảng laptops lưu theo cột; brand/category được mã hóa từ điển
+
+    version là MAX(catalog_changes.id) đọc trước các dòng, nên dữ liệu của snapshot
+    không bao giờ cũ hơn phiên bản nó mang.
+    """
+
+    def __init__(self, rows, version=0):
+        rows = sorted(rows, key=lambda r: r['id'])
+        self.version = version
+        self.size = len(rows)
+
+        self.ids = array('q', (r['id'] for r in rows))
+        self.prices = array('q', (r['price'] or 0 for r in rows))
+        self.ram = array('q', (r['ram_gb'] or 0 for r in rows))
+
+        # Mã hóa từ điển cho brand và category
+        self.brand_values, self.brand_codes = self._encode(r['brand'] for r in rows)
+        self.category_values, self.category_codes = self._encode(r['category'] for r in rows)
+        self.brand_index = {v: i for i, v in enumerate(self.brand_values)}
+        self.category_index = {v: i for i, v in enumerate(self.category_values)}
+
+        self.columns = {c: [r[c] for r in rows] for c in PLAIN_COLUMNS}
+        self.names_lower = [(name or '').lower() for name in self.columns['name']]
+        self.positions = {laptop_id: pos for pos, laptop_id in enumerate(self.ids)}
+
+        # Thứ tự sắp xếp tính sẵn (vị trí dòng), tie-break theo id
+        by_id = range(self.size)
+        self.orders = {'id': array('l', by_id)}
+        for name, key in self._sort_keys().items():
+            self.orders[name] = array('l', sorted(by_id, key=key))
+        self.orders['name_desc'] = array('l', reversed(self.orders['name_asc']))
+        self._summary = None
+        self._token = None
+
+    @property
+    def token(self):
+        """Phiên bản dạng chuỗi cho ETag/URL: giống nhau ở mọi worker có cùng dữ liệu
+
+        Kèm checksum id + giá để token không lặp lại khi nhật ký bị tạo lại (ví dụ seed lại database).
+        """
+        if self._token is None:
+            checksum = zlib.crc32(self.prices.tobytes(), zlib.crc32(self.ids.tobytes()))
+            self._token = f"{self.version}.{checksum:08x}"
+        return self._token
+
+    def _sort_keys(self):
+        prices, ids, names = self.prices, self.ids, self.names_lower
+        return {
+            'price_asc': lambda p: (prices[p], ids[p]),
+            'price_desc': lambda p: (-prices[p], ids[p]),
+            'name_asc': lambda p: (names[p], ids[p]),
+        }
+
+    def patch(self, rows, deleted=(), version=0):
+        """Snapshot mới = snapshot này, thay/thêm các dòng rows và bỏ các id trong deleted
+
+        Chỉ xử lý lại các dòng bị ảnh hưởng: cột được copy nguyên khối, thứ tự sắp xếp
+        cập nhật bằng bisect. Trả về None nếu laptop mới có id nhỏ hơn id lớn nhất hiện có
+        (dòng lưu theo thứ tự id), khi đó cần build lại toàn bộ.
+        """
+        rows = sorted(rows, key=lambda r: r['id'])
+        updated = [r for r in rows if r['id'] in self.positions]
+        inserted = [r for r in rows if r['id'] not in self.positions]
+        if inserted and self.size and inserted[0]['id'] < self.ids[-1]:
+            return None
+        dropped = sorted(self.positions[i] for i in set(deleted) if i in self.positions)
+        # Vị trí cũ của các dòng bị xóa hoặc sửa: lấy ra khỏi thứ tự sắp xếp rồi chèn lại
+        moved = set(dropped) | {self.positions[r['id']] for r in updated}
+
+        def shift(pos):
+            return pos - bisect_left(dropped, pos) if dropped else pos
+
+        snapshot = object.__new__(CatalogSnapshot)
+        snapshot.version = version
+        snapshot.size = self.size - len(dropped) + len(inserted)
+        snapshot.ids = _drop(self.ids, dropped)
+        snapshot.prices = _drop(self.prices, dropped)
+        snapshot.ram = _drop(self.ram, dropped)
+        snapshot.columns = {c: _drop(self.columns[c], dropped) for c in PLAIN_COLUMNS}
+        snapshot.names_lower = _drop(self.names_lower, dropped)
+
+        assigned = {shift(self.positions[r['id']]): r for r in updated}
+        start = len(snapshot.ids)
+        assigned.update((start + i, r) for i, r in enumerate(inserted))
+        for r in inserted:
+            snapshot.ids.append(r['id'])
+            snapshot.prices.append(0)
+            snapshot.ram.append(0)
+            for c in PLAIN_COLUMNS:
+                snapshot.columns[c].append(None)
+            snapshot.names_lower.append('')
+        for pos, r in assigned.items():
+            snapshot.prices[pos] = r['price'] or 0
+            snapshot.ram[pos] = r['ram_gb'] or 0
+            for c in PLAIN_COLUMNS:
+                snapshot.columns[c][pos] = r[c]
+            snapshot.names_lower[pos] = (r['name'] or '').lower()
+
+        for column in ('brand', 'category'):
+            values, codes = self._patch_encoded(
+                column, dropped, {pos: r[column] for pos, r in assigned.items()}, snapshot.size
+            )
+            setattr(snapshot, f'{column}_values', values)
+            setattr(snapshot, f'{column}_codes', codes)
+            setattr(snapshot, f'{column}_index', {v: i for i, v in enumerate(values)})
+
+        # Snapshot không bao giờ sửa tại chỗ nên phần không đổi được dùng chung
+        if dropped:
+            snapshot.positions = {laptop_id: pos for pos, laptop_id in enumerate(snapshot.ids)}
+        elif inserted:
+            snapshot.positions = dict(self.positions)
+            snapshot.positions.update((r['id'], start + i) for i, r in enumerate(inserted))
+        else:
+            snapshot.positions = self.positions
+
+        if snapshot.size == self.size:
+            snapshot.orders = {'id': self.orders['id']}
+        else:
+            snapshot.orders = {'id': array('l', range(snapshot.size))}
+        old_keys = self._sort_keys()
+        for name, key in snapshot._sort_keys().items():
+            if dropped:
+                order = array('l', (shift(p) for p in self.orders[name] if p not in moved))
+            else:
+                # Không có dòng bị xóa: vị trí giữ nguyên, chỉ tìm và gỡ các dòng đã sửa
+                order = array('l', self.orders[name])
+                for pos in moved:
+                    del order[bisect_left(order, old_keys[name](pos), key=old_keys[name])]
+            for pos in sorted(assigned):
+                insort(order, pos, key=key)
+            snapshot.orders[name] = order
+        snapshot.orders['name_desc'] = snapshot.orders['name_asc'][::-1]
+        snapshot._summary = None
+        snapshot._token = None
+        return snapshot
+
+    def _patch_encoded(self, column, dropped, assigned, size):
+        """Từ điển và mã của cột brand/category sau khi bỏ dropped, gán assigned {vị trí: giá trị}"""
+        values = getattr(self, f'{column}_values')
+        codes = _drop(getattr(self, f'{column}_codes'), dropped)
+        kept = len(codes)
+        if not dropped and all(pos >= kept or values[codes[pos]] == value for pos, value in assigned.items()):
+            # Không xóa dòng, dòng cũ giữ nguyên giá trị: thứ tự xuất hiện trong từ điển không đổi
+            values = list(values)
+            index = dict(getattr(self, f'{column}_index'))
+            codes.extend([0] * (size - kept))
+            for pos in sorted(assigned):
+                code = index.get(assigned[pos])
+                if code is None:
+                    code = index[assigned[pos]] = len(values)
+                    values.append(assigned[pos])
+                codes[pos] = code
+            return values, codes
+        decoded = [values[code] for code in codes] + [None] * (size - kept)
+        for pos, value in assigned.items():
+            decoded[pos] = value
+        return self._encode(decoded)
+
+    @staticmethod
+    def _encode(values):
+        dictionary = []
+        index = {}
+        codes = array('H')
+        for value in values:
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(dictionary)
+                dictionary.append(value)
+            codes.append(code)
+        return dictionary, codes
+
+    def row(self, pos):
+        """Tạo LaptopRow cho dòng tại vị trí pos"""
+        values = {c: self.columns[c][pos] for c in PLAIN_COLUMNS}
+        values['id'] = self.ids[pos]
+        values['price'] = self.prices[pos]
+        values['ram_gb'] = self.ram[pos]
+        values['brand'] = self.brand_values[self.brand_codes[pos]]
+        values['category'] = self.category_values[self.category_codes[pos]]
+        return LaptopRow(**values)
+
+    def get(self, laptop_id):
+        pos = self.positions.get(laptop_id)
+        return self.row(pos) if pos is not None else None
+
+    def summary(self):
+        """Thống kê tổng quan (số lượng, giá min/max/avg, phân bố brand/category); tính một lần mỗi snapshot"""
+        if self._summary is None:
+            def distribution(values, codes):
+                counts = [0] * len(values)
+                for code in codes:
+                    counts[code] += 1
+                return sorted(zip(values, counts), key=lambda item: (item[0] is None, item[0] or ''))
+            priced = [p for p in self.prices if p]
+            self._summary = {
+                "total_laptops": self.size,
+                "total_brands": sum(1 for v in self.brand_values if v is not None),
+                "total_categories": sum(1 for v in self.category_values if v is not None),
+                "price_stats": {
+                    "min": min(priced) if priced else 0,
+                    "max": max(priced) if priced else 0,
+                    "avg": int(sum(priced) / len(priced)) if priced else 0
+                },
+                "category_distribution": [
+                    {"category": cat, "count": count}
+                    for cat, count in distribution(self.category_values, self.category_codes)
+                ],
+                "brand_distribution": [
+                    {"brand": brand, "count": count}
+                    for brand, count in distribution(self.brand_values, self.brand_codes)
+                ]
+            }
+        return self._summary
+
+    @property
+    def brands(self):
+        return list(self.brand_values)
+
+    @property
+    def categories(self):
+        return list(self.category_values)
+
+    def filter(self, brand=None, category=None, price_min=None, price_max=None,
+               ram_min=None, search=None, sort='id', ids=None):
+        """Trả về danh sách vị trí dòng thỏa filter, theo thứ tự sort
+
+        Nếu truyền ids (ví dụ kết quả full-text đã xếp hạng) thì chỉ xét các id đó
+        và giữ nguyên thứ tự của ids thay vì sort.
+        """
+        if ids is not None:
+            order = [self.positions[i] for i in ids if i in self.positions]
+        else:
+            order = self.orders.get(sort) or self.orders['id']
+
+        brand_code = category_code = None
+        if brand:
+            brand_code = self.brand_index.get(brand)
+            if brand_code is None:
+                return []
+        if category:
+            category_code = self.category_index.get(category)
+            if category_code is None:
+                return []
+        needle = search.lower() if search else None
+
+        brand_codes, category_codes = self.brand_codes, self.category_codes
+        prices, ram, names = self.prices, self.ram, self.names_lower
+        matched = []
+        for pos in order:
+            if brand_code is not None and brand_codes[pos] != brand_code:
+                continue
+            if category_code is not None and category_codes[pos] != category_code:
+                continue
+            if price_min is not None and prices[pos] < price_min:
+                continue
+            if price_max is not None and prices[pos] > price_max:
+                continue
+            if ram_min is not None and ram[pos] < ram_min:
+                continue
+            if needle is not None and needle not in names[pos]:
+                continue
+            matched.append(pos)
+        return matched
+
+    def query(self, page=1, per_page=20, highlights=None, **filters):
+        """Lọc + phân trang, tương đương query.paginate(error_out=False)"""
+        page = max(page or 1, 1)
+        per_page = max(per_page or 20, 1)
+        matched = self.filter(**filters)
+        start = (page - 1) * per_page
+        items = [self.row(pos) for pos in matched[start:start + per_page]]
+        if highlights:
+            highlights = {it.id: highlights[it.id] for it in items if it.id in highlights}
+        return SnapshotPage(items, len(matched), page, per_page, highlights)
+
+    def keyset(self, cursor=None, per_page=20, **filters):
+        """Phân trang keyset theo (price, id) tăng dần; total có sẵn nên không cần COUNT"""
+        direction, key = decode_cursor(cursor)
+        per_page = max(per_page or 20, 1)
+        matched = self.filter(sort='price_asc', **filters)
+        prices, ids = self.prices, self.ids
+        sort_key = lambda pos: (prices[pos], ids[pos])
+        if direction == 'p':
+            end = bisect_left(matched, key, key=sort_key)
+            start = max(end - per_page, 0)
+        else:
+            start = bisect_right(matched, key, key=sort_key) if direction == 'n' else 0
+            end = start + per_page
+        items = [self.row(pos) for pos in matched[start:end]]
+        return KeysetPage(items, per_page, has_next=end < len(matched),
+                          has_prev=start > 0, total=len(matched))
+
+    def search(self, search, page=1, per_page=20, **filters):
+        """Tìm full-text (BM25) rồi lọc + phân trang trên snapshot theo thứ tự liên quan"""
+        hits = search_index.search(search, match_all=True)
+        if hits is None:
+            return self.query(page=page, per_page=per_page, **filters)
+        return self.query(
+            page=page,
+            per_page=per_page,
+            ids=[hit.id for hit in hits],
+            highlights={hit.id: hit.highlights for hit in hits},
+            **filters
+        )
+
+class CatalogStore:
+    """Giữ snapshot hiện tại; vá hoặc build lại khi catalog thay đổi rồi swap tham chiếu
+
+    Reader luôn đọc snapshot cũ cho tới khi snapshot mới sẵn sàng nên không bị block.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        with app.app_context():
+            # Patch chạy trong after_commit khi writer còn giữ connection: đọc qua pool đọc
+            self._engine = read_engine()
+        self._snapshot = None
+        app.extensions['catalog_store'] = self
+        on_catalog_change(self._on_change)
+
+    def _on_change(self, changes):
+        if self._engine is not None and self._snapshot is not None:
+            self.patch(changes)
+
+    def _load(self, ids=None):
+        """(phiên bản catalog, các dòng laptop); phiên bản đọc trước nên không mới hơn dữ liệu"""
+        table = Laptop.__table__
+        query = select(*[table.c[c] for c in COLUMNS])
+        if ids is not None:
+            query = query.where(table.c.id.in_(ids))
+        with self._engine.connect() as conn:
+            version = 0
+            if changelog_enabled():
+                version = conn.execute(select(func.max(CatalogChange.__table__.c.id))).scalar() or 0
+            return version, conn.execute(query).mappings().all()
+
+    def _rebuild(self):
+        version, rows = self._load()
+        snapshot = CatalogSnapshot(rows, version)
+        self._snapshot = snapshot
+        logger.info(f"Catalog snapshot rebuilt: {snapshot.size} laptops")
+        return snapshot
+
+    def rebuild(self):
+        """Đọc lại toàn bộ bảng laptops bằng connection riêng và swap snapshot"""
+        with self._lock:
+            return self._rebuild()
+
+    def patch(self, changes):
+        """Chỉ đọc lại các laptop trong changes và swap snapshot đã vá
+
+        changes có dạng như on_catalog_change; thay đổi quá lớn thì build lại toàn bộ.
+        """
+        with self._lock:
+            current = self._snapshot
+            ids = changes['insert'] | changes['update']
+            if current is None or len(ids) + len(changes['delete']) > PATCH_MAX_ROWS:
+                return self._rebuild()
+            version, rows = self._load(ids or ())
+            # Laptop đã bị xóa bởi commit sau đó thì coi như xóa
+            deleted = changes['delete'] | (ids - {row['id'] for row in rows})
+            snapshot = current.patch(rows, deleted, version)
+            if snapshot is None:
+                return self._rebuild()
+            self._snapshot = snapshot
+            return snapshot
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.rebuild()
+        return snapshot
+
+catalog_store = CatalogStore()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đồng bộ cache giữa các worker qua bảng catalog_changes
+Mỗi worker kiểm tra MAX(id) của nhật ký (tối đa một lần mỗi CATALOG_SYNC_INTERVAL giây),
+đọc các dòng mới do process khác ghi và phát sự kiện on_catalog_change với đúng các laptop bị ảnh hưởng
+Bảng được tạo lại (ví dụ manage_data.py seed) nhận ra qua dòng đã đọc cuối cùng: khi dòng đó mất
+hoặc có created_at khác thì đọc lại từ đầu, kể cả khi MAX(id) mới đã vượt vị trí cũ
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, delete
+from models import db, CatalogChange
+from db_profile import read_engine
+import catalog_events
+
+logger = logging.getLogger(__name__)
+
+class CatalogSync:
+    """Theo dõi catalog_changes và phát lại thay đổi của worker khác trong process này"""
+
+    def __init__(self, interval=1.0, retention_days=7):
+        self.interval = interval
+        self.retention_days = retention_days
+        self._engine = None
+        self._read_engine = None
+        self._last_id = 0
+        # created_at của dòng _last_id: dòng đó mất hoặc khác nghĩa là bảng đã được tạo lại
+        self._last_created = None
+        self._next_check = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.interval = app.config.get('CATALOG_SYNC_INTERVAL', self.interval)
+        self.retention_days = app.config.get('CATALOG_SYNC_RETENTION_DAYS', self.retention_days)
+        table = CatalogChange.__table__
+        with app.app_context():
+            self._engine = db.engine
+            self._read_engine = read_engine()
+            table.create(bind=db.engine, checkfirst=True)
+            with self._engine.begin() as conn:
+                # Dọn nhật ký cũ: worker nào cũng đã đọc qua từ lâu. Giữ dòng mới nhất để
+                # MAX(id), cũng là phiên bản catalog (catalog_version.py), không bị lùi về 0
+                self._last_id, self._last_created = self._position(conn)
+                cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+                conn.execute(delete(table).where(table.c.created_at < cutoff, table.c.id < self._last_id))
+        catalog_events.enable_changelog()
+        app.extensions['catalog_sync'] = self
+        app.before_request(self.poll)
+
+    def poll(self):
+        """Gọi trước mỗi request; chỉ một thread kiểm tra và tối đa một lần mỗi interval"""
+        if self._engine is None or time.monotonic() < self._next_check:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + self.interval
+            self._sync()
+        except Exception as e:
+            logger.error(f"Catalog sync error: {e}")
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _position(conn):
+        """(MAX(id), created_at của dòng đó) của nhật ký, (0, None) khi bảng rỗng"""
+        table = CatalogChange.__table__
+        row = conn.execute(select(table.c.id, table.c.created_at).order_by(table.c.id.desc()).limit(1)).first()
+        return (row.id, row.created_at) if row else (0, None)
+
+    def _sync(self):
+        table = CatalogChange.__table__
+        with self._read_engine.connect() as conn:
+            last_created = select(table.c.created_at).where(table.c.id == self._last_id).scalar_subquery()
+            max_id, created = conn.execute(select(func.max(table.c.id), last_created)).one()
+            max_id = max_id or 0
+            if self._last_id and created != self._last_created:
+                # Dòng đã đọc cuối cùng không còn: bảng được tạo lại, đọc lại từ đầu
+                # (dòng bị worker khác dọn vì quá retention_days cũng vào đây: chỉ phát lại thừa, vô hại)
+                logger.info("Catalog change log was recreated, re-reading it from the start")
+                self._last_id = 0
+            elif max_id == self._last_id:
+                return
+            rows = conn.execute(
+                select(table.c.id, table.c.laptop_id, table.c.op, table.c.origin, table.c.created_at)
+                .where(table.c.id > self._last_id, table.c.id <= max_id)
+                .order_by(table.c.id)
+            ).all()
+        if rows:
+            self._last_id, self._last_created = rows[-1].id, rows[-1].created_at
+        else:
+            self._last_id, self._last_created = 0, None
+
+        foreign = [row for row in rows if row.origin != catalog_events.ORIGIN]
+        if not foreign:
+            return
+        changes = {'insert': set(), 'update': set(), 'delete': set()}
+        for row in foreign:
+            if row.op in changes:
+                changes[row.op].add(row.laptop_id)
+        logger.info(f"Catalog changes from other workers: {len(foreign)} rows")
+        catalog_events.dispatch(changes)
+
+catalog_sync = CatalogSync()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Phiên bản catalog (tăng dần sau mỗi lần ghi Laptop) và HTTP ETag/304 cho các API đọc
+"""
+
+import zlib
+from functools import wraps
+from flask import request, make_response
+from catalog_snapshot import catalog_store
+
+class CatalogVersion:
+    """Phiên bản catalog của snapshot đang phục vụ (xem CatalogSnapshot.token)
+
+    Token đi cùng snapshot nên chỉ đổi sau khi snapshot mới đã swap xong: không có lúc
+    token mới mà dữ liệu còn cũ. Token dựa trên MAX(catalog_changes.id), dùng chung giữa
+    các worker, nên cùng một catalog cho cùng ETag và URL ?v= ở mọi worker.
+    """
+
+    @property
+    def value(self):
+        return catalog_store.get().version
+
+    @property
+    def token(self):
+        return catalog_store.get().token
+
+catalog_version = CatalogVersion()
+
+def conditional_get(max_age=0):
+    """Decorator: ETag mạnh theo phiên bản catalog + URL, trả 304 trước khi view chạy
+
+    - max_age: thời gian cache (giây) cho URL có tham số v trùng phiên bản hiện tại
+    Chỉ dùng cho JSON công khai: trang HTML có CSRF token (hết hạn theo WTF_CSRF_TIME_LIMIT,
+    gắn với session) nên không được trả 304 cho bản đã render trước đó.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            token = catalog_version.token
+            etag = f"{token}-{zlib.crc32(request.full_path.encode()):08x}"
+
+            if request.args.get('v') == token and max_age:
+                # URL có phiên bản: nội dung không đổi cho tới khi catalog đổi phiên bản
+                cache_control = f"public, max-age={max_age}, immutable"
+            else:
+                cache_control = "public, no-cache"
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return decorated_function
+    return decorator
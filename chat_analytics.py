@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analytics cho chatbot: mỗi lượt chat là một sự kiện (intent, preference, số laptop,
+độ trễ, token, cache, lý do bị chặn)
+- record() chỉ thêm vào ring buffer trong bộ nhớ và cộng vào bộ đếm tổng hợp sẵn
+- Thread nền ghi buffer xuống bảng chat_events theo lô (mỗi CHAT_EVENTS_FLUSH_INTERVAL giây
+  hoặc khi đủ CHAT_EVENTS_BATCH_SIZE sự kiện); buffer đầy thì bỏ sự kiện cũ nhất
+- /api/chat/analytics đọc bộ đếm: từ lúc khởi động và cửa sổ trượt 60 phút
+  (nạp lại từ chat_events khi khởi động). Bộ đếm tính theo từng process
+"""
+
+import time
+import atexit
+import threading
+import logging
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete
+from models import db, ChatEvent
+
+logger = logging.getLogger(__name__)
+
+# Cận trên (ms) các bucket histogram độ trễ; bucket cuối là phần còn lại
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Mức ngân sách (triệu VND) để gom nhóm preference
+BUDGET_BANDS = ((15, '<15tr'), (25, '15-25tr'), (40, '25-40tr'))
+ROLLING_MINUTES = 60
+
+EVENT_FIELDS = tuple(c.name for c in ChatEvent.__table__.columns if c.name != 'id')
+
+def chat_event(endpoint, result, latency_ms, status=None):
+    """Sự kiện (dict theo cột chat_events) từ kết quả của ChatbotService"""
+    prefs = result.get('preferences') or {}
+    tokens = result.get('prompt_tokens') or {}
+    if status is None:
+        if result.get('blocked'):
+            status = 'blocked'
+        else:
+            status = 'ok' if result.get('success') else 'error'
+    return {
+        'created_at': datetime.utcnow(),
+        'endpoint': endpoint,
+        'status': status,
+        'intent': result.get('intent'),
+        'category': prefs.get('category'),
+        'brand': prefs.get('brand'),
+        'budget_min': int(prefs.get('budget_min') or 0) or None,
+        'budget_max': int(prefs.get('budget_max') or 0) or None,
+        'ram_min': prefs.get('ram_min'),
+        'gpu_required': bool(prefs.get('gpu_required')),
+        'laptops_count': result.get('relevant_laptops_count', 0),
+        'latency_ms': round(latency_ms, 2),
+        'input_tokens': tokens.get('input', 0),
+        'saved_tokens': tokens.get('saved', 0),
+        'cached': bool(result.get('cached')),
+        'fallback': result.get('fallback'),
+        'blocked_category': result.get('category') if result.get('blocked') else None,
+        'route': result.get('route')
+    }
+
+def budget_band(event):
+    budget = event['budget_max'] or event['budget_min']
+    if not budget:
+        return 'none'
+    millions = budget / 1_000_000
+    for limit, label in BUDGET_BANDS:
+        if millions < limit:
+            return label
+    return '>=40tr'
+
+class _Aggregate:
+    """Bộ đếm cộng dồn được (merge) cho một khoảng thời gian"""
+
+    def __init__(self):
+        self.requests = 0
+        self.counters = {name: Counter() for name in (
+            'endpoint', 'status', 'intent', 'category', 'brand', 'budget', 'blocked', 'fallback', 'route'
+        )}
+        self.cached = 0
+        self.zero_results = 0
+        self.input_tokens = 0
+        self.saved_tokens = 0
+        self.latency = {}  # endpoint -> số lượng theo bucket
+
+    def add(self, event):
+        self.requests += 1
+        c = self.counters
+        c['endpoint'][event['endpoint']] += 1
+        c['status'][event['status']] += 1
+        if event['intent']:
+            c['intent'][event['intent']] += 1
+        if event['category']:
+            c['category'][event['category']] += 1
+        if event['brand']:
+            c['brand'][event['brand']] += 1
+        if event['status'] == 'ok':
+            c['budget'][budget_band(event)] += 1
+            if not event['laptops_count']:
+                self.zero_results += 1
+        if event['blocked_category']:
+            c['blocked'][event['blocked_category']] += 1
+        if event['fallback']:
+            c['fallback'][event['fallback']] += 1
+        if event['route']:
+            c['route'][event['route']] += 1
+        self.cached += bool(event['cached'])
+        self.input_tokens += event['input_tokens'] or 0
+        self.saved_tokens += event['saved_tokens'] or 0
+        buckets = self.latency.setdefault(event['endpoint'], [0] * (len(LATENCY_BUCKETS_MS) + 1))
+        buckets[self._bucket(event['latency_ms'])] += 1
+
+    @staticmethod
+    def _bucket(latency_ms):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                return i
+        return len(LATENCY_BUCKETS_MS)
+
+    def merge(self, other):
+        self.requests += other.requests
+        for name, counter in other.counters.items():
+            self.counters[name].update(counter)
+        self.cached += other.cached
+        self.zero_results += other.zero_results
+        self.input_tokens += other.input_tokens
+        self.saved_tokens += other.saved_tokens
+        for endpoint, buckets in other.latency.items():
+            mine = self.latency.setdefault(endpoint, [0] * len(buckets))
+            for i, count in enumerate(buckets):
+                mine[i] += count
+        return self
+
+    def _local_answers(self):
+        routes = self.counters['route']
+        return routes['knowledge_base'] + routes['cache'] + routes['blocked']
+
+    @staticmethod
+    def _percentile(buckets, p):
+        """Cận trên của bucket chứa percentile p (None nếu rơi vào bucket cuối)"""
+        target = sum(buckets) * p / 100
+        seen = 0
+        for i, count in enumerate(buckets):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def to_dict(self):
+        bounds = LATENCY_BUCKETS_MS + (None,)
+        return {
+            "requests": self.requests,
+            **{name: dict(counter.most_common()) for name, counter in self.counters.items()},
+            "cache_hit_rate": round(self.cached / self.requests, 3) if self.requests else 0.0,
+            # Tỉ lệ lượt được trả lời mà không gọi model (knowledge base, cache, chặn)
+            "local_answer_rate": round(self._local_answers() / self.requests, 3) if self.requests else 0.0,
+            "zero_result_answers": self.zero_results,
+            "input_tokens": self.input_tokens,
+            "saved_tokens": self.saved_tokens,
+            "latency_ms": {
+                endpoint: {
+                    # le_ms = cận trên của bucket (None: lớn hơn bucket cuối)
+                    "histogram": [{"le_ms": bound, "count": count} for bound, count in zip(bounds, buckets)],
+                    "p50": self._percentile(buckets, 50),
+                    "p95": self._percentile(buckets, 95),
+                    "p99": self._percentile(buckets, 99)
+                }
+                for endpoint, buckets in sorted(self.latency.items())
+            }
+        }
+
+class ChatAnalytics:
+    """Ring buffer + bộ đếm tổng hợp sẵn; thread nền flush xuống SQLite"""
+
+    def __init__(self, buffer_size=10000, batch_size=200, flush_interval=5.0, retention_days=30):
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._buffer = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._engine = None
+        self._next_prune = 0
+        self._reset()
+
+    def _reset(self):
+        self.totals = _Aggregate()
+        self.minutes = deque()  # (phút, _Aggregate), cũ nhất trước
+        self.started_at = datetime.utcnow()
+        self.stats = {'recorded': 0, 'flushed': 0, 'dropped': 0, 'flush_errors': 0}
+
+    def init_app(self, app):
+        self.buffer_size = app.config.get('CHAT_EVENTS_BUFFER_SIZE', self.buffer_size)
+        self.batch_size = app.config.get('CHAT_EVENTS_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('CHAT_EVENTS_FLUSH_INTERVAL', self.flush_interval)
+        self.retention_days = app.config.get('CHAT_EVENTS_RETENTION_DAYS', self.retention_days)
+        self.flush()
+        with app.app_context():
+            self._engine = db.engine
+            ChatEvent.__table__.create(bind=db.engine, checkfirst=True)
+            self._add_missing_columns()
+        with self._lock:
+            self._buffer = deque(maxlen=self.buffer_size)
+            self._reset()
+        self._warm_up()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='chat-analytics-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+        app.extensions['chat_analytics'] = self
+
+    def _add_missing_columns(self):
+        """Thêm cột mới (ví dụ route) vào bảng chat_events tạo từ phiên bản trước"""
+        existing = {c['name'] for c in db.inspect(self._engine).get_columns('chat_events')}
+        with self._engine.begin() as conn:
+            for column in ChatEvent.__table__.columns:
+                if column.name not in existing:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE chat_events ADD COLUMN {column.name} {column.type.compile(self._engine.dialect)}"
+                    )
+
+    def _warm_up(self):
+        """Nạp cửa sổ 60 phút gần nhất từ chat_events (một query khi khởi động)"""
+        table = ChatEvent.__table__
+        since = datetime.utcnow() - timedelta(minutes=ROLLING_MINUTES)
+        try:
+            with self._engine.connect() as conn:
+                rows = conn.execute(
+                    select(*[table.c[f] for f in EVENT_FIELDS])
+                    .where(table.c.created_at >= since)
+                    .order_by(table.c.created_at)
+                ).mappings().all()
+        except Exception as e:
+            logger.error(f"Chat analytics warm-up error: {e}")
+            return
+        now, minute = datetime.utcnow(), int(time.time() // 60)
+        with self._lock:
+            for row in rows:
+                age = int((now - row['created_at']).total_seconds() // 60)
+                self._minute_bucket(minute - age).add(row)
+
+    # ---------- Ghi ----------
+    def _minute_bucket(self, minute):
+        # Phút nhỏ hơn phút mới nhất (đồng hồ lùi) được cộng vào phút mới nhất
+        if not self.minutes or self.minutes[-1][0] < minute:
+            self.minutes.append((minute, _Aggregate()))
+            while self.minutes[0][0] <= minute - ROLLING_MINUTES:
+                self.minutes.popleft()
+        return self.minutes[-1][1]
+
+    def record(self, event):
+        """Thêm sự kiện (xem chat_event); không chạm DB trên luồng request"""
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.stats['dropped'] += 1
+            self._buffer.append(event)
+            self.stats['recorded'] += 1
+            self.totals.add(event)
+            self._minute_bucket(int(time.time() // 60)).add(event)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    # ---------- Flush ----------
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Ghi toàn bộ buffer xuống chat_events theo lô; lỗi thì bỏ lô đó và ghi log"""
+        with self._flush_lock:
+            if self._engine is None:
+                return
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    break
+                try:
+                    with self._engine.begin() as conn:
+                        conn.execute(insert(ChatEvent.__table__), batch)
+                    with self._lock:
+                        self.stats['flushed'] += len(batch)
+                except Exception as e:
+                    with self._lock:
+                        self.stats['flush_errors'] += 1
+                    logger.error(f"Chat analytics flush error ({len(batch)} events dropped): {e}")
+                    break
+            if time.monotonic() >= self._next_prune:
+                self.prune()
+
+    def prune(self):
+        """Xóa sự kiện cũ hơn CHAT_EVENTS_RETENTION_DAYS ngày"""
+        self._next_prune = time.monotonic() + 3600
+        table = ChatEvent.__table__
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        try:
+            with self._engine.begin() as conn:
+                removed = conn.execute(delete(table).where(table.c.created_at < cutoff)).rowcount
+            if removed:
+                logger.info(f"Pruned {removed} old chat events")
+        except Exception as e:
+            logger.error(f"Chat events prune error: {e}")
+
+    # ---------- Báo cáo ----------
+    def report(self):
+        with self._lock:
+            oldest = int(time.time() // 60) - ROLLING_MINUTES
+            last_hour = _Aggregate()
+            for minute, aggregate in self.minutes:
+                if minute > oldest:
+                    last_hour.merge(aggregate)
+            return {
+                "since": self.started_at.isoformat() + 'Z',
+                "since_start": self.totals.to_dict(),
+                "last_hour": last_hour.to_dict(),
+                "buffer": {"pending": len(self._buffer), "capacity": self._buffer.maxlen, **self.stats}
+            }
+
+chat_analytics = ChatAnalytics()
@@ -0,0 +1,143 @@
+"""
+Compiled matcher for chatbot rule sets (block filter, intents, preferences)
+Rules are compiled once per service instead of being re-scanned pattern by pattern:
+- every literal keyword (categories, brands, GPU words) is found in one regex pass
+- each ordered rule group (block category, intent) is one combined alternation,
+  with a single gate regex for the whole block list
+Order-dependent rules are resolved exactly like the sequential scans did.
+"""
+
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+def combine(patterns: List[str]) -> "re.Pattern":
+    """One regex that matches wherever any of the patterns matches (same as any(re.search))"""
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+class KeywordSet:
+    """All literal keywords present in a text, found with one finditer pass"""
+
+    def __init__(self, keywords: List[str]):
+        # Longest first: at each position the regex reports the longest keyword starting there;
+        # shorter keywords at the same position are its prefixes and are added from `closure`
+        self.keywords = sorted(set(keywords), key=len, reverse=True)
+        self.regex = re.compile('(?=(' + '|'.join(re.escape(k) for k in self.keywords) + '))')
+        self.closure = {k: [p for p in self.keywords if k.startswith(p)] for k in self.keywords}
+
+    def present(self, text: str) -> Set[str]:
+        found = set()
+        for match in self.regex.finditer(text):
+            found.update(self.closure[match.group(1)])
+        return found
+
+class MessageScan:
+    """Lowercased message plus the literal keywords it contains"""
+
+    def __init__(self, text: str, keywords: Set[str]):
+        self.text = text
+        self.keywords = keywords
+
+class MessageMatcher:
+    """
+    Block category, intent and user preferences of a message
+    Built from the same rule dictionaries the sequential code used
+    """
+
+    def __init__(self, blocked_patterns: Dict[str, List[str]],
+                 intent_patterns: Optional[Dict[str, List[str]]] = None,
+                 category_keywords: Optional[Dict[str, List[str]]] = None,
+                 brands: Optional[List[str]] = None,
+                 gpu_keywords: Optional[List[str]] = None,
+                 budget_patterns: Optional[List[str]] = None,
+                 ram_pattern: Optional[str] = None):
+        self.blocked_patterns = blocked_patterns
+        self.block_gate = combine([p for patterns in blocked_patterns.values() for p in patterns])
+        self.block_groups = [(category, combine(patterns)) for category, patterns in blocked_patterns.items()]
+        self.intent_groups = [(intent, combine(patterns)) for intent, patterns in (intent_patterns or {}).items()]
+
+        self.category_keywords = category_keywords or {}
+        self.brands = brands or []
+        self.gpu_keywords = gpu_keywords or []
+        literals = [k for keywords in self.category_keywords.values() for k in keywords]
+        literals += self.brands + self.gpu_keywords
+        self.keyword_set = KeywordSet(literals) if literals else None
+
+        self.budget_patterns = [re.compile(p) for p in (budget_patterns or [])]
+        self.ram_pattern = re.compile(ram_pattern) if ram_pattern else None
+
+    def scan(self, message_lower: str) -> MessageScan:
+        keywords = self.keyword_set.present(message_lower) if self.keyword_set else set()
+        return MessageScan(message_lower, keywords)
+
+    # ---------- Resolving rules (same order semantics as the sequential scans) ----------
+    def blocked(self, scan: MessageScan) -> Tuple[str, str]:
+        """First category (then pattern) in definition order that matches, or ('', '')"""
+        if not self.block_gate.search(scan.text):
+            return '', ''
+        for category, regex in self.block_groups:
+            if regex.search(scan.text):
+                # Pattern name only for logging; re's own cache makes this cheap and it is rare
+                for pattern in self.blocked_patterns[category]:
+                    if re.search(pattern, scan.text):
+                        return category, pattern
+        return '', ''
+
+    def intent(self, scan: MessageScan) -> str:
+        for intent, regex in self.intent_groups:
+            if regex.search(scan.text):
+                return intent
+        return 'general'
+
+    def preferences(self, scan: MessageScan) -> Dict:
+        preferences = {
+            'budget_min': None,
+            'budget_max': None,
+            'category': None,
+            'brand': None,
+            'ram_min': None,
+            'gpu_required': False
+        }
+        text = scan.text
+        # Budget and RAM patterns all need a digit
+        has_digit = any(ch.isdigit() for ch in text)
+
+        # Budget: every matching pattern is applied in order, later ones overwrite
+        for regex in self.budget_patterns if has_digit else ():
+            match = regex.search(text)
+            if not match:
+                continue
+            amount = int(match.group(1))
+            if 'triệu' in match.group(0) or 'tr' in match.group(0) or 'million' in match.group(0):
+                amount *= 1000000
+            elif 'nghìn' in match.group(0) or 'k' in match.group(0):
+                amount *= 1000
+
+            if 'dưới' in match.group(0):
+                preferences['budget_max'] = amount
+            elif 'trên' in match.group(0):
+                preferences['budget_min'] = amount
+            else:
+                preferences['budget_max'] = amount * 1.2  # 20% buffer
+                preferences['budget_min'] = amount * 0.8
+
+        keywords = scan.keywords
+        # Category: the last category (in definition order) with any keyword present
+        for category, category_words in self.category_keywords.items():
+            if not keywords.isdisjoint(category_words):
+                preferences['category'] = category
+
+        # Brand: first brand in list order
+        for brand in self.brands:
+            if brand in keywords:
+                preferences['brand'] = brand.title()
+                break
+
+        # RAM requirement
+        if has_digit and self.ram_pattern is not None:
+            ram_match = self.ram_pattern.search(text)
+            if ram_match:
+                preferences['ram_min'] = int(ram_match.group(1) or ram_match.group(2))
+
+        preferences['gpu_required'] = not keywords.isdisjoint(self.gpu_keywords)
+
+        return preferences
@@ -5,11 +5,53 @@ Enhanced with conversation memory, intent recognition, smart context, and securi
 
 import re
 import json
+import time
+import hashlib
+import threading
 import logging
-from typing import List, Dict, Optional, Tuple
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple, Iterator
 from datetime import datetime, timedelta
-from models import Laptop, db
+from catalog_snapshot import catalog_store
+from catalog_version import catalog_version
+import search_index
+from retrieval_index import retrieval_index
+from laptop_summaries import summary_store
 import anthropic
+from chat_matcher import MessageMatcher
+from prompt_builder import PromptBuilder
+from circuit_breaker import CircuitBreaker
+from upstream_gate import UpstreamGate, UpstreamBusy
+from spec_knowledge import SpecKnowledge
+
+# Preference extraction rules (order matters, see MessageMatcher.preferences)
+BUDGET_PATTERNS = [
+    r'(\d+)\s*(triệu|tr|million)',
+    r'(\d+)\s*(nghìn|k)',
+    r'giá.*(\d+)',
+    r'dưới.*(\d+)',
+    r'trên.*(\d+)'
+]
+BRANDS = ['asus', 'dell', 'hp', 'lenovo', 'acer', 'msi', 'macbook', 'apple']
+RAM_PATTERN = r'(\d+)\s*gb.*ram|ram.*(\d+)\s*gb'
+GPU_KEYWORDS = ['gpu', 'card đồ họa', 'rtx', 'gtx', 'gaming', 'thiết kế']
+# Integrated GPUs excluded when a dedicated GPU is required (case-insensitive, like SQL LIKE)
+INTEGRATED_GPUS = ['intel uhd', 'amd radeon graphics', 'intel graphics']
+# Minimum n-gram similarity for fuzzy search results
+SEARCH_MIN_SCORE = 0.1
+# Smallest time window worth starting another upstream attempt in
+MIN_ATTEMPT_SECONDS = 1.0
+
+def is_retryable(error: Exception) -> bool:
+    """Connection problems, timeouts, 408/409/429 and 5xx (same set as the SDK's own retries)"""
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
 
 class SecurityFilter:
     """
@@ -61,6 +103,9 @@ class SecurityFilter:
             'system_info': "Tôi không thể cung cấp thông tin về hệ thống nội bộ. Tôi chỉ có thể tư vấn về laptop và công nghệ tiêu dùng.",
             'general': "Tôi chỉ có thể tư vấn về laptop, thông số kỹ thuật và giúp bạn chọn laptop phù hợp. Bạn có thể hỏi về CPU, RAM, GPU, giá cả hoặc so sánh các mẫu laptop."
         }
+        
+        # All blocked patterns compiled once into a single-pass matcher
+        self.matcher = MessageMatcher(self.blocked_patterns)
     
     def is_query_blocked(self, message: str) -> tuple[bool, str, str]:
         """
@@ -68,15 +113,15 @@ class SecurityFilter:
         Returns: (is_blocked, category, response)
         """
         message_lower = message.lower().strip()
-        
-        # Check for blocked patterns
-        for category, patterns in self.blocked_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    self.logger.warning(f"Blocked query - Category: {category}, Pattern: {pattern}, Query: {message[:50]}...")
-                    return True, category, self.blocked_responses.get(category, self.blocked_responses['general'])
-        
-        return False, '', ''
+        category, pattern = self.matcher.blocked(self.matcher.scan(message_lower))
+        return self.block_result(category, pattern, message)
+    
+    def block_result(self, category: str, pattern: str, message: str) -> tuple[bool, str, str]:
+        """Build the (is_blocked, category, response) tuple for a matched block rule"""
+        if not category:
+            return False, '', ''
+        self.logger.warning(f"Blocked query - Category: {category}, Pattern: {pattern}, Query: {message[:50]}...")
+        return True, category, self.blocked_responses.get(category, self.blocked_responses['general'])
     
     def sanitize_input(self, message: str) -> str:
         """
@@ -119,12 +164,79 @@ class SecurityFilter:
         
         return response
 
+class ChatTurn:
+    """
+    State of one chat request moving through the pipeline:
+    sanitize -> filter -> classify -> extract -> [explain] -> retrieve -> prompt -> generate -> validate
+    Each stage runs at most once per request and records its duration in `timings`
+    `route` tells which path answered: blocked, knowledge_base, cache, model or fallback
+    """
+    
+    def __init__(self, message: str, history: Optional[List[Dict]] = None):
+        self.message = message
+        self.history = history or []
+        self.sanitized = ""
+        self.scan = None
+        self.blocked = (False, "", "")
+        self.intent = None
+        self.preferences = None
+        self.laptops = []
+        self.prompt = None
+        self.cache_key = None
+        self.result = None  # set once the turn is answered (early exit, cache hit or validated output)
+        self.fallback = None  # why a local answer was used: 'open', 'timeout' or 'error'
+        self.route = None
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[f"{name}_ms"] = elapsed_ms(started)
+
 class ChatbotService:
-    def __init__(self, anthropic_api_key: str):
-        self.client = anthropic.Anthropic(api_key=anthropic_api_key)
-        self.max_tokens = 1000
-        self.temperature = 0.7
+    """
+    Chat service shared by all requests of a worker (created once in create_app)
+    Holds no per-request state, so one instance is safe to use from many threads;
+    the Anthropic client keeps a keep-alive connection pool across requests
+    """
+    
+    def __init__(self, anthropic_api_key: str, timeout: float = 30.0, connect_timeout: float = 5.0,
+                 max_retries: int = 2, max_tokens: int = 1000, temperature: float = 0.7,
+                 base_url: Optional[str] = None, response_cache=None,
+                 history_token_budget: int = 800, prompt_laptops: int = 3, response_laptops: int = 5,
+                 latency_budget: float = 10.0, breaker: Optional[CircuitBreaker] = None,
+                 gate: Optional[UpstreamGate] = None, knowledge_base: bool = True):
+        # The client owns a keep-alive connection pool that is reused by every request
+        self.client = anthropic.Anthropic(
+            api_key=anthropic_api_key,
+            base_url=base_url,
+            max_retries=max_retries,
+            timeout=anthropic.Timeout(timeout, connect=connect_timeout)
+        )
+        # Chat calls retry inside their latency budget instead of the SDK's own retry loop
+        self.budget_client = self.client.with_options(max_retries=0)
+        self.latency_budget = latency_budget
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        # Caps concurrent upstream calls and coalesces identical in-flight prompts
+        self.gate = gate or UpstreamGate()
+        # Spec explanations answered in-process; None sends every explain question to the model
+        self.knowledge = SpecKnowledge() if knowledge_base else None
+        self.fallbacks = {"open": 0, "timeout": 0, "error": 0, "busy": 0}
+        self._fallback_lock = threading.Lock()
+        self.model = "claude-3-haiku-20240307"
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        # Optional ResponseCache for first-turn questions (no conversation history)
+        self.response_cache = response_cache
         self.security_filter = SecurityFilter()
+        self.prompt_builder = PromptBuilder(history_token_budget, prompt_laptops)
+        # Laptops returned to the client; the prompt only uses the top prompt_laptops of them
+        self.response_laptops = max(response_laptops, prompt_laptops)
         self.logger = logging.getLogger(__name__)
         
         # Intent patterns for Vietnamese
@@ -163,107 +275,94 @@ class ChatbotService:
             'student': ['học', 'sinh viên', 'student', 'học tập', 'nghiên cứu'],
             'office': ['văn phòng', 'office', 'làm việc', 'word', 'excel', 'powerpoint']
         }
+        
+        # Block, intent and preference rules compiled once; one regex pass per message
+        self.matcher = MessageMatcher(
+            self.security_filter.blocked_patterns,
+            intent_patterns=self.intent_patterns,
+            category_keywords=self.category_keywords,
+            brands=BRANDS,
+            gpu_keywords=GPU_KEYWORDS,
+            budget_patterns=BUDGET_PATTERNS,
+            ram_pattern=RAM_PATTERN
+        )
+
+    @classmethod
+    def from_config(cls, config, response_cache=None) -> "ChatbotService":
+        """Build the service from Flask config (CHATBOT_* keys)"""
+        return cls(
+            config['ANTHROPIC_API_KEY'],
+            timeout=config.get('CHATBOT_TIMEOUT', 30.0),
+            connect_timeout=config.get('CHATBOT_CONNECT_TIMEOUT', 5.0),
+            max_retries=config.get('CHATBOT_MAX_RETRIES', 2),
+            max_tokens=config.get('CHATBOT_MAX_TOKENS', 1000),
+            temperature=config.get('CHATBOT_TEMPERATURE', 0.7),
+            base_url=config.get('ANTHROPIC_BASE_URL'),
+            response_cache=response_cache,
+            history_token_budget=config.get('CHATBOT_HISTORY_TOKEN_BUDGET', 800),
+            prompt_laptops=config.get('CHATBOT_PROMPT_LAPTOPS', 3),
+            response_laptops=config.get('CHATBOT_RESPONSE_LAPTOPS', 5),
+            latency_budget=config.get('CHATBOT_LATENCY_BUDGET', 10.0),
+            breaker=CircuitBreaker(
+                window=config.get('CHATBOT_BREAKER_WINDOW', 20),
+                failure_rate=config.get('CHATBOT_BREAKER_FAILURE_RATE', 0.5),
+                min_calls=config.get('CHATBOT_BREAKER_MIN_CALLS', 5),
+                slow_call_seconds=config.get('CHATBOT_BREAKER_SLOW_CALL', 8.0),
+                open_seconds=config.get('CHATBOT_BREAKER_OPEN_SECONDS', 30.0)
+            ),
+            gate=UpstreamGate(
+                max_concurrent=config.get('CHATBOT_MAX_CONCURRENT', 8),
+                max_queue=config.get('CHATBOT_MAX_QUEUE', 16),
+                queue_timeout=config.get('CHATBOT_QUEUE_TIMEOUT', 5.0),
+                retry_after=config.get('CHATBOT_RETRY_AFTER', 2),
+                call_timeout=config.get('CHATBOT_LATENCY_BUDGET', 10.0)
+            ),
+            knowledge_base=config.get('CHATBOT_KNOWLEDGE_BASE', True)
+        )
+
+    def analyze(self, message: str) -> Tuple[Tuple[bool, str, str], str, Dict]:
+        """Block check, intent and preferences from a single scan of the message"""
+        matches = self.matcher.scan(message.lower())
+        category, pattern = self.matcher.blocked(matches)
+        blocked = self.security_filter.block_result(category, pattern, message)
+        return blocked, self.matcher.intent(matches), self.matcher.preferences(matches)
 
     def classify_intent(self, message: str) -> str:
         """Classify user intent from message"""
-        message_lower = message.lower()
-        
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    return intent
-        
-        return 'general'
+        return self.matcher.intent(self.matcher.scan(message.lower()))
 
     def extract_user_preferences(self, message: str, conversation_history: List[Dict]) -> Dict:
         """Extract user preferences from message and conversation history"""
-        preferences = {
-            'budget_min': None,
-            'budget_max': None,
-            'category': None,
-            'brand': None,
-            'ram_min': None,
-            'gpu_required': False
-        }
-        
-        message_lower = message.lower()
-        
-        # Extract budget
-        budget_patterns = [
-            r'(\d+)\s*(triệu|tr|million)',
-            r'(\d+)\s*(nghìn|k)',
-            r'giá.*(\d+)',
-            r'dưới.*(\d+)',
-            r'trên.*(\d+)'
-        ]
-        
-        for pattern in budget_patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                amount = int(match.group(1))
-                if 'triệu' in match.group(0) or 'tr' in match.group(0) or 'million' in match.group(0):
-                    amount *= 1000000
-                elif 'nghìn' in match.group(0) or 'k' in match.group(0):
-                    amount *= 1000
-                
-                if 'dưới' in match.group(0):
-                    preferences['budget_max'] = amount
-                elif 'trên' in match.group(0):
-                    preferences['budget_min'] = amount
-                else:
-                    preferences['budget_max'] = amount * 1.2  # 20% buffer
-                    preferences['budget_min'] = amount * 0.8
-        
-        # Extract category
-        for category, keywords in self.category_keywords.items():
-            for keyword in keywords:
-                if keyword in message_lower:
-                    preferences['category'] = category
-                    break
-        
-        # Extract brand
-        brands = ['asus', 'dell', 'hp', 'lenovo', 'acer', 'msi', 'macbook', 'apple']
-        for brand in brands:
-            if brand in message_lower:
-                preferences['brand'] = brand.title()
-                break
-        
-        # Extract RAM requirement
-        ram_match = re.search(r'(\d+)\s*gb.*ram|ram.*(\d+)\s*gb', message_lower)
-        if ram_match:
-            ram_amount = int(ram_match.group(1) or ram_match.group(2))
-            preferences['ram_min'] = ram_amount
-        
-        # Check for GPU requirement
-        gpu_keywords = ['gpu', 'card đồ họa', 'rtx', 'gtx', 'gaming', 'thiết kế']
-        preferences['gpu_required'] = any(keyword in message_lower for keyword in gpu_keywords)
-        
-        return preferences
+        return self.matcher.preferences(self.matcher.scan(message.lower()))
 
-    def get_relevant_laptops(self, preferences: Dict, limit: int = 15) -> List[Dict]:
-        """Get relevant laptops based on user preferences"""
-        query = Laptop.query
+    def get_relevant_laptops(self, preferences: Dict, limit: int = 15, query: str = "") -> List[Dict]:
+        """
+        Get relevant laptops based on user preferences
+        Hard filters select the candidates (cheapest first); the retrieval index then
+        ranks them by similarity to the user's message
+        """
+        snapshot = catalog_store.get()
         
         # Apply filters based on preferences
-        if preferences['budget_min']:
-            query = query.filter(Laptop.price >= preferences['budget_min'])
-        if preferences['budget_max']:
-            query = query.filter(Laptop.price <= preferences['budget_max'])
-        if preferences['category']:
-            query = query.filter(Laptop.category == preferences['category'])
-        if preferences['brand']:
-            query = query.filter(Laptop.brand == preferences['brand'])
-        if preferences['ram_min']:
-            query = query.filter(Laptop.ram_gb >= preferences['ram_min'])
+        positions = snapshot.filter(
+            brand=preferences['brand'],
+            category=preferences['category'],
+            price_min=preferences['budget_min'] or None,
+            price_max=preferences['budget_max'] or None,
+            ram_min=preferences['ram_min'] or None,
+            sort='price_asc'
+        )
         if preferences['gpu_required']:
-            query = query.filter(
-                ~Laptop.gpu.like('%Intel UHD%'),
-                ~Laptop.gpu.like('%AMD Radeon Graphics%'),
-                ~Laptop.gpu.like('%Intel Graphics%')
-            )
+            gpus = snapshot.columns['gpu']
+            positions = [
+                pos for pos in positions
+                if gpus[pos] and not any(integrated in gpus[pos].lower() for integrated in INTEGRATED_GPUS)
+            ]
         
-        # Get laptops and convert to dict
-        laptops = query.order_by(Laptop.price.asc()).limit(limit).all()
+        candidate_ids = [snapshot.ids[pos] for pos in positions]
+        if query:
+            candidate_ids = retrieval_index.rank(query, candidate_ids, limit=limit)
+        laptops = [snapshot.get(laptop_id) for laptop_id in candidate_ids[:limit]]
         
         laptop_data = []
         for laptop in laptops:
@@ -282,189 +381,280 @@ class ChatbotService:
                 "battery_life_office": laptop.battery_life_office,
                 "cpu_single_core_plugged": laptop.cpu_single_core_plugged,
                 "cpu_multi_core_plugged": laptop.cpu_multi_core_plugged,
-                "gpu_score_plugged": laptop.gpu_score_plugged
+                "gpu_score_plugged": laptop.gpu_score_plugged,
+                # Precomputed strengths/weaknesses; None when missing or stale
+                "summary": summary_store.get(laptop)
             }
             laptop_data.append(laptop_info)
         
         return laptop_data
 
-    def create_dynamic_system_prompt(self, intent: str, preferences: Dict, 
-                                   relevant_laptops: List[Dict], 
-                                   conversation_history: List[Dict]) -> str:
-        """Create dynamic system prompt based on context"""
+    # ---------- Pipeline stages ----------
+    def screen(self, turn: "ChatTurn") -> bool:
+        """sanitize -> filter; False when the turn already has its answer"""
+        with turn.stage("sanitize"):
+            turn.sanitized = self.security_filter.sanitize_input(turn.message)
+        
+        if not turn.sanitized:
+            turn.result = {
+                "success": False,
+                "error": "Tin nhắn không hợp lệ. Vui lòng nhập câu hỏi về laptop.",
+                "blocked": True,
+                "category": "invalid_input",
+                "route": "blocked"
+            }
+            return False
         
-        base_prompt = """Bạn là AI tư vấn laptop chuyên nghiệp với dữ liệu thực tế từ website. Hãy trả lời ngắn gọn, rõ ràng bằng tiếng Việt.
-
-**QUY TẮC NGHIÊM NGẶT:**
-- CHỈ gợi ý laptop có trong dữ liệu được cung cấp
-- KHÔNG được tự tạo hoặc bịa đặt laptop không có trong database
-- Nếu không có laptop phù hợp, hãy nói rõ "Không tìm thấy laptop phù hợp"
-- Tối đa 3-4 câu
-- Sử dụng bullet points (•) cho danh sách
-- In đậm (**text**) cho thông tin quan trọng
-- Đưa ra lời khuyên cụ thể dựa trên dữ liệu thực tế
-- Sử dụng xuống hàng (\\n) để tách các ý chính
-- Mỗi ý chính nên ở một dòng riêng
-
-**Chuyên môn:**
-• Tư vấn laptop theo nhu cầu (gaming, văn phòng, học tập, thiết kế)
-• So sánh hiệu năng và giá cả dựa trên dữ liệu thực tế
-• Giải thích thông số kỹ thuật đơn giản
-• Đưa ra lựa chọn tốt nhất trong ngân sách"""
-
-        # Add context based on intent
-        if intent == 'recommend':
-            if relevant_laptops:
-                base_prompt += f"""
-
-**Nhiệm vụ hiện tại: Tư vấn laptop phù hợp**
-- Ngân sách: {preferences['budget_min'] or 'Không giới hạn'} - {preferences['budget_max'] or 'Không giới hạn'} VND
-- Danh mục: {preferences['category'] or 'Tất cả'}
-- Thương hiệu: {preferences['brand'] or 'Tất cả'}
-- RAM tối thiểu: {preferences['ram_min'] or 'Không yêu cầu'} GB
-- GPU rời: {'Có' if preferences['gpu_required'] else 'Không yêu cầu'}
-
-**CHỈ GỢI Ý CÁC LAPTOP SAU ĐÂY (có trong database):**
-{json.dumps(relevant_laptops[:5], ensure_ascii=False, indent=2)}
-
-**LƯU Ý:** Chỉ được gợi ý laptop có trong danh sách trên. KHÔNG được tự tạo laptop khác."""
-            else:
-                base_prompt += f"""
-
-**Nhiệm vụ hiện tại: Tư vấn laptop phù hợp**
-- Ngân sách: {preferences['budget_min'] or 'Không giới hạn'} - {preferences['budget_max'] or 'Không giới hạn'} VND
-- Danh mục: {preferences['category'] or 'Tất cả'}
-- Thương hiệu: {preferences['brand'] or 'Tất cả'}
-- RAM tối thiểu: {preferences['ram_min'] or 'Không yêu cầu'} GB
-- GPU rời: {'Có' if preferences['gpu_required'] else 'Không yêu cầu'}
-
-**KHÔNG TÌM THẤY LAPTOP PHÙ HỢP** trong database với tiêu chí trên.
-Hãy thông báo cho user rằng không có laptop phù hợp và đề xuất mở rộng tiêu chí tìm kiếm."""
-
-        elif intent == 'compare':
-            base_prompt += """
-
-**Nhiệm vụ hiện tại: So sánh laptop**
-- Hãy so sánh chi tiết các laptop được đề cập
-- Đưa ra ưu nhược điểm của từng mẫu
-- Gợi ý laptop phù hợp nhất"""
-
-        elif intent == 'explain':
-            base_prompt += """
-
-**Nhiệm vụ hiện tại: Giải thích thông số**
-- Giải thích đơn giản, dễ hiểu
-- So sánh với các mẫu laptop khác
-- Đưa ra lời khuyên thực tế"""
-
-        elif intent == 'price':
-            base_prompt += """
-
-**Nhiệm vụ hiện tại: Tư vấn giá cả**
-- Phân tích giá trị/tiền
-- So sánh với các mẫu tương tự
-- Đưa ra lựa chọn tốt nhất trong ngân sách"""
-
-        # Add conversation context if available
-        if conversation_history:
-            base_prompt += f"""
-
-**Context cuộc trò chuyện:**
-{json.dumps(conversation_history[-3:], ensure_ascii=False, indent=2)}"""
-
-        return base_prompt
+        # One keyword scan of the message, reused by classify and extract
+        with turn.stage("filter"):
+            turn.scan = self.matcher.scan(turn.sanitized.lower())
+            category, pattern = self.matcher.blocked(turn.scan)
+            turn.blocked = self.security_filter.block_result(category, pattern, turn.sanitized)
+        
+        is_blocked, block_category, block_response = turn.blocked
+        if is_blocked:
+            turn.result = {
+                "success": True,
+                "response": block_response,
+                "blocked": True,
+                "category": block_category,
+                "intent": "blocked",
+                "route": "blocked"
+            }
+            return False
+        return True
 
-    def generate_response(self, message: str, conversation_history: List[Dict] = None) -> Dict:
-        """Generate AI response with enhanced context and security"""
-        if conversation_history is None:
-            conversation_history = []
+    def understand(self, turn: "ChatTurn") -> None:
+        """classify -> extract"""
+        with turn.stage("classify"):
+            turn.intent = self.matcher.intent(turn.scan)
+        with turn.stage("extract"):
+            turn.preferences = self.matcher.preferences(turn.scan)
+
+    def scope_preferences(self, turn: "ChatTurn") -> Dict:
+        """Budget/category/brand of the turn, filled in from earlier shopping requests in the history"""
+        scope = dict(turn.preferences)
+        for msg in reversed(turn.history):
+            if msg.get("role") != "user":
+                continue
+            scan = self.matcher.scan(msg["content"].lower())
+            if self.matcher.intent(scan) not in ('recommend', 'search', 'price'):
+                continue
+            earlier = self.matcher.preferences(scan)
+            # The budget is taken as a pair, from the most recent message that states one
+            if not (scope['budget_min'] or scope['budget_max']):
+                scope['budget_min'], scope['budget_max'] = earlier['budget_min'], earlier['budget_max']
+            scope['category'] = scope['category'] or earlier['category']
+            scope['brand'] = scope['brand'] or earlier['brand']
+        return scope
+
+    def explain(self, turn: "ChatTurn") -> bool:
+        """
+        Answer spec questions from the local knowledge base; False when it answered
+        Explain questions, and compare questions about concepts rather than laptops
+        ("SSD hay HDD"), are matched; anything unmatched goes on to the model
+        """
+        if self.knowledge is None or turn.intent not in ('explain', 'compare'):
+            return True
+        if turn.intent == 'compare' and turn.preferences['brand']:
+            return True
+        with turn.stage("explain"):
+            topics = self.knowledge.match(turn.sanitized, comparison=turn.intent == 'compare')
+            self.knowledge.record(turn.intent, topics)
+            if not topics:
+                return True
+            preferences = self.scope_preferences(turn)
+            turn.route = "knowledge_base"
+            turn.result = {
+                "success": True,
+                "response": self.knowledge.answer(topics, catalog_store.get(), preferences),
+                "intent": turn.intent,
+                "preferences": turn.preferences,
+                "relevant_laptops": [],
+                "relevant_laptops_count": 0,
+                "model": "local-knowledge-base",
+                "blocked": False,
+                "route": turn.route,
+                "topics": [topic.key for topic in topics]
+            }
+        return False
+
+    def retrieve(self, turn: "ChatTurn") -> bool:
+        """Relevant laptops (as many as the response returns); False on a response cache hit"""
+        # Read before the laptops: a cached answer is never keyed newer than its data
+        version = catalog_version.token
+        with turn.stage("retrieve"):
+            turn.laptops = self.get_relevant_laptops(
+                turn.preferences, limit=self.response_laptops, query=turn.sanitized
+            )
         
-        try:
-            # Sanitize input first
-            sanitized_message = self.security_filter.sanitize_input(message)
-            
-            if not sanitized_message:
-                return {
-                    "success": False,
-                    "error": "Tin nhắn không hợp lệ. Vui lòng nhập câu hỏi về laptop.",
-                    "blocked": True,
-                    "category": "invalid_input"
-                }
-            
-            # Check for blocked content
-            is_blocked, block_category, block_response = self.security_filter.is_query_blocked(sanitized_message)
-            
-            if is_blocked:
-                return {
-                    "success": True,
-                    "response": block_response,
-                    "blocked": True,
-                    "category": block_category,
-                    "intent": "blocked"
-                }
-            
-            # Classify intent
-            intent = self.classify_intent(sanitized_message)
-            
-            # Extract preferences
-            preferences = self.extract_user_preferences(sanitized_message, conversation_history)
-            
-            # Get relevant laptops
-            relevant_laptops = self.get_relevant_laptops(preferences)
-            
-            # Create dynamic system prompt
-            system_prompt = self.create_dynamic_system_prompt(
-                intent, preferences, relevant_laptops, conversation_history
+        # First-turn shopping answers depend only on intent, preferences and the retrieved laptops
+        if (self.response_cache is not None and not turn.history
+                and self.response_cache.cacheable(turn.intent, turn.preferences)):
+            turn.cache_key = self.response_cache.make_key(
+                turn.intent, turn.preferences, [laptop["id"] for laptop in turn.laptops], version
             )
-            
-            # Prepare messages for API
-            messages = []
-            
-            # Add conversation history (last 5 messages to stay within token limit)
-            for msg in conversation_history[-5:]:
-                # Sanitize historical messages too
-                sanitized_content = self.security_filter.sanitize_input(msg.get("content", ""))
-                if sanitized_content:
-                    messages.append({
-                        "role": msg["role"],
-                        "content": sanitized_content
-                    })
-            
-            # Add current message
-            messages.append({
-                "role": "user",
-                "content": sanitized_message
-            })
-            
-            # Get response from Anthropic
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                system=system_prompt,
-                messages=messages
+            cached = self.response_cache.get(turn.cache_key)
+            if cached is not None:
+                cached["cached"] = True
+                cached["route"] = turn.route = "cache"
+                # Nothing is sent to the model on a hit
+                tokens = cached["prompt_tokens"]
+                cached["prompt_tokens"] = dict(tokens, input=0, saved=tokens["baseline"])
+                turn.result = cached
+                return False
+        return True
+
+    def build_prompt(self, turn: "ChatTurn") -> None:
+        """Compact system prompt + history trimmed to the token budget"""
+        with turn.stage("prompt"):
+            # History is sanitized once when it is stored (see conversation_store.py)
+            history = [{"role": msg["role"], "content": msg["content"]} for msg in turn.history]
+            turn.prompt = self.prompt_builder.build(
+                turn.intent, turn.preferences, turn.laptops, history, turn.sanitized
             )
-            
-            bot_response = response.content[0].text
-            
-            # Validate response for security
+
+    def prepare(self, turn: "ChatTurn") -> bool:
+        """Every stage before generation; False when no model call is needed"""
+        if not self.screen(turn):
+            return False
+        self.understand(turn)
+        if not self.explain(turn):
+            return False
+        if not self.retrieve(turn):
+            return False
+        self.build_prompt(turn)
+        return True
+
+    def _timeout(self, remaining: float) -> anthropic.Timeout:
+        return anthropic.Timeout(remaining, connect=min(self.connect_timeout, remaining))
+
+    def _create_within_budget(self, turn: "ChatTurn"):
+        """messages.create with retries on transient errors, all within latency_budget seconds"""
+        deadline = time.monotonic() + self.latency_budget
+        attempt = 0
+        while True:
+            try:
+                return self.budget_client.messages.create(
+                    model=self.model,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    system=turn.prompt["system"],
+                    messages=turn.prompt["messages"],
+                    timeout=self._timeout(deadline - time.monotonic())
+                )
+            except Exception as e:
+                attempt += 1
+                backoff = min(0.5 * 2 ** (attempt - 1), 4.0)
+                # Only retry when a retry could still finish inside the budget
+                if (not is_retryable(e) or attempt > self.max_retries
+                        or deadline - time.monotonic() < backoff + MIN_ATTEMPT_SECONDS):
+                    raise
+                time.sleep(backoff)
+
+    def prompt_key(self, turn: "ChatTurn") -> str:
+        """Identity of the upstream request; equal keys get the same answer from the model"""
+        payload = json.dumps([self.model, self.max_tokens, turn.prompt["system"], turn.prompt["messages"]],
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def generate(self, turn: "ChatTurn") -> Optional[str]:
+        """
+        Call the Messages API through the upstream gate and the circuit breaker
+        Identical prompts already in flight share one call
+        Returns None (and sets turn.fallback) when the breaker is open or the call fails;
+        raises UpstreamBusy when no upstream slot frees up within the queue limits
+        """
+        # No point queueing for a slot just to be turned away by the breaker
+        if self.breaker.reject_if_open():
+            turn.fallback = "open"
+            return None
+        with turn.stage("generate"):
+            text, turn.fallback = self.gate.call(self.prompt_key(turn), lambda: self._generate_upstream(turn))
+        return text
+
+    def _generate_upstream(self, turn: "ChatTurn") -> Tuple[Optional[str], Optional[str]]:
+        """(text, None) or (None, fallback reason); runs once per coalesced group of turns"""
+        if not self.breaker.allow():
+            return None, "open"
+        started = time.perf_counter()
+        try:
+            response = self._create_within_budget(turn)
+        except Exception as e:
+            self.breaker.record(False, time.perf_counter() - started)
+            fallback = "timeout" if isinstance(e, anthropic.APITimeoutError) else "error"
+            self.logger.error(f"AI generation error ({fallback}): {str(e)}")
+            return None, fallback
+        self.breaker.record(True, time.perf_counter() - started)
+        return response.content[0].text, None
+
+    def local_answer(self, turn: "ChatTurn") -> Dict:
+        """Answer built from the retrieved laptops when the model is unavailable (not cached)"""
+        with self._fallback_lock:
+            self.fallbacks[turn.fallback] += 1
+        turn.route = "fallback"
+        if turn.laptops:
+            response = ("Trợ lý AI đang bận, dưới đây là các laptop phù hợp nhất trong dữ liệu của chúng tôi."
+                        + self._format_product_recommendations(turn.laptops[:3]))
+        else:
+            response = ("Trợ lý AI đang bận và **không tìm thấy laptop phù hợp** với tiêu chí của bạn.\n"
+                        "Bạn có thể thử mở rộng ngân sách hoặc bỏ bớt yêu cầu.")
+        turn.result = {
+            "success": True,
+            "response": response,
+            "intent": turn.intent,
+            "preferences": turn.preferences,
+            "relevant_laptops": turn.laptops,
+            "relevant_laptops_count": len(turn.laptops),
+            "model": "local-fallback",
+            "blocked": False,
+            "fallback": turn.fallback,
+            "route": turn.route,
+            "prompt_tokens": dict(turn.prompt["tokens"], input=0)
+        }
+        return turn.result
+
+    def validate(self, turn: "ChatTurn", bot_response: str) -> Dict:
+        """Validate the model output and build the final result"""
+        with turn.stage("validate"):
             validated_response = self.security_filter.validate_response(bot_response)
             
             # Add product recommendations if intent is recommend and we have laptops
-            if intent == 'recommend' and relevant_laptops and len(relevant_laptops) > 0:
-                validated_response += self._format_product_recommendations(relevant_laptops[:3])
+            if turn.intent == 'recommend' and turn.laptops:
+                validated_response += self._format_product_recommendations(turn.laptops[:3])
             
-            return {
+            turn.route = "model"
+            turn.result = {
                 "success": True,
                 "response": validated_response,
-                "intent": intent,
-                "preferences": preferences,
-                "relevant_laptops": relevant_laptops,
-                "relevant_laptops_count": len(relevant_laptops),
+                "intent": turn.intent,
+                "preferences": turn.preferences,
+                "relevant_laptops": turn.laptops,
+                "relevant_laptops_count": len(turn.laptops),
                 "model": "claude-3-haiku",
-                "blocked": False
+                "blocked": False,
+                "route": turn.route,
+                "prompt_tokens": turn.prompt["tokens"]
             }
+            if turn.cache_key is not None:
+                self.response_cache.put(turn.cache_key, turn.result)
+        return turn.result
+
+    # ---------- Running a turn ----------
+    def run(self, turn: "ChatTurn") -> Dict:
+        """Run the whole pipeline for one turn and return its result"""
+        try:
+            if self.prepare(turn):
+                text = self.generate(turn)
+                if text is None:
+                    self.local_answer(turn)
+                else:
+                    self.validate(turn, text)
+            turn.result["timings"] = turn.timings
+            return turn.result
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             self.logger.error(f"AI generation error: {str(e)}")
             return {
@@ -473,6 +663,108 @@ Hãy thông báo cho user rằng không có laptop phù hợp và đề xuất m
                 "blocked": False
             }
 
+    def stream(self, turn: "ChatTurn") -> Iterator[Tuple[str, Dict]]:
+        """
+        Run the pipeline, streaming the generate stage as (event, data) pairs:
+        'laptops' first (intent + relevant laptops), then 'token' per text delta,
+        then 'done' with the validated final result, or 'error'
+        An upstream gate slot is held only while the model streams (see _stream_gated);
+        headers are already out by then, so a busy gate gives the local answer instead of a 503
+        """
+        try:
+            if not self.screen(turn):
+                turn.result["timings"] = turn.timings
+                yield "done", turn.result
+                return
+            self.understand(turn)
+            answered = not self.explain(turn) or not self.retrieve(turn)
+            
+            # Structured product cards go out before the first token
+            yield "laptops", {
+                "intent": turn.intent,
+                "relevant_laptops": turn.laptops,
+                "relevant_laptops_count": len(turn.laptops)
+            }
+            
+            if not answered:
+                self.build_prompt(turn)
+                yield from self._stream_gated(turn)
+                if turn.fallback:
+                    self.local_answer(turn)
+            
+            turn.result["timings"] = turn.timings
+            yield "done", turn.result
+            
+        except Exception as e:
+            self.logger.error(f"AI streaming error: {str(e)}")
+            yield "error", {
+                "success": False,
+                "error": "Xin lỗi, đã có lỗi xảy ra. Vui lòng thử lại sau.",
+                "blocked": False
+            }
+
+    def _stream_gated(self, turn: "ChatTurn") -> Iterator[Tuple[str, Dict]]:
+        """_stream_generate inside an upstream gate slot and the circuit breaker; sets turn.fallback instead"""
+        if self.breaker.reject_if_open():
+            turn.fallback = "open"
+            return
+        try:
+            self.gate.acquire()
+        except UpstreamBusy:
+            turn.fallback = "busy"
+            return
+        try:
+            if not self.breaker.allow():
+                turn.fallback = "open"
+                return
+            yield from self._stream_generate(turn)
+        finally:
+            self.gate.release()
+
+    def _stream_generate(self, turn: "ChatTurn") -> Iterator[Tuple[str, Dict]]:
+        """Streaming generate + validate; on failure sets turn.fallback (the client replaces streamed text)"""
+        parts = []
+        started = time.perf_counter()
+        first_token = None
+        try:
+            with self.budget_client.messages.stream(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=turn.prompt["system"],
+                messages=turn.prompt["messages"],
+                timeout=self._timeout(self.latency_budget)
+            ) as stream:
+                for text in stream.text_stream:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    parts.append(text)
+                    yield "token", {"text": text}
+        except GeneratorExit:
+            # Reader went away; still settle the call so a half-open probe is not left in flight
+            self.breaker.record(first_token is not None, time.perf_counter() - started)
+            raise
+        except Exception as e:
+            self.breaker.record(False, time.perf_counter() - started)
+            turn.fallback = "timeout" if isinstance(e, anthropic.APITimeoutError) else "error"
+            self.logger.error(f"AI streaming error ({turn.fallback}): {str(e)}")
+            return
+        finally:
+            turn.timings["generate_ms"] = elapsed_ms(started)
+        
+        # Slow-call detection uses the time to first token; the rest is paced by the reader
+        self.breaker.record(True, first_token if first_token is not None else time.perf_counter() - started)
+        # Validation runs on the full text; the client replaces the streamed text with it
+        self.validate(turn, "".join(parts))
+
+    def generate_response(self, message: str, conversation_history: List[Dict] = None) -> Dict:
+        """Generate AI response with enhanced context and security"""
+        return self.run(ChatTurn(message, conversation_history))
+
+    def stream_response(self, message: str, conversation_history: List[Dict] = None) -> Iterator[Tuple[str, Dict]]:
+        """Streaming variant of generate_response (see stream)"""
+        return self.stream(ChatTurn(message, conversation_history))
+
     def _format_product_recommendations(self, laptops: List[Dict]) -> str:
         """Format product recommendations for AI response"""
         if not laptops:
@@ -505,48 +797,36 @@ Hãy thông báo cho user rằng không có laptop phù hợp và đề xuất m
         
         return recommendations
 
-    def search_laptops(self, query: str, limit: int = 10) -> List[Dict]:
-        """Enhanced laptop search with better matching and security"""
+    def search_laptops(self, query: str, limit: int = 10, turn: Optional[ChatTurn] = None) -> List[Dict]:
+        """Full-text laptop search ranked by BM25, with security filtering (sanitize -> filter -> retrieve)"""
+        turn = turn or ChatTurn(query)
         try:
-            # Sanitize search query
-            sanitized_query = self.security_filter.sanitize_input(query)
-            
-            if not sanitized_query:
+            if not self.screen(turn):
+                if turn.blocked[0]:
+                    self.logger.warning(f"Blocked search query: {query[:50]}...")
                 return []
             
-            # Check for blocked content in search
-            is_blocked, _, _ = self.security_filter.is_query_blocked(sanitized_query)
-            if is_blocked:
-                self.logger.warning(f"Blocked search query: {query[:50]}...")
-                return []
-            
-            # Extract search terms
-            search_terms = re.findall(r'\b\w+\b', sanitized_query.lower())
-            
-            # Build search query
-            search_conditions = []
-            for term in search_terms:
-                if len(term) > 2:  # Ignore short terms
-                    search_conditions.append(
-                        db.or_(
-                            Laptop.name.contains(term),
-                            Laptop.brand.contains(term),
-                            Laptop.category.contains(term),
-                            Laptop.cpu.contains(term),
-                            Laptop.gpu.contains(term),
-                            Laptop.storage.contains(term)
-                        )
-                    )
-            
-            if search_conditions:
-                query_obj = Laptop.query.filter(db.or_(*search_conditions))
-            else:
-                query_obj = Laptop.query
-            
-            laptops = query_obj.order_by(Laptop.price.asc()).limit(limit).all()
+            # Full-text search (FTS5) ranked by BM25, ignoring short terms (<= 2 chars)
+            with turn.stage("retrieve"):
+                hits = search_index.search(turn.sanitized, limit=limit, min_length=3)
+                
+                snapshot = catalog_store.get()
+                if hits:
+                    laptops = [snapshot.get(hit.id) for hit in hits]
+                else:
+                    # No usable terms or no exact term match: fuzzy n-gram ranking instead
+                    all_ids = [snapshot.ids[pos] for pos in snapshot.orders['price_asc']]
+                    ranked = retrieval_index.rank(turn.sanitized, all_ids, limit=limit, min_score=SEARCH_MIN_SCORE)
+                    if not ranked and hits is None:
+                        ranked = all_ids[:limit]
+                    hits = []
+                    laptops = [snapshot.get(laptop_id) for laptop_id in ranked]
+            highlights = {hit.id: hit.highlights for hit in hits}
             
             results = []
             for laptop in laptops:
+                if laptop is None:
+                    continue
                 result = {
                     "id": laptop.id,
                     "name": laptop.name,
@@ -560,6 +840,8 @@ Hãy thông báo cho user rằng không có laptop phù hợp và đề xuất m
                     "screen": laptop.screen,
                     "image_url": laptop.image_url
                 }
+                if highlights.get(laptop.id):
+                    result["highlights"] = highlights[laptop.id]
                 results.append(result)
             
             return results
@@ -0,0 +1,96 @@
+"""
+Circuit breaker for upstream model calls
+Counts failures and slow calls over a sliding window of recent calls; when their
+share crosses the threshold the breaker opens and callers use a local fallback.
+After `open_seconds` a single probe call is let through (half-open): success closes
+the breaker, failure opens it again.
+State is per process, like the ChatbotService that owns it.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Dict
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    def __init__(self, window: int = 20, failure_rate: float = 0.5, min_calls: int = 5,
+                 slow_call_seconds: float = 8.0, open_seconds: float = 30.0):
+        self.window = window
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # True = failed or slow
+        self._opened_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'trips': 0}
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; rejected calls should use the fallback"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() >= self._opened_until:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def reject_if_open(self) -> bool:
+        """Cheap early check: True (counted as rejected) while open and not yet due for a probe"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() < self._opened_until:
+                self.counters['rejected'] += 1
+                return True
+            return False
+
+    def record(self, success: bool, seconds: float) -> None:
+        """Outcome of an allowed call; a successful but slow call counts against the upstream"""
+        slow = success and seconds >= self.slow_call_seconds
+        bad = not success or slow
+        with self._lock:
+            self.counters['calls'] += 1
+            if not success:
+                self.counters['failures'] += 1
+            if slow:
+                self.counters['slow_calls'] += 1
+
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if bad:
+                    self._trip()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+
+            self._outcomes.append(bad)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate):
+                self._trip()
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self._opened_until = time.monotonic() + self.open_seconds
+        self._outcomes.clear()
+        self.counters['trips'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            recent = len(self._outcomes)
+            return {
+                "state": self.state,
+                "open_for_seconds": round(max(self._opened_until - time.monotonic(), 0), 1) if self.state == OPEN else 0,
+                "recent_calls": recent,
+                "recent_failure_rate": round(sum(self._outcomes) / recent, 3) if recent else 0.0,
+                **self.counters
+            }
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dữ liệu so sánh laptop dùng chung cho /compare và /api/compare_data
+Laptop được đọc từ snapshot catalog (không query từng id), điểm hiệu năng tính một lần,
+điểm benchmark chuẩn hóa theo phân vị (percentile) trong toàn catalog
+"""
+
+import threading
+from bisect import bisect_right
+import numpy as np
+from catalog_snapshot import catalog_store
+from scoring_engine import LaptopArrays, tier_performance_scores
+
+# Cột benchmark theo chế độ: tên series -> (cột cắm sạc, cột dùng pin)
+BENCHMARK_SERIES = {
+    'cpu_single_core': ('cpu_single_core_plugged', 'cpu_single_core_battery'),
+    'cpu_multi_core': ('cpu_multi_core_plugged', 'cpu_multi_core_battery'),
+    'gpu_score': ('gpu_score_plugged', 'gpu_score_battery'),
+}
+MODES = ('plugged', 'battery')
+
+class CatalogPercentiles:
+    """Giá trị đã sắp xếp của từng cột benchmark trong một snapshot"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.sorted_values = {}
+        for columns in BENCHMARK_SERIES.values():
+            for column in columns:
+                self.sorted_values[column] = sorted(v for v in snapshot.columns[column] if v)
+
+    def percentile(self, column, value):
+        """Phần trăm laptop trong catalog có điểm <= value (0 nếu không có dữ liệu)"""
+        values = self.sorted_values[column]
+        if not value or not values:
+            return 0
+        return round(bisect_right(values, value) * 100 / len(values), 1)
+
+_percentiles = None
+_percentiles_lock = threading.Lock()
+
+def get_percentiles(snapshot):
+    """Bảng phân vị của snapshot hiện tại (dựng lại khi snapshot đổi)"""
+    global _percentiles
+    percentiles = _percentiles
+    if percentiles is None or percentiles.snapshot is not snapshot:
+        percentiles = CatalogPercentiles(snapshot)
+        with _percentiles_lock:
+            _percentiles = percentiles
+    return percentiles
+
+def load_items(ids):
+    """Laptop theo thứ tự id yêu cầu (bỏ trùng, bỏ id không tồn tại), đọc từ snapshot"""
+    snapshot = catalog_store.get()
+    items = []
+    seen = set()
+    for laptop_id in ids:
+        if laptop_id in seen:
+            continue
+        seen.add(laptop_id)
+        laptop = snapshot.get(laptop_id)
+        if laptop is not None:
+            items.append(laptop)
+    return items, snapshot
+
+def build_series(items, snapshot):
+    """Series benchmark cho cả hai chế độ, kèm percentile trong catalog"""
+    percentiles = get_percentiles(snapshot)
+    series = {}
+    for i, mode in enumerate(MODES):
+        series[mode] = {
+            name: [{
+                'id': laptop.id,
+                'name': laptop.name,
+                'score': getattr(laptop, columns[i]) or 0,
+                'percentile': percentiles.percentile(columns[i], getattr(laptop, columns[i]))
+            } for laptop in items]
+            for name, columns in BENCHMARK_SERIES.items()
+        }
+    return series
+
+def build_comparison(ids):
+    """Toàn bộ dữ liệu so sánh: laptop, điểm hiệu năng, nhận xét và series benchmark"""
+    items, snapshot = load_items(ids)
+    result = {'items': items, 'series': build_series(items, snapshot)}
+    if len(items) < 2:
+        return result
+
+    # Điểm hiệu năng của mọi laptop được tính một lần bằng engine vector
+    perf_scores = tier_performance_scores(LaptopArrays(items))
+    prices = np.array([it.price for it in items], dtype=np.float64)
+
+    # Phân tích theo nhu cầu
+    category_analysis = {}
+    for item in items:
+        category_analysis.setdefault(item.category, []).append(item)
+
+    result.update({
+        'performance_scores': {it.id: int(s) for it, s in zip(items, perf_scores)},
+        # Laptop có hiệu năng tốt nhất
+        'best_performance': items[int(perf_scores.argmax())],
+        # Laptop có giá trị tốt nhất (rẻ nhất)
+        'best_value': items[int(prices.argmin())],
+        'price_range': {
+            'min': items[int(prices.argmin())],
+            'max': items[int(prices.argmax())]
+        },
+        'category_analysis': category_analysis,
+        # Tỷ lệ giá/hiệu năng: price / (score + 1) để tránh chia 0
+        'best_price_performance': items[int((prices / (perf_scores + 1)).argmin())],
+    })
+    return result
@@ -10,6 +10,16 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or f"sqlite:///{os.path.join(BASE_DIR,'app.db')}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Profile SQLite (db_profile.py): WAL, pragma cho mỗi connection, pool đọc + một writer
+    SQLITE_TUNING = True  # False = cấu hình mặc định của SQLAlchemy (rollback journal)
+    SQLITE_SYNCHRONOUS = "NORMAL"  # WAL + NORMAL: không fsync mỗi commit, vẫn an toàn khi app crash
+    SQLITE_BUSY_TIMEOUT = 5000  # ms chờ khóa ghi trước khi báo "database is locked"
+    SQLITE_CACHE_SIZE = -65536  # số âm = KiB, page cache 64MB mỗi connection
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # byte đọc qua memory-map
+    SQLITE_READ_POOL_SIZE = 8  # connection chỉ đọc giữ trong pool
+    SQLITE_READ_POOL_OVERFLOW = 8  # connection đọc mở thêm khi pool bận
+    SQLITE_WRITE_POOL_TIMEOUT = 10  # giây chờ writer rảnh
+    
     # Upload settings
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB max file size
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'images')
@@ -30,7 +40,41 @@ class Config:
     POSTS_PER_PAGE = 20
     LAPTOPS_PER_PAGE = 20
     
+    # Autocomplete
+    SEARCH_SUGGEST_CACHE_TTL = 2  # giây, micro-cache theo prefix
+    
+    # Đồng bộ cache giữa các worker (bảng catalog_changes)
+    CATALOG_SYNC_INTERVAL = 1.0  # giây giữa hai lần kiểm tra nhật ký
+    CATALOG_SYNC_RETENTION_DAYS = 7  # số ngày giữ nhật ký
+    
     # AI Chatbot
-    ANTHROPIC_API_KEY = ANTHROPIC_API_KEY
+    ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
+    ANTHROPIC_BASE_URL = os.environ.get("ANTHROPIC_BASE_URL")  # ví dụ http://127.0.0.1:8787 khi chạy mock_anthropic.py
     CHATBOT_MAX_TOKENS = 1000
     CHATBOT_TEMPERATURE = 0.7
+    CHATBOT_TIMEOUT = 30.0  # giây, tổng thời gian một lần gọi API
+    CHATBOT_CONNECT_TIMEOUT = 5.0  # giây, thời gian mở kết nối
+    CHATBOT_MAX_RETRIES = 2  # số lần thử lại khi lỗi mạng/429/5xx
+    CHATBOT_RESPONSE_CACHE_SIZE = 256  # số câu trả lời giữ trong cache (0 = tắt)
+    CHATBOT_RESPONSE_CACHE_TTL = 600  # giây
+    CHATBOT_HISTORY_TOKEN_BUDGET = 800  # token (ước lượng) tối đa cho lịch sử hội thoại gửi kèm
+    CHATBOT_PROMPT_LAPTOPS = 3  # số laptop đưa vào prompt (đã xếp hạng theo độ liên quan)
+    CHATBOT_RESPONSE_LAPTOPS = 5  # số laptop trả về client (relevant_laptops, /api/chat/recommend)
+    CHATBOT_LATENCY_BUDGET = 10.0  # giây, tổng thời gian (kể cả thử lại) cho một lần gọi model
+    CHATBOT_BREAKER_WINDOW = 20  # số lần gọi gần nhất dùng để tính tỉ lệ lỗi
+    CHATBOT_BREAKER_FAILURE_RATE = 0.5  # tỉ lệ lỗi/chậm để ngắt mạch
+    CHATBOT_BREAKER_MIN_CALLS = 5
+    CHATBOT_BREAKER_SLOW_CALL = 8.0  # giây; gọi chậm hơn tính như lỗi
+    CHATBOT_BREAKER_OPEN_SECONDS = 30.0  # thời gian ngắt trước khi thử lại
+    CHATBOT_MAX_CONCURRENT = 8  # số lần gọi model đồng thời tối đa mỗi process
+    CHATBOT_MAX_QUEUE = 16  # số request được chờ slot; vượt quá trả 503 ngay
+    CHATBOT_QUEUE_TIMEOUT = 5.0  # giây chờ slot tối đa trước khi trả 503
+    CHATBOT_RETRY_AFTER = 2  # giây, header Retry-After của response 503
+    CHATBOT_KNOWLEDGE_BASE = True  # trả lời câu hỏi giải thích thông số tại chỗ (spec_knowledge.py)
+    CHAT_CONVERSATION_TTL = 86400  # giây không hoạt động trước khi xóa lịch sử chat
+    CHAT_CONVERSATION_MAX_BYTES = 8192  # dung lượng tối đa lịch sử một hội thoại (JSON)
+    CHAT_CONVERSATION_MAX_MESSAGES = 10
+    CHAT_EVENTS_BUFFER_SIZE = 10000  # sự kiện analytics chờ ghi tối đa (đầy thì bỏ cũ nhất)
+    CHAT_EVENTS_BATCH_SIZE = 200  # số sự kiện mỗi lần ghi xuống chat_events
+    CHAT_EVENTS_FLUSH_INTERVAL = 5.0  # giây giữa hai lần ghi
+    CHAT_EVENTS_RETENTION_DAYS = 30
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fixture dùng chung cho test pytest
+App Flask chạy trên database SQLite tạm (CSRF và rate limit tắt), nạp sẵn
+SAMPLE_LAPTOPS kèm benchmark và một tài khoản admin. App dùng chung cho cả
+phiên test (cache và index là singleton theo process), nên test nào ghi dữ liệu
+phải tự dọn lại. fake_model thay Anthropic client của chatbot bằng model giả.
+"""
+
+import os
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import pytest
+from config import Config
+
+ADMIN_PASSWORD = "admin123"
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    monkeypatch = pytest.MonkeyPatch()
+    db_path = tmp_path_factory.mktemp("db") / "test.db"
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{db_path}")
+    monkeypatch.setattr(Config, "WTF_CSRF_ENABLED", False)
+    monkeypatch.setattr(Config, "RATELIMIT_ENABLED", False, raising=False)
+
+    from app import create_app
+    from models import db, Laptop, User
+    from manage_data import SAMPLE_LAPTOPS, BENCHMARK_DATA
+
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        for data in SAMPLE_LAPTOPS:
+            db.session.add(Laptop(**data, **BENCHMARK_DATA.get(data["name"], {})))
+        admin = User(username="admin", email="admin@example.com", role="admin")
+        admin.set_password(ADMIN_PASSWORD)
+        db.session.add(admin)
+        db.session.commit()
+
+    yield app
+    monkeypatch.undo()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": ADMIN_PASSWORD})
+    return client
+
+class FakeMessages:
+    """Thay client.messages của Anthropic: trả lời cố định theo từng đoạn, hoặc ném error"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.error = None
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(content=[SimpleNamespace(text="".join(self.chunks))])
+
+    @contextmanager
+    def stream(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.error is not None:
+            raise self.error
+        yield SimpleNamespace(text_stream=iter(self.chunks))
+
+@pytest.fixture
+def fake_model(app, monkeypatch):
+    """Model giả cho chatbot (cả messages.create lẫn messages.stream); breaker và cache làm mới"""
+    from circuit_breaker import CircuitBreaker
+    from response_cache import response_cache
+
+    chatbot = app.extensions["chatbot"]
+    messages = FakeMessages(["Laptop này ", "phù hợp ", "với nhu cầu của bạn."])
+    monkeypatch.setattr(chatbot, "budget_client", SimpleNamespace(messages=messages))
+    monkeypatch.setattr(chatbot, "breaker", CircuitBreaker())
+    response_cache._on_change([])
+    yield messages
+    response_cache._on_change([])
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lưu lịch sử chat phía server (bảng chat_conversations) thay cho cookie session
+Cookie chỉ giữ id hội thoại; lịch sử được sanitize một lần khi ghi,
+giới hạn số tin nhắn và số byte, hết hạn sau CHAT_CONVERSATION_TTL giây không hoạt động
+"""
+
+import json
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, insert, delete
+from models import db, ChatConversation
+from db_profile import read_engine
+from chatbot_service import SecurityFilter
+
+logger = logging.getLogger(__name__)
+
+class ConversationStore:
+    """Đọc/ghi lịch sử hội thoại theo id, độc lập với session của request"""
+
+    def __init__(self, ttl=86400, max_bytes=8192, max_messages=10, prune_interval=600):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.prune_interval = prune_interval
+        self.security_filter = SecurityFilter()
+        self._engine = None
+        self._read_engine = None
+        self._next_prune = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CHAT_CONVERSATION_TTL', self.ttl)
+        self.max_bytes = app.config.get('CHAT_CONVERSATION_MAX_BYTES', self.max_bytes)
+        self.max_messages = app.config.get('CHAT_CONVERSATION_MAX_MESSAGES', self.max_messages)
+        with app.app_context():
+            self._engine = db.engine
+            self._read_engine = read_engine()
+            ChatConversation.__table__.create(bind=db.engine, checkfirst=True)
+        self.prune()
+        app.extensions['conversation_store'] = self
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def _cutoff(self):
+        return datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    def load(self, conversation_id):
+        """Lịch sử (cũ nhất trước); [] nếu không có hoặc đã hết hạn"""
+        if not conversation_id:
+            return []
+        table = ChatConversation.__table__
+        with self._read_engine.connect() as conn:
+            raw = conn.execute(
+                select(table.c.history)
+                .where(table.c.id == conversation_id, table.c.updated_at >= self._cutoff())
+            ).scalar()
+        return json.loads(raw) if raw else []
+
+    def _bounded(self, history):
+        """Giữ các tin nhắn mới nhất trong giới hạn số lượng và số byte, bắt đầu bằng lượt user"""
+        history = history[-self.max_messages:]
+        raw = json.dumps(history, ensure_ascii=False)
+        while history and len(raw.encode()) > self.max_bytes:
+            history = history[1:]
+            raw = json.dumps(history, ensure_ascii=False)
+        while history and history[0]["role"] != "user":
+            history = history[1:]
+            raw = json.dumps(history, ensure_ascii=False)
+        return history, raw
+
+    def append_turn(self, conversation_id, history, user_message, bot_response):
+        """Thêm một lượt hỏi/đáp vào history đã load và ghi lại; trả về history mới"""
+        for role, content in (("user", user_message), ("assistant", bot_response)):
+            content = self.security_filter.sanitize_input(content)
+            if content:
+                history = history + [{"role": role, "content": content}]
+        history, raw = self._bounded(history)
+
+        table = ChatConversation.__table__
+        now = datetime.utcnow()
+        with self._engine.begin() as conn:
+            updated = conn.execute(
+                update(table).where(table.c.id == conversation_id).values(history=raw, updated_at=now)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(table).values(id=conversation_id, history=raw, updated_at=now))
+        self._maybe_prune()
+        return history
+
+    def clear(self, conversation_id):
+        if not conversation_id:
+            return
+        table = ChatConversation.__table__
+        with self._engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.id == conversation_id))
+
+    def _maybe_prune(self):
+        if time.monotonic() >= self._next_prune:
+            self.prune()
+
+    def prune(self):
+        """Xóa hội thoại đã hết hạn"""
+        self._next_prune = time.monotonic() + self.prune_interval
+        table = ChatConversation.__table__
+        try:
+            with self._engine.begin() as conn:
+                removed = conn.execute(delete(table).where(table.c.updated_at < self._cutoff())).rowcount
+            if removed:
+                logger.info(f"Pruned {removed} expired chat conversations")
+        except Exception as e:
+            logger.error(f"Conversation prune error: {e}")
+
+conversation_store = ConversationStore()
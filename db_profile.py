@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profile SQLite: WAL, pragma cho từng connection, pool đọc riêng và một writer duy nhất
+- configure(app) (trước db.init_app): engine mặc định thành writer (pool 1 connection,
+  BEGIN IMMEDIATE), thêm bind 'read' là pool connection chỉ đọc (PRAGMA query_only)
+- init_app(app) (sau db.init_app): gắn pragma qua sự kiện connect của từng engine và bật WAL
+- RoutingSession: chọn engine theo loại câu lệnh (không theo HTTP method): SELECT đi qua pool
+  đọc; flush, câu lệnh ghi và mọi thứ sau đó trong cùng transaction đi qua writer tới khi
+  commit/rollback. Request chỉ đọc (thường là GET) không chạm writer và nhờ WAL không bị chặn
+  khi admin đang ghi; request nào có ghi, kể cả GET, dùng writer từ lần ghi đầu tiên
+Chỉ áp dụng cho SQLite dạng file; database khác hoặc :memory: giữ nguyên cấu hình mặc định
+"""
+
+import re
+import logging
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger(__name__)
+
+READ_BIND = 'read'
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+READ_SQL = re.compile(r'\s*(select|with)\b', re.IGNORECASE)
+
+# Cờ trong session.info: transaction hiện tại đã ghi, đọc tiếp cũng phải qua writer
+_WRITING = 'db_profile_writing'
+
+def is_file_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def enabled(app):
+    return app.config.get('SQLITE_TUNING', True) and is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI'])
+
+def connection_pragmas(config):
+    """Pragma áp dụng cho mọi connection (cả đọc lẫn ghi), lấy từ config SQLITE_*"""
+    synchronous = str(config.get('SQLITE_SYNCHRONOUS', 'NORMAL')).upper()
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS phải là một trong {SYNCHRONOUS_LEVELS}")
+    return {
+        'busy_timeout': int(config.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'cache_size': int(config.get('SQLITE_CACHE_SIZE', -65536)),
+        'mmap_size': int(config.get('SQLITE_MMAP_SIZE', 268435456)),
+        'synchronous': synchronous
+    }
+
+def configure(app):
+    """Thêm engine options (writer) và bind đọc vào config; gọi trước db.init_app(app)"""
+    if not enabled(app):
+        return
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        # Mọi thao tác ghi trong process xếp hàng ở pool thay vì tranh khóa trong SQLite
+        'pool_size': 1,
+        'max_overflow': 0,
+        'pool_timeout': app.config.get('SQLITE_WRITE_POOL_TIMEOUT', 10),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds.setdefault(READ_BIND, {
+        'url': app.config['SQLALCHEMY_DATABASE_URI'],
+        'pool_size': app.config.get('SQLITE_READ_POOL_SIZE', 8),
+        'max_overflow': app.config.get('SQLITE_READ_POOL_OVERFLOW', 8)
+    })
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+def _execute_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+def init_app(app):
+    """Gắn pragma vào engine writer và engine đọc, bật WAL; gọi sau db.init_app(app)"""
+    with app.app_context():
+        engines = current_app.extensions['sqlalchemy'].engines
+    reader = engines.get(READ_BIND)
+    if not enabled(app) or reader is None:
+        return
+    writer = engines[None]
+    pragmas = list(connection_pragmas(app.config).items())
+
+    @event.listens_for(writer, 'connect')
+    def _writer_connect(dbapi_connection, connection_record):
+        # Tự điều khiển BEGIN (xem _writer_begin); journal_mode phải đặt ngoài transaction
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            mode = cursor.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        finally:
+            cursor.close()
+        if mode.lower() != 'wal':
+            logger.warning(f"SQLite journal_mode is {mode}, WAL not available")
+        _execute_pragmas(dbapi_connection, pragmas)
+
+    @event.listens_for(writer, 'begin')
+    def _writer_begin(conn):
+        # Lấy khóa ghi ngay đầu transaction: worker khác chờ busy_timeout thay vì lỗi
+        # "database is locked" ngay lập tức khi nâng cấp từ khóa đọc lên khóa ghi
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @event.listens_for(reader, 'connect')
+    def _reader_connect(dbapi_connection, connection_record):
+        _execute_pragmas(dbapi_connection, pragmas + [('query_only', 'ON')])
+
+    # Mở writer một lần để file database chuyển sang WAL trước khi pool đọc kết nối
+    with writer.connect():
+        pass
+    app.extensions['db_profile'] = dict(pragmas)
+
+def read_engine():
+    """Engine cho truy vấn chỉ đọc ngoài session: pool đọc nếu có, không thì engine mặc định"""
+    engines = current_app.extensions['sqlalchemy'].engines
+    return engines.get(READ_BIND, engines[None])
+
+def _is_read(mapper, clause):
+    if clause is None:
+        # session.connection() không kèm câu lệnh thường để ghi trực tiếp (xem catalog_events)
+        return mapper is not None
+    if isinstance(clause, TextClause):
+        return bool(READ_SQL.match(clause.text))
+    return not getattr(clause, 'is_dml', False)
+
+class RoutingSession(Session):
+    """Session chọn engine theo loại câu lệnh: đọc qua bind 'read', ghi qua writer"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not self.info.get(_WRITING) and _is_read(mapper, clause):
+            reader = self._db.engines.get(READ_BIND)
+            if reader is not None:
+                return reader
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        self.info[_WRITING] = True
+        return engine
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _transaction_end(session, transaction):
+    # Dữ liệu đã commit (hoặc rollback): transaction sau lại đọc qua pool đọc
+    if transaction.parent is None:
+        session.info.pop(_WRITING, None)
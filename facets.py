@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đếm facet (brand, category, RAM, mức giá, pin) cho trang lọc laptop
+Mỗi giá trị facet có một bitmap (int Python, bit i = dòng i của snapshot),
+giao các filter chỉ là vài phép AND và đếm bằng bit_count()
+"""
+
+import threading
+from utils import get_price_category, get_ram_category, get_battery_category
+from catalog_events import on_catalog_change
+from catalog_snapshot import catalog_store
+from catalog_version import catalog_version
+import search_index
+
+# Các facet được đếm (tên dùng làm key trong kết quả và tham số API)
+FACETS = ('brand', 'category', 'ram_tier', 'price_bucket', 'battery')
+
+def _bitmap(positions, size):
+    """Tạo bitmap từ danh sách vị trí dòng"""
+    bits = bytearray((size + 7) // 8)
+    for pos in positions:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, 'little')
+
+class FacetBitmaps:
+    """Bitmap cho từng giá trị của từng facet, dựng từ một snapshot"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.size = snapshot.size
+        self.all = (1 << self.size) - 1
+
+        battery = snapshot.columns['battery_life_office']
+        values = {
+            'brand': [snapshot.brand_values[c] for c in snapshot.brand_codes],
+            'category': [snapshot.category_values[c] for c in snapshot.category_codes],
+            'ram_tier': [get_ram_category(r) for r in snapshot.ram],
+            'price_bucket': [get_price_category(p) for p in snapshot.prices],
+            'battery': [get_battery_category(b) for b in battery],
+        }
+        self.bitmaps = {}
+        for facet, column in values.items():
+            postings = {}
+            for pos, value in enumerate(column):
+                postings.setdefault(value, []).append(pos)
+            self.bitmaps[facet] = {v: _bitmap(p, self.size) for v, p in postings.items()}
+
+    def positions_bitmap(self, positions):
+        return _bitmap(positions, self.size)
+
+    def counts(self, selected, base=None):
+        """Đếm mọi facet trong một lượt
+
+        selected: {facet: giá trị đang chọn}; base: bitmap của các filter không phải facet
+        (khoảng giá, RAM tối thiểu, từ khóa). Mỗi facet được đếm dưới mọi filter trừ chính nó,
+        nên người dùng vẫn thấy số lượng của các lựa chọn khác trong cùng facet.
+        """
+        base = self.all if base is None else base
+        masks = {}
+        for facet, value in selected.items():
+            masks[facet] = self.bitmaps[facet].get(value, 0)
+
+        result = {}
+        for facet in FACETS:
+            mask = base
+            for other, other_mask in masks.items():
+                if other != facet:
+                    mask &= other_mask
+            result[facet] = {
+                value: (bitmap & mask).bit_count()
+                for value, bitmap in self.bitmaps[facet].items()
+            }
+        total = base
+        for other_mask in masks.values():
+            total &= other_mask
+        return result, total.bit_count()
+
+class FacetIndex:
+    """Bitmap theo snapshot hiện tại + cache kết quả theo phiên bản catalog"""
+
+    def __init__(self, cache_size=512):
+        self.cache_size = cache_size
+        self._bitmaps = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['facet_index'] = self
+        # Đăng ký sau catalog_store để snapshot mới đã sẵn sàng
+        on_catalog_change(self._on_change)
+
+    def _on_change(self, changes):
+        with self._lock:
+            self._bitmaps = None
+            self._cache.clear()
+
+    def _get_bitmaps(self):
+        snapshot = catalog_store.get()
+        bitmaps = self._bitmaps
+        if bitmaps is None or bitmaps.snapshot is not snapshot:
+            bitmaps = FacetBitmaps(snapshot)
+            with self._lock:
+                self._bitmaps = bitmaps
+        return bitmaps
+
+    def counts(self, brand=None, category=None, ram_tier=None, price_bucket=None, battery=None,
+               price_min=None, price_max=None, ram_min=None, search=None):
+        """Số laptop theo từng giá trị facet dưới bộ filter hiện tại"""
+        selected = {
+            facet: value for facet, value in (
+                ('brand', brand), ('category', category), ('ram_tier', ram_tier),
+                ('price_bucket', price_bucket), ('battery', battery)
+            ) if value
+        }
+        key = (catalog_version.token, tuple(sorted(selected.items())),
+               price_min, price_max, ram_min, search or None)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        bitmaps = self._get_bitmaps()
+        snapshot = bitmaps.snapshot
+        base = None
+        if price_min is not None or price_max is not None or ram_min is not None or search:
+            # Từ khóa dùng cùng truy vấn full-text với danh sách laptop
+            hits = search_index.search(search, match_all=True) if search else None
+            ids = [hit.id for hit in hits] if hits is not None else None
+            positions = snapshot.filter(price_min=price_min, price_max=price_max,
+                                        ram_min=ram_min, ids=ids)
+            base = bitmaps.positions_bitmap(positions)
+
+        facets, total = bitmaps.counts(selected, base)
+        result = {"total": total, "facets": facets}
+        with self._lock:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = result
+        return result
+
+facet_index = FacetIndex()
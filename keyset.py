@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Phân trang keyset (cursor) theo khóa (price, id)
+Thay cho OFFSET + COUNT(*) của paginate(): mỗi trang chỉ đọc per_page + 1 dòng
+"""
+
+import base64
+import threading
+from models import db
+from catalog_events import on_catalog_change
+
+class InvalidCursor(ValueError):
+    """Cursor không giải mã được"""
+
+def encode_cursor(direction, price, laptop_id):
+    """Tạo cursor opaque: direction 'n' (trang sau key) hoặc 'p' (trang trước key)"""
+    raw = f"{direction}:{int(price)}:{int(laptop_id)}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Giải mã cursor, trả về (direction, (price, id)) hoặc (None, None) nếu rỗng"""
+    if not token:
+        return None, None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, price, laptop_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        if direction not in ('n', 'p'):
+            raise ValueError(direction)
+        return direction, (int(price), int(laptop_id))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Cursor không hợp lệ: {token}") from e
+
+class KeysetPage:
+    """Một trang kết quả keyset kèm cursor cho trang trước/sau"""
+
+    def __init__(self, items, per_page, has_next, has_prev, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total
+        self.highlights = {}
+        self.next_cursor = encode_cursor('n', items[-1].price, items[-1].id) if items and has_next else None
+        self.prev_cursor = encode_cursor('p', items[0].price, items[0].id) if items and has_prev else None
+
+    def to_dict(self):
+        return {
+            "per_page": self.per_page,
+            "has_next": self.has_next,
+            "has_prev": self.has_prev,
+            "next_cursor": self.next_cursor,
+            "prev_cursor": self.prev_cursor,
+            "total": self.total
+        }
+
+def keyset_paginate(query, model, cursor=None, per_page=20, total=None):
+    """Phân trang query SQLAlchemy theo (price, id) tăng dần bằng cursor"""
+    direction, key = decode_cursor(cursor)
+    price_col, id_col = model.price, model.id
+
+    if direction == 'p':
+        price, laptop_id = key
+        rows = (query
+                .filter(db.or_(price_col < price, db.and_(price_col == price, id_col < laptop_id)))
+                .order_by(price_col.desc(), id_col.desc())
+                .limit(per_page + 1)
+                .all())
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(items, per_page, has_next=True, has_prev=has_prev, total=total)
+
+    if direction == 'n':
+        price, laptop_id = key
+        query = query.filter(db.or_(price_col > price, db.and_(price_col == price, id_col > laptop_id)))
+    rows = query.order_by(price_col.asc(), id_col.asc()).limit(per_page + 1).all()
+    return KeysetPage(rows[:per_page], per_page, has_next=len(rows) > per_page,
+                      has_prev=direction == 'n', total=total)
+
+class CountCache:
+    """Cache kết quả COUNT(*) theo key, xóa khi catalog thay đổi"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+        on_catalog_change(self._on_change)
+
+    def _on_change(self, changes):
+        with self._lock:
+            self._counts.clear()
+
+    def get(self, key, query):
+        count = self._counts.get(key)
+        if count is None:
+            count = query.order_by(None).count()
+            with self._lock:
+                self._counts[key] = count
+        return count
+
+count_cache = CountCache()
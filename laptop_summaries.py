@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tóm tắt ngắn cho từng laptop (điểm mạnh, điểm yếu, phù hợp với ai), tạo sẵn ngoài request
+- Tạo bằng `python manage_data.py summaries`: theo luật từ thông số, bằng model
+  (--model, dùng được với mock_anthropic.py) hoặc nhập tay (--import)
+- Mọi tóm tắt đều qua fact_check: số liệu phải khớp thông số, không nhắc laptop/hãng khác
+- Lưu kèm hash thông số; thông số đổi thì tóm tắt bị coi là cũ, prompt dùng lại bảng thông số đầy đủ
+  và lần chạy job sau sẽ tạo lại
+"""
+
+import re
+import json
+import hashlib
+import threading
+import logging
+from sqlalchemy import select
+from models import db, LaptopSummary
+from db_profile import read_engine
+from catalog_events import on_catalog_change
+
+logger = logging.getLogger(__name__)
+
+# Các cột của Laptop mà tóm tắt dựa vào
+SUMMARY_FIELDS = (
+    'name', 'brand', 'cpu', 'ram_gb', 'gpu', 'storage', 'screen', 'price', 'category',
+    'battery_life_office', 'battery_life_gaming', 'cpu_multi_core_plugged', 'gpu_score_plugged'
+)
+MAX_SUMMARY_CHARS = 200
+
+CATEGORY_LABELS = {
+    'gaming': 'game',
+    'design': 'đồ họa',
+    'dev': 'lập trình',
+    'student': 'sinh viên',
+    'office': 'văn phòng'
+}
+INTEGRATED_GPU_WORDS = ('integrated', 'iris', 'uhd', 'radeon graphics', 'igpu')
+SHARP_SCREEN_WORDS = ('oled', '2.5k', '2.8k', '3.5k', '4k', 'retina')
+NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*')
+
+def spec_hash(laptop):
+    """Hash các thông số dùng để tóm tắt (Laptop, LaptopRow hoặc object cùng thuộc tính)"""
+    raw = json.dumps([getattr(laptop, field) for field in SUMMARY_FIELDS], ensure_ascii=False)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def _hours(minutes):
+    return f"{round(minutes / 60, 1):g}"
+
+def is_integrated_gpu(gpu):
+    gpu = (gpu or '').lower()
+    return not gpu or gpu == 'radeon' or any(word in gpu for word in INTEGRATED_GPU_WORDS)
+
+def strengths_weaknesses(laptop):
+    """(điểm mạnh, điểm yếu) suy ra trực tiếp từ thông số theo ngưỡng cố định"""
+    strong, weak = [], []
+    gpu_score = laptop.gpu_score_plugged or 0
+    if gpu_score >= 9000:
+        strong.append("GPU mạnh")
+    elif is_integrated_gpu(laptop.gpu) and laptop.category in ('gaming', 'design'):
+        weak.append("GPU tích hợp")
+
+    cpu_multi = laptop.cpu_multi_core_plugged or 0
+    if cpu_multi >= 7500:
+        strong.append("CPU mạnh")
+    elif 0 < cpu_multi <= 4500:
+        weak.append("CPU yếu")
+
+    battery = laptop.battery_life_office or 0
+    if battery >= 600:
+        strong.append(f"pin rất lâu ~{_hours(battery)}h")
+    elif battery >= 480:
+        strong.append(f"pin ~{_hours(battery)}h")
+    elif 0 < battery <= 330:
+        weak.append(f"pin ngắn ~{_hours(battery)}h")
+
+    ram = laptop.ram_gb or 0
+    if ram >= 32:
+        strong.append(f"RAM {ram}GB")
+    elif 0 < ram <= 4:
+        weak.append(f"RAM {ram}GB")
+    elif ram == 8:
+        weak.append("RAM 8GB")
+
+    storage = (laptop.storage or '').lower()
+    if 'emmc' in storage:
+        weak.append("ổ eMMC")
+    elif storage.startswith('128'):
+        weak.append("ổ 128GB")
+    elif storage.startswith('1tb'):
+        strong.append("ổ 1TB")
+
+    screen = (laptop.screen or '').lower()
+    refresh = re.search(r'(\d+)\s*hz', screen)
+    if refresh and int(refresh.group(1)) >= 120:
+        strong.append(f"màn {refresh.group(1)}Hz")
+    if any(word in screen for word in SHARP_SCREEN_WORDS):
+        strong.append("màn sắc nét")
+
+    price = laptop.price or 0
+    if 0 < price <= 10_000_000:
+        strong.append("giá rẻ")
+    elif price >= 45_000_000:
+        weak.append("giá cao")
+    return strong, weak
+
+def rule_summary(laptop):
+    """Tóm tắt theo luật; luôn qua được fact_check"""
+    strong, weak = strengths_weaknesses(laptop)
+    parts = [f"Mạnh: {', '.join(strong[:3])}." if strong else "Cân bằng."]
+    if weak:
+        parts.append(f"Yếu: {', '.join(weak[:2])}.")
+    if laptop.category in CATEGORY_LABELS:
+        parts.append(f"Hợp: {CATEGORY_LABELS[laptop.category]}.")
+    return ' '.join(parts)[:MAX_SUMMARY_CHARS]
+
+# ---------- Kiểm tra ----------
+def _to_number(token):
+    if re.fullmatch(r'\d{1,3}(?:[.,]\d{3})+', token):
+        return float(re.sub(r'[.,]', '', token))  # 36.000.000
+    try:
+        return float(token.replace(',', '.'))
+    except ValueError:
+        return None
+
+def spec_numbers(laptop):
+    """Mọi số liệu được phép xuất hiện trong tóm tắt của laptop"""
+    numbers = set()
+    for field in ('name', 'cpu', 'gpu', 'storage', 'screen'):
+        for token in NUMBER_PATTERN.findall(getattr(laptop, field) or ''):
+            value = _to_number(token)
+            if value is not None:
+                numbers.add(value)
+    for field in ('ram_gb', 'price', 'cpu_multi_core_plugged', 'gpu_score_plugged'):
+        if getattr(laptop, field):
+            numbers.add(float(getattr(laptop, field)))
+    if laptop.price:
+        numbers.add(laptop.price / 1_000_000)  # "36 triệu", "36tr"
+    for field in ('battery_life_office', 'battery_life_gaming'):
+        minutes = getattr(laptop, field)
+        if minutes:
+            numbers.update((float(minutes), minutes / 60))
+    return numbers
+
+def fact_check(text, laptop, other_names=()):
+    """Danh sách lỗi (rỗng nếu tóm tắt dùng được)"""
+    problems = []
+    if not text or not text.strip():
+        return ["tóm tắt rỗng"]
+    if len(text) > MAX_SUMMARY_CHARS:
+        problems.append(f"dài {len(text)} ký tự (tối đa {MAX_SUMMARY_CHARS})")
+    if '\n' in text or '**' in text or '•' in text:
+        problems.append("có markdown hoặc xuống dòng")
+
+    allowed = spec_numbers(laptop)
+    for token in NUMBER_PATTERN.findall(text):
+        value = _to_number(token)
+        if value is None:
+            continue
+        # Cho phép làm tròn (ví dụ 7.5h viết thành 7h30 hoặc ~8h)
+        if not any(abs(value - ok) <= max(0.5, ok * 0.01) for ok in allowed):
+            problems.append(f"số liệu {token} không có trong thông số")
+
+    own = f"{laptop.name} {laptop.brand}".lower()
+    lowered = text.lower()
+    for name in other_names:
+        if name and name.lower() not in own and re.search(rf'\b{re.escape(name.lower())}\b', lowered):
+            problems.append(f"nhắc tới {name}")
+    return problems
+
+def model_prompt(laptop):
+    """(system, user) để model viết tóm tắt; gợi ý từ luật giúp model bám thông số"""
+    strong, weak = strengths_weaknesses(laptop)
+    specs = {field: getattr(laptop, field) for field in SUMMARY_FIELDS}
+    system = ("Bạn viết tóm tắt laptop cho nhân viên tư vấn bằng tiếng Việt. "
+              f"Tối đa {MAX_SUMMARY_CHARS} ký tự, 2-3 ý: điểm mạnh, điểm yếu, phù hợp với ai. "
+              "CHỈ dùng số liệu có trong thông số, không nhắc laptop hoặc hãng khác, không markdown.")
+    user = (f"Thông số: {json.dumps(specs, ensure_ascii=False)}\n"
+            f"Gợi ý - mạnh: {', '.join(strong) or 'không có'}; yếu: {', '.join(weak) or 'không có'}")
+    return system, user
+
+# ---------- Đọc khi tạo prompt ----------
+class SummaryStore:
+    """Tóm tắt trong bộ nhớ process; chỉ trả tóm tắt còn khớp thông số hiện tại"""
+
+    def __init__(self):
+        self._summaries = None  # laptop_id -> (spec_hash, summary)
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        with app.app_context():
+            self._engine = read_engine()
+            if db.inspect(db.engine).has_table('laptops'):
+                LaptopSummary.__table__.create(bind=db.engine, checkfirst=True)
+        self._summaries = None
+        app.extensions['summary_store'] = self
+        on_catalog_change(self._on_change)
+
+    def _load(self, laptop_ids=None):
+        table = LaptopSummary.__table__
+        query = select(table.c.laptop_id, table.c.spec_hash, table.c.summary)
+        if laptop_ids is not None:
+            query = query.where(table.c.laptop_id.in_(laptop_ids))
+        try:
+            with self._engine.connect() as conn:
+                return {row.laptop_id: (row.spec_hash, row.summary) for row in conn.execute(query)}
+        except Exception as e:
+            logger.error(f"Laptop summaries load error: {e}")
+            return {}
+
+    def _on_change(self, changes):
+        if self._summaries is None:
+            return
+        changed = changes['insert'] | changes['update'] | changes['delete']
+        fresh = self._load(changed)
+        with self._lock:
+            summaries = {k: v for k, v in self._summaries.items() if k not in changed}
+            summaries.update(fresh)
+            self._summaries = summaries
+
+    def _get_all(self):
+        summaries = self._summaries
+        if summaries is None:
+            with self._lock:
+                if self._summaries is None:
+                    self._summaries = self._load()
+                summaries = self._summaries
+        return summaries
+
+    def get(self, laptop):
+        """Tóm tắt của laptop (LaptopRow) hoặc None nếu chưa có / đã cũ"""
+        if self._engine is None:
+            return None
+        entry = self._get_all().get(laptop.id)
+        if entry and entry[0] == spec_hash(laptop):
+            return entry[1]
+        return None
+
+summary_store = SummaryStore()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load test các endpoint chatbot với Messages API giả lập (mock_anthropic.py)
+Mỗi user ảo là một cuộc hội thoại riêng (cookie session riêng), gửi lần lượt các lượt chat
+Báo cáo p50/p95/p99, throughput và thời gian từng giai đoạn (retrieve, prompt, generate)
+
+Chạy trong process (tự khởi động mock server + app, tắt rate limit):
+    python load_test_chat.py --users 20 --turns 5 --endpoint mixed --latency lognormal:400:0.5
+Chạy với app đang chạy sẵn (app phải trỏ ANTHROPIC_BASE_URL tới mock server):
+    python load_test_chat.py --url http://127.0.0.1:5000 --users 20
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from http.cookiejar import CookieJar
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ENDPOINTS = {
+    'chat': ('/api/chat', 'message'),
+    'stream': ('/api/chat/stream', 'message'),
+    'recommend': ('/api/chat/recommend', 'message'),
+    'search': ('/api/chat/search', 'query')
+}
+STAGES = ('retrieve_ms', 'prompt_ms', 'generate_ms')
+
+QUESTIONS = [
+    "Tư vấn laptop gaming dưới 30 triệu",
+    "laptop cho sinh viên khoảng 15tr",
+    "So sánh Dell XPS 13 và MacBook Air",
+    "RAM 16GB có đủ cho lập trình không",
+    "Tìm laptop văn phòng trên 10 triệu, 16GB RAM",
+    "laptop thiết kế đồ họa có RTX, ngân sách 40 triệu",
+    "máy asus hay lenovo tốt hơn cho game",
+    "laptop nào pin lâu nhất",
+    "SSD là gì",
+    "laptop dev coding dưới 25 triệu"
+]
+
+def percentile(sorted_values, p):
+    """Percentile kiểu nearest-rank trên list đã sắp xếp"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.busy = defaultdict(int)  # 503 từ cổng giới hạn gọi model (không tính là lỗi)
+        self.stages = defaultdict(lambda: defaultdict(list))
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, latency_ms, ok, timings, busy=False):
+        with self._lock:
+            self.latencies[endpoint].append(latency_ms)
+            if busy:
+                self.busy[endpoint] += 1
+            elif not ok:
+                self.errors[endpoint] += 1
+            for stage in STAGES:
+                if timings and stage in timings:
+                    self.stages[endpoint][stage].append(timings[stage])
+
+def parse_response(endpoint, body):
+    """(thành công, timings) từ body JSON hoặc sự kiện 'done' của SSE"""
+    if endpoint == 'stream':
+        done = None
+        for block in body.split('\n\n'):
+            if block.startswith('event: done'):
+                done = json.loads(block.split('data: ', 1)[1])
+        return bool(done and done.get('success')), (done or {}).get('timings')
+    data = json.loads(body)
+    return bool(data.get('success')), data.get('timings')
+
+def run_conversation(base_url, user_id, turns, endpoint, think_ms, results, seed):
+    rng = random.Random(seed + user_id)
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    for _ in range(turns):
+        name = rng.choice(list(ENDPOINTS)) if endpoint == 'mixed' else endpoint
+        path, field = ENDPOINTS[name]
+        request = urllib.request.Request(
+            base_url + path,
+            data=json.dumps({field: rng.choice(QUESTIONS)}).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        start = time.perf_counter()
+        busy = False
+        try:
+            with opener.open(request, timeout=60) as response:
+                body = response.read().decode()
+            ok, timings = parse_response(name, body)
+        except urllib.error.HTTPError as e:
+            ok, timings, busy = False, None, e.code == 503
+        except (urllib.error.URLError, ValueError, OSError):
+            ok, timings = False, None
+        results.add(name, (time.perf_counter() - start) * 1000, ok, timings, busy)
+        if think_ms:
+            time.sleep(think_ms / 1000)
+
+def start_local_app(mock_url, use_cache):
+    """App Flask chạy trong thread nền, trỏ tới mock server; trả về (base_url, server)"""
+    from werkzeug.serving import make_server
+    from config import Config
+    Config.ANTHROPIC_BASE_URL = mock_url
+    Config.RATELIMIT_ENABLED = False
+    if not use_cache:
+        Config.CHATBOT_RESPONSE_CACHE_SIZE = 0
+    from app import create_app
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+def report(results, elapsed):
+    total = sum(len(v) for v in results.latencies.values())
+    print(f"\n📊 {total} request trong {elapsed:.1f}s - throughput {total / elapsed:.1f} req/s")
+    print(f"\n{'endpoint':<10} {'n':>5} {'lỗi':>5} {'503':>5} {'p50':>9} {'p95':>9} {'p99':>9}   "
+          + '  '.join(f"{stage[:-3]:>9}" for stage in STAGES))
+    for endpoint in sorted(results.latencies):
+        values = sorted(results.latencies[endpoint])
+        stages = results.stages[endpoint]
+        stage_cols = '  '.join(
+            f"{sum(stages[s]) / len(stages[s]):9.1f}" if stages[s] else f"{'-':>9}" for s in STAGES
+        )
+        print(f"{endpoint:<10} {len(values):5d} {results.errors[endpoint]:5d} {results.busy[endpoint]:5d} "
+              f"{percentile(values, 50):9.1f} {percentile(values, 95):9.1f} {percentile(values, 99):9.1f}   {stage_cols}")
+    print("\n(ms; cột giai đoạn là trung bình trên các response có timings)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test chatbot với Messages API giả lập")
+    parser.add_argument('--url', help="app đang chạy sẵn; bỏ trống để chạy app trong process")
+    parser.add_argument('--users', type=int, default=10, help="số cuộc hội thoại đồng thời")
+    parser.add_argument('--turns', type=int, default=5, help="số lượt mỗi cuộc hội thoại")
+    parser.add_argument('--endpoint', default='mixed', choices=sorted(ENDPOINTS) + ['mixed'])
+    parser.add_argument('--think-ms', type=float, default=0, help="nghỉ giữa hai lượt của một user")
+    parser.add_argument('--latency', default='lognormal:400:0.5', help="độ trễ mock server (xem mock_anthropic.py)")
+    parser.add_argument('--token-delay-ms', type=float, default=15)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--cache', action='store_true', help="giữ cache câu trả lời (mặc định tắt khi chạy trong process)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print("🚀 Load test chatbot")
+    print("=" * 50)
+    mock = app_server = None
+    base_url = args.url
+    if not base_url:
+        from mock_anthropic import MockAnthropicServer
+        mock = MockAnthropicServer(latency=args.latency, token_delay_ms=args.token_delay_ms,
+                                   error_rate=args.error_rate).start()
+        base_url, app_server = start_local_app(mock.base_url, args.cache)
+        print(f"🤖 Mock Messages API: {mock.base_url} (độ trễ {args.latency}, lỗi {args.error_rate:.0%})")
+    print(f"🌐 App: {base_url}")
+    print(f"👥 {args.users} user x {args.turns} lượt, endpoint: {args.endpoint}")
+
+    results = Results()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for user_id in range(args.users):
+            pool.submit(run_conversation, base_url, user_id, args.turns, args.endpoint,
+                        args.think_ms, results, args.seed)
+    report(results, time.perf_counter() - start)
+
+    if mock:
+        print(f"\n🤖 Mock server: {mock.stats['requests']} request, {mock.stats['errors']} lỗi, "
+              f"{mock.stats['streams']} streaming")
+        app_server.shutdown()
+        mock.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,15 +2,21 @@
 # -*- coding: utf-8 -*-
 """
 Script quản lý dữ liệu tổng hợp cho laptop recommender system
-Bao gồm: seed data, cập nhật benchmark, quản lý hình ảnh, tạo user/admin
+Bao gồm: seed data, cập nhật benchmark, quản lý hình ảnh, tạo user/admin, tóm tắt laptop cho chatbot
 Sử dụng: python manage_data.py
+         python manage_data.py summaries [--model] [--force] [--import FILE] [--export FILE]
+         python manage_data.py scores [--force]
 """
 
 from app import create_app
-from models import db, Laptop, User
+from models import db, Laptop, User, LaptopSummary
 import os
 import re
+import sys
+import json
 import uuid
+import argparse
+from datetime import datetime
 from PIL import Image
 import io
 
@@ -650,6 +656,100 @@ def create_test_users():
             print(f"🔑 {user_data['password']}")
             print("-" * 20)
 
+def generate_laptop_summaries(use_model=False, force=False, import_file=None):
+    """
+    Tạo tóm tắt cho laptop chưa có hoặc có tóm tắt đã cũ (thông số đổi); --force tạo lại tất cả
+    use_model: nhờ model viết (ANTHROPIC_BASE_URL có thể trỏ tới mock_anthropic.py),
+    tóm tắt không qua fact_check thì dùng tóm tắt theo luật
+    import_file: JSON {tên hoặc id laptop: tóm tắt} viết tay, cũng phải qua fact_check
+    """
+    from laptop_summaries import spec_hash, rule_summary, fact_check, model_prompt
+    from catalog_events import mark_updated
+    app = create_app()
+    with app.app_context():
+        manual = {}
+        if import_file:
+            with open(import_file, encoding='utf-8') as f:
+                manual = {str(key): text for key, text in json.load(f).items()}
+        
+        laptops = Laptop.query.all()
+        names = sorted({laptop.name for laptop in laptops} | {laptop.brand for laptop in laptops})
+        chatbot = app.extensions['chatbot'] if use_model else None
+        print(f"🔄 Đang tạo tóm tắt laptop ({'model' if use_model else 'theo luật'})...")
+        
+        created, skipped, rejected, changed_ids = 0, 0, 0, []
+        for laptop in laptops:
+            current_hash = spec_hash(laptop)
+            if import_file:
+                text = manual.get(str(laptop.id), manual.get(laptop.name))
+                if not text:
+                    continue
+                source = 'manual'
+            elif laptop.summary and laptop.summary.spec_hash == current_hash and not force:
+                skipped += 1
+                continue
+            else:
+                text, source = None, 'rule'
+                if chatbot is not None:
+                    system, user = model_prompt(laptop)
+                    try:
+                        response = chatbot.client.messages.create(
+                            model=chatbot.model,
+                            max_tokens=200,
+                            temperature=0,
+                            system=system,
+                            messages=[{"role": "user", "content": user}]
+                        )
+                        text, source = response.content[0].text.strip(), 'model'
+                    except Exception as e:
+                        print(f"⚠️  {laptop.name}: lỗi gọi model ({e})")
+            
+            others = [name for name in names if name not in (laptop.name, laptop.brand)]
+            problems = fact_check(text, laptop, others) if text is not None else []
+            if problems:
+                rejected += 1
+                print(f"⚠️  {laptop.name}: bỏ tóm tắt {source} ({'; '.join(problems)})")
+                if source == 'manual':
+                    continue
+            if text is None or problems:
+                text, source = rule_summary(laptop), 'rule'
+            
+            # Thêm trực tiếp dòng tóm tắt: dòng laptops không bị đánh dấu sửa
+            summary = laptop.summary
+            if summary is None:
+                summary = LaptopSummary(laptop_id=laptop.id)
+                db.session.add(summary)
+            summary.summary = text
+            summary.spec_hash = current_hash
+            summary.source = source
+            summary.updated_at = datetime.utcnow()
+            changed_ids.append(laptop.id)
+            created += 1
+            print(f"✅ {laptop.name} [{source}]: {text}")
+        
+        # Worker khác cập nhật tóm tắt trong bộ nhớ qua catalog_changes
+        mark_updated(db.session, changed_ids)
+        db.session.commit()
+        print(f"\n🎉 Hoàn thành! Đã tạo {created} tóm tắt, giữ nguyên {skipped}, bị loại {rejected}")
+
+def export_laptop_summaries(path):
+    """Xuất tóm tắt hiện có ra JSON {tên laptop: tóm tắt} để sửa tay rồi --import"""
+    app = create_app()
+    with app.app_context():
+        data = {laptop.name: laptop.summary.summary if laptop.summary else ""
+                for laptop in Laptop.query.order_by(Laptop.id)}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"✅ Đã xuất {len(data)} tóm tắt ra {path}")
+
+def refresh_laptop_scores(force=False):
+    """Tính bù điểm gợi ý cho laptop thêm ngoài ORM (insert hàng loạt, import SQL)"""
+    import recommendation
+    app = create_app()
+    with app.app_context():
+        count = recommendation.refresh_scores(force=force)
+        print(f"✅ Đã tính điểm gợi ý cho {count} laptop")
+
 def show_image_mapping():
     """Hiển thị mapping hình ảnh hiện tại"""
     app = create_app()
@@ -708,13 +808,41 @@ def full_setup():
     # 4. Tạo admin
     create_admin_user()
     
+    # 5. Tóm tắt laptop cho chatbot (theo luật, không cần API)
+    generate_laptop_summaries()
+    
     print("\n🎉 HOÀN THÀNH THIẾT LẬP!")
     print("=" * 50)
     show_database_stats()
 
 # ========== AUTO RUN ==========
+def summaries_main(argv):
+    """python manage_data.py summaries [--model] [--force] [--import FILE] [--export FILE]"""
+    parser = argparse.ArgumentParser(prog="manage_data.py summaries", description="Tạo tóm tắt laptop cho chatbot")
+    parser.add_argument('--model', action='store_true', help="nhờ model viết (đặt ANTHROPIC_BASE_URL để dùng mock)")
+    parser.add_argument('--force', action='store_true', help="tạo lại cả tóm tắt còn mới")
+    parser.add_argument('--import', dest='import_file', help="JSON {tên/id laptop: tóm tắt} viết tay")
+    parser.add_argument('--export', dest='export_file', help="xuất tóm tắt hiện có ra JSON")
+    args = parser.parse_args(argv)
+    if args.export_file:
+        export_laptop_summaries(args.export_file)
+    else:
+        generate_laptop_summaries(args.model, args.force, args.import_file)
+
+def scores_main(argv):
+    """python manage_data.py scores [--force]"""
+    parser = argparse.ArgumentParser(prog="manage_data.py scores", description="Tính điểm gợi ý còn thiếu")
+    parser.add_argument('--force', action='store_true', help="tính lại điểm cho mọi laptop")
+    args = parser.parse_args(argv)
+    refresh_laptop_scores(args.force)
+
 def main():
     """Tự động chạy thiết lập đầy đủ hệ thống"""
+    if len(sys.argv) > 1 and sys.argv[1] == 'summaries':
+        return summaries_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'scores':
+        return scores_main(sys.argv[2:])
+    
     print("🚀 TỰ ĐỘNG THIẾT LẬP HỆ THỐNG LAPTOP RECOMMENDER")
     print("=" * 60)
     
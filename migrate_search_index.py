@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script migration để tạo chỉ mục full-text FTS5 cho bảng laptops
+Chạy: python migrate_search_index.py
+"""
+
+from app import create_app
+from search_index import FTS_TABLE, FTS_DDL, FTS_REBUILD
+import sqlite3
+
+def add_search_index():
+    """Tạo bảng FTS5, trigger đồng bộ và nạp lại dữ liệu từ bảng laptops"""
+    app = create_app()
+    with app.app_context():
+        print("🔄 Đang tạo chỉ mục full-text FTS5...")
+        
+        # Kết nối trực tiếp đến SQLite database
+        db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        try:
+            for statement in FTS_DDL:
+                cursor.execute(statement)
+                print(f"✅ {statement.split(' ON ')[0].split(' USING ')[0]}")
+            
+            # Nạp lại toàn bộ dữ liệu (external content table)
+            cursor.execute(FTS_REBUILD)
+            conn.commit()
+            print("\n🎉 Hoàn thành! Đã tạo và nạp lại chỉ mục full-text.")
+            
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE};")
+            count = cursor.fetchone()[0]
+            print(f"\n📊 Số laptop trong chỉ mục: {count}")
+            
+        except Exception as e:
+            print(f"❌ Lỗi khi tạo chỉ mục full-text: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+
+def check_search_index():
+    """Kiểm tra nhanh chỉ mục bằng một truy vấn mẫu"""
+    app = create_app()
+    with app.app_context():
+        db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        print("\n🔍 KIỂM TRA CHỈ MỤC:")
+        print("=" * 50)
+        
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('integrity-check');")
+        print("✅ integrity-check OK")
+        
+        cursor.execute(
+            f"SELECT rowid, name FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? ORDER BY bm25({FTS_TABLE}) LIMIT 3;",
+            ('"gaming"*',)
+        )
+        for rowid, name in cursor.fetchall():
+            print(f"   - [{rowid}] {name}")
+        
+        conn.close()
+
+def main():
+    """Chạy migration"""
+    print("🚀 MIGRATION DATABASE - CHỈ MỤC FULL-TEXT")
+    print("=" * 50)
+    
+    try:
+        add_search_index()
+        check_search_index()
+        
+        print("\n✅ Migration hoàn thành!")
+        print("💡 Tìm kiếm laptop và chatbot đã dùng chỉ mục FTS5 (xếp hạng BM25).")
+        
+    except Exception as e:
+        print(f"\n❌ Lỗi migration: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server Messages API giả lập (POST /v1/messages) để chạy thử và load test chatbot
+không tốn tiền, không cần mạng
+- Hỗ trợ response thường và streaming (SSE như API thật)
+- Độ trễ theo phân phối cấu hình được, chèn lỗi theo tỉ lệ
+Chạy: python mock_anthropic.py --port 8787 --latency lognormal:400:0.5 --error-rate 0.02
+rồi đặt ANTHROPIC_BASE_URL=http://127.0.0.1:8787 cho app
+"""
+
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = ("Dựa trên dữ liệu hiện có, **Lenovo Legion 5** là lựa chọn cân bằng nhất.\n"
+                 "• CPU và GPU đủ mạnh cho gaming\n"
+                 "• Giá nằm trong ngân sách của bạn")
+
+ERRORS = {
+    429: ("rate_limit_error", "Number of requests has exceeded your rate limit"),
+    500: ("api_error", "Internal server error"),
+    529: ("overloaded_error", "Overloaded")
+}
+
+def parse_latency(spec):
+    """
+    'fixed:MS' | 'uniform:MIN:MAX' | 'lognormal:MEDIAN:SIGMA' -> hàm trả về số giây
+    """
+    kind, *params = spec.split(':')
+    params = [float(p) for p in params]
+    if kind == 'fixed':
+        return lambda: params[0] / 1000
+    if kind == 'uniform':
+        return lambda: random.uniform(params[0], params[1]) / 1000
+    if kind == 'lognormal':
+        median, sigma = params
+        return lambda: random.lognormvariate(0, sigma) * median / 1000
+    raise ValueError(f"Phân phối độ trễ không hợp lệ: {spec}")
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive như API thật
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        try:
+            self.handle_messages()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client đã bỏ request (ví dụ hết thời gian chờ)
+
+    def handle_messages(self):
+        mock = self.server.mock
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        mock.record(self.client_address)
+        if not self.path.startswith('/v1/messages'):
+            return self.send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": "Not found"}})
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return self.send_json(400, {"type": "error", "error": {"type": "invalid_request_error", "message": "Invalid JSON"}})
+
+        time.sleep(mock.latency())
+        if random.random() < mock.error_rate:
+            mock.count('errors')
+            error_type, message = ERRORS.get(mock.error_status, ERRORS[500])
+            return self.send_json(mock.error_status, {"type": "error", "error": {"type": error_type, "message": message}})
+
+        # Ước lượng ~4 byte/token là đủ cho usage giả lập
+        input_tokens = max(1, len(body) // 4)
+        model = payload.get('model', 'claude-3-haiku-20240307')
+        if payload.get('stream'):
+            mock.count('streams')
+            return self.send_stream(mock, model, input_tokens)
+        self.send_json(200, {
+            "id": f"msg_mock_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": mock.reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": len(mock.reply.split())}
+        })
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, mock, model, input_tokens):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        chunks = [word + ' ' for word in mock.reply.split(' ')]
+        chunks[-1] = chunks[-1].rstrip(' ')
+        self.write_event('message_start', {"type": "message_start", "message": {
+            "id": f"msg_mock_{uuid.uuid4().hex[:12]}", "type": "message", "role": "assistant", "model": model,
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": 1}
+        }})
+        self.write_event('content_block_start', {"type": "content_block_start", "index": 0,
+                                                 "content_block": {"type": "text", "text": ""}})
+        for chunk in chunks:
+            if mock.token_delay:
+                time.sleep(mock.token_delay)
+            self.write_event('content_block_delta', {"type": "content_block_delta", "index": 0,
+                                                     "delta": {"type": "text_delta", "text": chunk}})
+        self.write_event('content_block_stop', {"type": "content_block_stop", "index": 0})
+        self.write_event('message_delta', {"type": "message_delta",
+                                           "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                           "usage": {"output_tokens": len(chunks)}})
+        self.write_event('message_stop', {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_event(self, event, data):
+        chunk = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+class MockAnthropicServer:
+    """Server giả lập chạy trong thread nền; dùng được trong script hoặc từ dòng lệnh"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency='fixed:0', token_delay_ms=0,
+                 error_rate=0.0, error_status=529, reply=DEFAULT_REPLY):
+        self.latency = parse_latency(latency)
+        self.token_delay = token_delay_ms / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply = reply
+        self.stats = {'requests': 0, 'errors': 0, 'streams': 0}
+        self.connections = set()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, client_address):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.connections.add(client_address)
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def reset(self):
+        with self._lock:
+            self.stats = {'requests': 0, 'errors': 0, 'streams': 0}
+            self.connections = set()
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Server Messages API giả lập")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency', default='lognormal:400:0.5',
+                        help="fixed:MS | uniform:MIN:MAX | lognormal:MEDIAN:SIGMA (ms, trước token đầu tiên)")
+    parser.add_argument('--token-delay-ms', type=float, default=15, help="độ trễ giữa các token khi streaming")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="tỉ lệ request trả lỗi (0-1)")
+    parser.add_argument('--error-status', type=int, default=529, choices=sorted(ERRORS))
+    args = parser.parse_args()
+
+    try:
+        server = MockAnthropicServer(args.host, args.port, args.latency, args.token_delay_ms,
+                                     args.error_rate, args.error_status)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"🚀 Mock Messages API: {server.base_url}")
+    print(f"   Độ trễ: {args.latency}, token: {args.token_delay_ms}ms, lỗi: {args.error_rate:.0%} ({args.error_status})")
+    print(f"   Đặt ANTHROPIC_BASE_URL={server.base_url} cho app. Ctrl+C để dừng")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats['requests']} request, {server.stats['errors']} lỗi, "
+              f"{server.stats['streams']} streaming")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,8 +2,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from db_profile import RoutingSession
 
-db = SQLAlchemy()
+# Đọc qua pool chỉ đọc, ghi qua một writer (xem db_profile.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     __tablename__ = "users"
@@ -61,6 +63,8 @@ class Laptop(db.Model):
     gpu_score_battery = db.Column(db.Integer, nullable=True)
 
     favorites = db.relationship("Favorite", back_populates="laptop", cascade="all, delete-orphan")
+    score = db.relationship("LaptopScore", back_populates="laptop", uselist=False, cascade="all, delete-orphan")
+    summary = db.relationship("LaptopSummary", back_populates="laptop", uselist=False, cascade="all, delete-orphan")
     
     def to_dict(self):
         """Chuyển đổi laptop thành dictionary cho API"""
@@ -90,24 +94,113 @@ class Laptop(db.Model):
     @staticmethod
     def get_filtered_laptops(brand=None, price_min=None, price_max=None, 
                            ram_gb=None, category=None, search=None, 
-                           page=1, per_page=20):
-        """Tối ưu hóa query với filters và pagination"""
-        query = Laptop.query
+                           page=1, per_page=20, sort='id', cursor=None):
+        """Lọc và phân trang trên snapshot catalog trong bộ nhớ
+
+        Khi có search, kết quả lấy từ chỉ mục FTS5 và xếp theo độ liên quan (BM25).
+        Khi truyền cursor (kể cả chuỗi rỗng cho trang đầu), dùng phân trang keyset
+        theo (price, id) thay cho page/per_page.
+        """
+        from catalog_snapshot import catalog_store
         
-        if brand:
-            query = query.filter(Laptop.brand == brand)
-        if price_min is not None:
-            query = query.filter(Laptop.price >= price_min)
-        if price_max is not None:
-            query = query.filter(Laptop.price <= price_max)
-        if ram_gb is not None:
-            query = query.filter(Laptop.ram_gb >= ram_gb)
-        if category:
-            query = query.filter(Laptop.category == category)
+        snapshot = catalog_store.get()
         if search:
-            query = query.filter(Laptop.name.contains(search))
-        
-        return query.paginate(page=page, per_page=per_page, error_out=False)
+            return snapshot.search(
+                search,
+                brand=brand,
+                price_min=price_min,
+                price_max=price_max,
+                ram_min=ram_gb,
+                category=category,
+                page=page,
+                per_page=per_page
+            )
+        if cursor is not None:
+            return snapshot.keyset(
+                cursor=cursor,
+                brand=brand,
+                price_min=price_min,
+                price_max=price_max,
+                ram_min=ram_gb,
+                category=category,
+                per_page=per_page
+            )
+        return snapshot.query(
+            brand=brand,
+            price_min=price_min,
+            price_max=price_max,
+            ram_min=ram_gb,
+            category=category,
+            sort=sort,
+            page=page,
+            per_page=per_page
+        )
+
+class LaptopScore(db.Model):
+    """Điểm gợi ý tính sẵn cho từng nhu cầu (cập nhật khi ghi laptop, xem recommendation.py)"""
+    __tablename__ = "laptop_scores"
+    laptop_id = db.Column(db.Integer, db.ForeignKey("laptops.id"), primary_key=True)
+    gaming = db.Column(db.Float, nullable=False, default=0, index=True)
+    design = db.Column(db.Float, nullable=False, default=0, index=True)
+    dev = db.Column(db.Float, nullable=False, default=0, index=True)
+    student = db.Column(db.Float, nullable=False, default=0, index=True)
+    office = db.Column(db.Float, nullable=False, default=0, index=True)
+    criteria_hash = db.Column(db.String(16), nullable=False, index=True)  # phiên bản tiêu chí đã dùng để tính
+
+    laptop = db.relationship("Laptop", back_populates="score")
+
+class LaptopSummary(db.Model):
+    """Tóm tắt ngắn (điểm mạnh/yếu) tạo sẵn cho prompt chatbot (xem laptop_summaries.py)"""
+    __tablename__ = "laptop_summaries"
+    laptop_id = db.Column(db.Integer, db.ForeignKey("laptops.id"), primary_key=True)
+    summary = db.Column(db.Text, nullable=False)
+    spec_hash = db.Column(db.String(16), nullable=False)  # hash thông số lúc tạo; lệch thì tóm tắt đã cũ
+    source = db.Column(db.String(10), nullable=False, default='rule')  # rule, model, manual
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    laptop = db.relationship("Laptop", back_populates="summary")
+
+class CatalogChange(db.Model):
+    """Nhật ký thay đổi bảng laptops, ghi cùng transaction (xem catalog_events.py)
+
+    Các worker khác đọc các dòng mới để cập nhật cache trong process của mình.
+    """
+    __tablename__ = "catalog_changes"
+    id = db.Column(db.Integer, primary_key=True)
+    laptop_id = db.Column(db.Integer, nullable=False)  # không dùng FK vì laptop có thể đã bị xóa
+    op = db.Column(db.String(10), nullable=False)  # insert, update, delete
+    origin = db.Column(db.String(16), nullable=False)  # process đã ghi thay đổi
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class ChatConversation(db.Model):
+    """Lịch sử chat lưu phía server (xem conversation_store.py); cookie chỉ giữ id"""
+    __tablename__ = "chat_conversations"
+    id = db.Column(db.String(32), primary_key=True)
+    history = db.Column(db.Text, nullable=False)  # JSON [{role, content}], đã sanitize khi ghi
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class ChatEvent(db.Model):
+    """Một lượt chat cho analytics (xem chat_analytics.py); ghi theo lô từ buffer trong bộ nhớ"""
+    __tablename__ = "chat_events"
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    endpoint = db.Column(db.String(20), nullable=False)  # chat, stream, recommend, search
+    status = db.Column(db.String(20), nullable=False)  # ok, blocked, busy, error
+    intent = db.Column(db.String(20))
+    category = db.Column(db.String(50))  # các trường preference trích từ tin nhắn
+    brand = db.Column(db.String(50))
+    budget_min = db.Column(db.Integer)
+    budget_max = db.Column(db.Integer)
+    ram_min = db.Column(db.Integer)
+    gpu_required = db.Column(db.Boolean, default=False)
+    laptops_count = db.Column(db.Integer, default=0)
+    latency_ms = db.Column(db.Float, nullable=False)
+    input_tokens = db.Column(db.Integer, default=0)
+    saved_tokens = db.Column(db.Integer, default=0)
+    cached = db.Column(db.Boolean, default=False)
+    fallback = db.Column(db.String(20))
+    blocked_category = db.Column(db.String(50))
+    route = db.Column(db.String(20))  # blocked, knowledge_base, cache, model, fallback
 
 class Favorite(db.Model):
     __tablename__ = "favorites"
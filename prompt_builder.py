@@ -0,0 +1,213 @@
+"""
+Prompt builder for the chatbot
+- The static rules preamble is a separate system block; it is marked for Anthropic prompt
+  caching only when it reaches the model's minimum cacheable length (shorter prefixes are
+  never cached, so marking them would only misreport savings)
+- Laptops go into the prompt as a compact pipe-separated table instead of indented JSON;
+  laptops with a precomputed summary (see laptop_summaries.py) replace their storage,
+  screen, battery and benchmark columns with it
+- Conversation history is sent once (as messages) and trimmed to a token budget
+Token counts are estimates made before sending, used for trimming and for reporting
+how many input tokens the compact format saves compared to the previous format.
+"""
+
+import json
+from typing import Dict, List
+
+# Minimum prompt prefix the API caches (Haiku models; 1024 for Sonnet/Opus)
+MIN_CACHEABLE_TOKENS = 2048
+
+PREAMBLE = """Bạn là AI tư vấn laptop chuyên nghiệp với dữ liệu thực tế từ website. Hãy trả lời ngắn gọn, rõ ràng bằng tiếng Việt.
+
+**QUY TẮC NGHIÊM NGẶT:**
+- CHỈ gợi ý laptop có trong dữ liệu được cung cấp
+- KHÔNG được tự tạo hoặc bịa đặt laptop không có trong database
+- Nếu không có laptop phù hợp, hãy nói rõ "Không tìm thấy laptop phù hợp"
+- Tối đa 3-4 câu
+- Sử dụng bullet points (•) cho danh sách
+- In đậm (**text**) cho thông tin quan trọng
+- Đưa ra lời khuyên cụ thể dựa trên dữ liệu thực tế
+- Sử dụng xuống hàng (\\n) để tách các ý chính
+- Mỗi ý chính nên ở một dòng riêng
+
+**Chuyên môn:**
+• Tư vấn laptop theo nhu cầu (gaming, văn phòng, học tập, thiết kế)
+• So sánh hiệu năng và giá cả dựa trên dữ liệu thực tế
+• Giải thích thông số kỹ thuật đơn giản
+• Đưa ra lựa chọn tốt nhất trong ngân sách"""
+
+INTENT_TASKS = {
+    'compare': """**Nhiệm vụ hiện tại: So sánh laptop**
+- Hãy so sánh chi tiết các laptop được đề cập
+- Đưa ra ưu nhược điểm của từng mẫu
+- Gợi ý laptop phù hợp nhất""",
+    'explain': """**Nhiệm vụ hiện tại: Giải thích thông số**
+- Giải thích đơn giản, dễ hiểu
+- So sánh với các mẫu laptop khác
+- Đưa ra lời khuyên thực tế""",
+    'price': """**Nhiệm vụ hiện tại: Tư vấn giá cả**
+- Phân tích giá trị/tiền
+- So sánh với các mẫu tương tự
+- Đưa ra lựa chọn tốt nhất trong ngân sách"""
+}
+
+# (header, laptop dict key) for the compact laptop table
+LAPTOP_COLUMNS = [
+    ('id', 'id'),
+    ('tên', 'name'),
+    ('hãng', 'brand'),
+    ('cpu', 'cpu'),
+    ('ram_gb', 'ram_gb'),
+    ('gpu', 'gpu'),
+    ('ổ cứng', 'storage'),
+    ('màn hình', 'screen'),
+    ('giá_vnd', 'price'),
+    ('loại', 'category'),
+    ('pin_h', 'battery_life_office'),
+    ('cpu_đơn', 'cpu_single_core_plugged'),
+    ('cpu_đa', 'cpu_multi_core_plugged'),
+    ('gpu_điểm', 'gpu_score_plugged')
+]
+
+# Columns for laptops that carry a precomputed summary
+SUMMARY_COLUMNS = [
+    ('id', 'id'),
+    ('tên', 'name'),
+    ('cpu', 'cpu'),
+    ('ram_gb', 'ram_gb'),
+    ('gpu', 'gpu'),
+    ('giá_vnd', 'price'),
+    ('tóm tắt', 'summary')
+]
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without calling the API
+    ~4 ASCII characters per token; accented Vietnamese characters split into more tokens
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii // 2 + 1
+
+def _cell(value) -> str:
+    if value is None or value == '':
+        return '-'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).replace('|', '/').replace('\n', ' ')
+
+def laptop_table(laptops: List[Dict], columns=LAPTOP_COLUMNS) -> str:
+    """Laptops as one header line plus one pipe-separated line per laptop"""
+    lines = ['|'.join(header for header, _ in columns)]
+    for laptop in laptops:
+        lines.append('|'.join(_cell(laptop.get(key)) for _, key in columns))
+    return '\n'.join(lines)
+
+def laptop_tables(laptops: List[Dict]) -> str:
+    """Summarized laptops in the short table, the rest with full specs (ranked order kept in each)"""
+    summarized = [laptop for laptop in laptops if laptop.get('summary')]
+    full = [laptop for laptop in laptops if not laptop.get('summary')]
+    tables = []
+    if summarized:
+        tables.append(laptop_table(summarized, SUMMARY_COLUMNS))
+    if full:
+        tables.append(laptop_table(full))
+    return '\n\n'.join(tables)
+
+def preference_lines(preferences: Dict) -> str:
+    return f"""- Ngân sách: {preferences['budget_min'] or 'Không giới hạn'} - {preferences['budget_max'] or 'Không giới hạn'} VND
+- Danh mục: {preferences['category'] or 'Tất cả'}
+- Thương hiệu: {preferences['brand'] or 'Tất cả'}
+- RAM tối thiểu: {preferences['ram_min'] or 'Không yêu cầu'} GB
+- GPU rời: {'Có' if preferences['gpu_required'] else 'Không yêu cầu'}"""
+
+class PromptBuilder:
+    """Builds the system blocks and messages for one Messages API call"""
+
+    def __init__(self, history_token_budget: int = 800, max_laptops: int = 5,
+                 min_cacheable_tokens: int = MIN_CACHEABLE_TOKENS):
+        self.history_token_budget = history_token_budget
+        self.max_laptops = max_laptops
+        self.preamble_tokens = estimate_tokens(PREAMBLE)
+        # Tokens of the preamble the API will actually cache (0 while it is below the minimum)
+        self.cacheable_tokens = self.preamble_tokens if self.preamble_tokens >= min_cacheable_tokens else 0
+
+    def task_section(self, intent: str, preferences: Dict, laptops: List[Dict]) -> str:
+        """The per-request part of the system prompt"""
+        if intent == 'recommend':
+            if laptops:
+                return f"""**Nhiệm vụ hiện tại: Tư vấn laptop phù hợp**
+{preference_lines(preferences)}
+
+**CHỈ GỢI Ý CÁC LAPTOP SAU ĐÂY (có trong database, mỗi dòng một laptop):**
+{laptop_tables(laptops[:self.max_laptops])}
+
+**LƯU Ý:** Chỉ được gợi ý laptop có trong danh sách trên. KHÔNG được tự tạo laptop khác."""
+            return f"""**Nhiệm vụ hiện tại: Tư vấn laptop phù hợp**
+{preference_lines(preferences)}
+
+**KHÔNG TÌM THẤY LAPTOP PHÙ HỢP** trong database với tiêu chí trên.
+Hãy thông báo cho user rằng không có laptop phù hợp và đề xuất mở rộng tiêu chí tìm kiếm."""
+        return INTENT_TASKS.get(intent, '')
+
+    def trim_history(self, history: List[Dict]) -> List[Dict]:
+        """Newest turns that fit the token budget; the kept part always starts with a user turn"""
+        kept = []
+        used = 0
+        for msg in reversed(history):
+            tokens = estimate_tokens(msg["content"])
+            if used + tokens > self.history_token_budget:
+                break
+            kept.append(msg)
+            used += tokens
+        kept.reverse()
+        while kept and kept[0]["role"] != "user":
+            kept.pop(0)
+        return kept
+
+    def build(self, intent: str, preferences: Dict, laptops: List[Dict],
+              history: List[Dict], message: str) -> Dict:
+        """
+        history: already sanitized {"role", "content"} turns, oldest first
+        Returns system blocks, messages and token estimates
+        """
+        preamble = {"type": "text", "text": PREAMBLE}
+        if self.cacheable_tokens:
+            preamble["cache_control"] = {"type": "ephemeral"}
+        system = [preamble]
+        task = self.task_section(intent, preferences, laptops)
+        if task:
+            system.append({"type": "text", "text": task})
+
+        messages = self.trim_history(history)
+        messages.append({"role": "user", "content": message})
+
+        input_tokens = self.preamble_tokens + estimate_tokens(task)
+        input_tokens += sum(estimate_tokens(msg["content"]) for msg in messages)
+        baseline = self.baseline_tokens(intent, preferences, laptops, history, message)
+        return {
+            "system": system,
+            "messages": messages,
+            "tokens": {
+                "input": input_tokens,
+                "cacheable": self.cacheable_tokens,
+                "baseline": baseline,
+                "saved": max(baseline - input_tokens, 0)
+            }
+        }
+
+    def baseline_tokens(self, intent: str, preferences: Dict, laptops: List[Dict],
+                        history: List[Dict], message: str) -> int:
+        """Estimate for the previous format: indented JSON laptops, history in both system and messages"""
+        tokens = self.preamble_tokens
+        if intent == 'recommend' and laptops:
+            tokens += estimate_tokens(preference_lines(preferences))
+            records = [{k: v for k, v in laptop.items() if k != 'summary'} for laptop in laptops[:5]]
+            tokens += estimate_tokens(json.dumps(records, ensure_ascii=False, indent=2))
+        else:
+            tokens += estimate_tokens(self.task_section(intent, preferences, laptops))
+        if history:
+            tokens += estimate_tokens(json.dumps(history[-3:], ensure_ascii=False, indent=2))
+        tokens += sum(estimate_tokens(msg["content"]) for msg in history[-5:])
+        return tokens + estimate_tokens(message)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Thuật toán gợi ý laptop theo nhu cầu và điểm gợi ý tính sẵn (materialized)
+Điểm mỗi nhu cầu được tính khi ghi laptop và lưu ở bảng laptop_scores,
+nên /recommend chỉ cần ORDER BY điểm DESC LIMIT 10
+"""
+
+import json
+import hashlib
+import logging
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import db, Laptop, LaptopScore
+
+logger = logging.getLogger(__name__)
+
+# Định nghĩa tiêu chí cho từng loại nhu cầu
+RECOMMEND_CRITERIA = {
+    "gaming": {
+        "min_ram": 16,
+        "cpu_series": ["H", "HX", "HK"],  # CPU hiệu năng cao
+        "gpu_required": True,  # Yêu cầu GPU rời
+        "min_price": 15000000,  # Tối thiểu 15 triệu
+        "weight": {
+            "gpu": 0.3,
+            "cpu": 0.25,
+            "ram": 0.2,
+            "price": 0.15,
+            "storage": 0.1
+        }
+    },
+    "design": {
+        "min_ram": 16,
+        "cpu_series": ["H", "HX", "HK", "P"],  # CPU hiệu năng cao hoặc P-series
+        "gpu_required": True,
+        "min_price": 20000000,  # Tối thiểu 20 triệu
+        "weight": {
+            "gpu": 0.25,
+            "cpu": 0.25,
+            "ram": 0.2,
+            "screen": 0.2,
+            "price": 0.1
+        }
+    },
+    "dev": {
+        "min_ram": 16,
+        "cpu_series": ["H", "HX", "HK", "P", "U"],  # Linh hoạt hơn
+        "gpu_required": False,
+        "min_price": 12000000,  # Tối thiểu 12 triệu
+        "weight": {
+            "cpu": 0.3,
+            "ram": 0.25,
+            "storage": 0.2,
+            "price": 0.15,
+            "gpu": 0.1
+        }
+    },
+    "student": {
+        "min_ram": 8,
+        "cpu_series": ["U", "P", "H"],  # Linh hoạt
+        "gpu_required": False,
+        "min_price": 8000000,  # Tối thiểu 8 triệu
+        "weight": {
+            "price": 0.4,
+            "cpu": 0.25,
+            "ram": 0.2,
+            "storage": 0.15
+        }
+    },
+    "office": {
+        "min_ram": 8,
+        "cpu_series": ["U", "P"],  # CPU tiết kiệm điện
+        "gpu_required": False,
+        "min_price": 6000000,  # Tối thiểu 6 triệu
+        "weight": {
+            "price": 0.5,
+            "cpu": 0.2,
+            "ram": 0.2,
+            "storage": 0.1
+        }
+    }
+}
+
+def calculate_laptop_score(laptop, criteria, priority):
+    """
+    Tính điểm cho laptop dựa trên tiêu chí và ưu tiên
+    """
+    score = 0
+    weights = criteria["weight"]
+    
+    # Điểm cho CPU
+    cpu_score = 0
+    cpu_series = criteria.get("cpu_series", [])
+    for series in cpu_series:
+        if series in laptop.cpu.upper():
+            cpu_score = 1.0
+            break
+    if not cpu_score and "U" in laptop.cpu.upper():
+        cpu_score = 0.5  # CPU U-series cơ bản
+    
+    # Điểm cho RAM
+    ram_score = min(laptop.ram_gb / 32.0, 1.0)  # Chuẩn hóa theo 32GB
+    
+    # Điểm cho GPU
+    gpu_score = 0
+    if laptop.gpu:
+        gpu_lower = laptop.gpu.lower()
+        if any(gpu in gpu_lower for gpu in ['rtx', 'gtx', 'rx', 'radeon']):
+            gpu_score = 1.0
+        elif any(gpu in gpu_lower for gpu in ['mx', 'iris xe']):
+            gpu_score = 0.6
+        else:
+            gpu_score = 0.3
+    
+    # Điểm cho giá (càng thấp càng tốt)
+    price_score = 1.0 - (laptop.price / 50000000.0)  # Chuẩn hóa theo 50 triệu
+    price_score = max(0, price_score)
+    
+    # Điểm cho storage
+    storage_score = 0.5  # Mặc định
+    if "ssd" in laptop.storage.lower():
+        storage_score = 1.0
+    elif "hdd" in laptop.storage.lower():
+        storage_score = 0.3
+    
+    # Tính điểm tổng hợp
+    score = (
+        cpu_score * weights.get("cpu", 0.2) +
+        ram_score * weights.get("ram", 0.2) +
+        gpu_score * weights.get("gpu", 0.1) +
+        price_score * weights.get("price", 0.3) +
+        storage_score * weights.get("storage", 0.1)
+    )
+    
+    # Điều chỉnh theo ưu tiên
+    if priority == "performance":
+        score *= 1.2  # Tăng 20% cho laptop hiệu năng cao
+    elif priority == "budget":
+        score *= 0.8  # Giảm 20% cho laptop giá rẻ
+    
+    return score
+
+# Các cột của Laptop ảnh hưởng tới điểm gợi ý
+SCORE_FIELDS = ('cpu', 'ram_gb', 'gpu', 'price', 'storage')
+
+def criteria_hash():
+    """Hash của bộ tiêu chí: đổi trọng số/tiêu chí thì hash đổi và điểm được tính lại"""
+    raw = json.dumps(RECOMMEND_CRITERIA, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def apply_scores(laptop, current_hash=None):
+    """Tính điểm mọi nhu cầu cho laptop và gán vào laptop.score"""
+    if laptop.score is None:
+        laptop.score = LaptopScore()
+    for need, crit in RECOMMEND_CRITERIA.items():
+        # Ưu tiên (priority) chỉ nhân điểm với một hệ số nên không đổi thứ tự xếp hạng
+        setattr(laptop.score, need, calculate_laptop_score(laptop, crit, "balanced"))
+    laptop.score.criteria_hash = current_hash or criteria_hash()
+
+def _specs_changed(laptop):
+    state = inspect(laptop)
+    return any(state.attrs[field].history.has_changes() for field in SCORE_FIELDS)
+
+@event.listens_for(Session, 'before_flush')
+def _refresh_scores_before_flush(session, flush_context, instances):
+    """Tính lại điểm trong cùng transaction với thao tác thêm/sửa laptop"""
+    current_hash = None
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Laptop) or obj in session.deleted:
+            continue
+        if obj in session.new or _specs_changed(obj):
+            current_hash = current_hash or criteria_hash()
+            apply_scores(obj, current_hash)
+
+def refresh_scores(force=False):
+    """Tính lại điểm cho laptop chưa có điểm hoặc điểm tính theo tiêu chí cũ"""
+    current_hash = criteria_hash()
+    query = Laptop.query
+    if not force:
+        query = query.outerjoin(LaptopScore).filter(db.or_(
+            LaptopScore.laptop_id.is_(None),
+            LaptopScore.criteria_hash != current_hash
+        ))
+    laptops = query.all()
+    if laptops:
+        # Tính điểm cả lô bằng engine vector thay vì gọi calculate_laptop_score từng laptop
+        from scoring_engine import LaptopArrays, need_scores, NEEDS
+        scores = need_scores(LaptopArrays(laptops))
+        for laptop, row in zip(laptops, scores.tolist()):
+            if laptop.score is None:
+                laptop.score = LaptopScore()
+            for need, value in zip(NEEDS, row):
+                setattr(laptop.score, need, value)
+            laptop.score.criteria_hash = current_hash
+    if laptops:
+        db.session.commit()
+        logger.info(f"Recomputed recommendation scores for {len(laptops)} laptops")
+    return len(laptops)
+
+def init_app(app):
+    """Tạo bảng laptop_scores cho database cũ và cập nhật điểm nếu tiêu chí đã đổi"""
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        if not inspector.has_table(Laptop.__tablename__):
+            return
+        LaptopScore.__table__.create(bind=db.engine, checkfirst=True)
+        refresh_scores()
+        db.session.remove()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache câu trả lời chatbot theo (intent, preferences, id laptop tìm được)
+Chỉ dùng cho câu hỏi mua máy không có lịch sử hội thoại, có ít nhất một tiêu chí
+("laptop gaming dưới 25 triệu"); câu khác ("hi", "bye") cùng preferences rỗng và cùng
+danh sách laptop nên không được cache. Key gồm phiên bản catalog, có TTL và loại bỏ theo LRU
+"""
+
+import time
+import copy
+import threading
+from collections import OrderedDict
+from catalog_events import on_catalog_change
+from catalog_version import catalog_version
+
+# Intent mà câu trả lời chỉ phụ thuộc vào tiêu chí và laptop tìm được
+CACHEABLE_INTENTS = ('recommend', 'search', 'price')
+
+class ResponseCache:
+    """LRU + TTL cho kết quả generate_response, kèm bộ đếm hit/miss"""
+
+    def __init__(self, max_entries=256, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        on_catalog_change(self._on_change)
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('CHATBOT_RESPONSE_CACHE_SIZE', self.max_entries)
+        self.ttl = app.config.get('CHATBOT_RESPONSE_CACHE_TTL', self.ttl)
+        app.extensions['response_cache'] = self
+
+    def _on_change(self, changes):
+        # Key đã chứa phiên bản catalog; xóa luôn để giải phóng bộ nhớ
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def cacheable(intent, preferences):
+        """Câu hỏi mua máy có ít nhất một tiêu chí; câu khác phụ thuộc vào nội dung tin nhắn"""
+        return intent in CACHEABLE_INTENTS and any(preferences.values())
+
+    @staticmethod
+    def make_key(intent, preferences, laptop_ids, version=None):
+        """Key chuẩn hóa: ngân sách làm tròn, preferences sắp xếp theo tên
+
+        version nên lấy trước khi đọc laptop, để câu trả lời không bao giờ được lưu
+        dưới phiên bản mới hơn dữ liệu nó dựa vào.
+        """
+        normalized = tuple(sorted(
+            (name, int(value) if isinstance(value, float) else value)
+            for name, value in preferences.items()
+        ))
+        return (version or catalog_version.token, intent, normalized, tuple(laptop_ids))
+
+    def get(self, key):
+        if not self.max_entries:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key, result):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+response_cache = ResponseCache()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chỉ mục vector TF-IDF theo n-gram ký tự cho chatbot (không cần mạng, chỉ NumPy)
+Mỗi laptop là một dòng tần suất n-gram của name, brand, cpu, gpu, storage, screen, category;
+ma trận lưu thưa, sắp theo cột (kiểu CSC), nên bộ nhớ tỉ lệ với số n-gram khác 0 chứ không
+phải số laptop x kích thước từ vựng. Một câu hỏi chỉ duyệt các cột n-gram nó chứa rồi cộng
+dồn điểm theo dòng (np.bincount) để ra cosine với mọi laptop
+Khi catalog thay đổi chỉ tính lại các dòng bị ảnh hưởng (IDF và norm tính lại bằng NumPy)
+"""
+
+import re
+import threading
+import logging
+import unicodedata
+import numpy as np
+from catalog_events import on_catalog_change
+from catalog_snapshot import catalog_store
+
+logger = logging.getLogger(__name__)
+
+# Trọng số theo trường: hãng và loại máy quyết định nhiều hơn ổ cứng, màn hình
+FIELD_WEIGHTS = {
+    'name': 1.0,
+    'brand': 2.0,
+    'cpu': 1.0,
+    'gpu': 1.0,
+    'storage': 0.5,
+    'screen': 0.5,
+    'category': 2.0
+}
+NGRAM = 3
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+def normalize(text):
+    """Chữ thường, bỏ dấu tiếng Việt ('đồ họa' -> 'do hoa')"""
+    text = unicodedata.normalize('NFD', (text or '').lower().replace('đ', 'd'))
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+def ngrams(text, weight=1.0, counts=None):
+    """Đếm n-gram ký tự của từng từ (có đệm khoảng trắng hai đầu)"""
+    counts = {} if counts is None else counts
+    for word in WORD_PATTERN.findall(normalize(text)):
+        padded = f" {word} "
+        for i in range(max(len(padded) - NGRAM + 1, 1)):
+            gram = padded[i:i + NGRAM]
+            counts[gram] = counts.get(gram, 0.0) + weight
+    return counts
+
+def laptop_ngrams(row):
+    counts = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        ngrams(getattr(row, field), weight, counts)
+    return counts
+
+def _coo(grams, vocab, first_row=0):
+    """Các phần tử khác 0 (dòng, cột, tf) của danh sách bộ đếm n-gram; thêm n-gram mới vào vocab"""
+    rows, cols, data = [], [], []
+    for offset, counts in enumerate(grams):
+        for gram, count in counts.items():
+            col = vocab.get(gram)
+            if col is None:
+                col = vocab[gram] = len(vocab)
+            rows.append(first_row + offset)
+            cols.append(col)
+            data.append(count)
+    return (np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32),
+            np.array(data, dtype=np.float32))
+
+class _IndexState:
+    """Trạng thái bất biến; cập nhật tạo state mới rồi swap tham chiếu"""
+
+    def __init__(self, ids, rows, cols, data, vocab):
+        self.ids = ids
+        self.positions = {laptop_id: pos for pos, laptop_id in enumerate(ids)}
+        # Ma trận tf thưa: phần tử thứ k nằm ở (rows[k], cols[k]) với giá trị data[k],
+        # sắp theo cột; các phần tử của cột c là [col_ptr[c], col_ptr[c + 1])
+        order = np.argsort(cols, kind='stable')
+        self.rows = rows[order]
+        self.cols = cols[order]
+        self.data = data[order]
+        self.vocab = vocab
+        # IDF làm mượt; norm của vector tf*idf từng dòng để chuẩn hóa cosine
+        n = len(ids)
+        df = np.bincount(cols, minlength=len(vocab))
+        self.col_ptr = np.concatenate(([0], np.cumsum(df)))
+        rows, cols, data = self.rows, self.cols, self.data
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        self.idf_sq = self.idf * self.idf
+        norms = np.sqrt(np.bincount(rows, data * data * self.idf_sq[cols], minlength=n)).astype(np.float32)
+        norms[norms == 0] = 1.0
+        self.norms = norms
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+class RetrievalIndex:
+    """Xếp hạng laptop theo độ giống câu hỏi; dùng cùng bộ lọc cứng của chatbot"""
+
+    def __init__(self):
+        self._state = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._state = None
+        app.extensions['retrieval_index'] = self
+        on_catalog_change(self._on_change)
+
+    # ---------- Build / cập nhật ----------
+    def rebuild(self):
+        snapshot = catalog_store.get()
+        with self._lock:
+            rows = [snapshot.row(pos) for pos in range(snapshot.size)]
+            state = self._build([row.id for row in rows], [laptop_ngrams(row) for row in rows], {})
+            self._state = state
+            logger.info(f"Retrieval index rebuilt: {len(state.ids)} laptops, {len(state.vocab)} n-grams, "
+                        f"{state.nnz} non-zero")
+            return state
+
+    @staticmethod
+    def _build(ids, grams, vocab):
+        vocab = dict(vocab)
+        rows, cols, data = _coo(grams, vocab)
+        return _IndexState(list(ids), rows, cols, data, vocab)
+
+    def _on_change(self, changes):
+        if self._state is None:
+            return
+        snapshot = catalog_store.get()
+        with self._lock:
+            state = self._state
+            changed = changes['insert'] | changes['update'] | changes['delete']
+            keep = [pos for pos, laptop_id in enumerate(state.ids) if laptop_id not in changed]
+            fresh = [snapshot.get(laptop_id) for laptop_id in sorted(changes['insert'] | changes['update'])]
+            fresh = [row for row in fresh if row is not None]
+            new_grams = [laptop_ngrams(row) for row in fresh]
+
+            # Dòng không đổi giữ nguyên tf (đánh số lại dòng); chỉ tokenize lại các laptop bị thêm/sửa
+            row_kept = np.zeros(len(state.ids), dtype=bool)
+            row_kept[keep] = True
+            new_row = np.cumsum(row_kept, dtype=np.int32) - 1
+            entry_kept = row_kept[state.rows]
+            vocab = dict(state.vocab)
+            rows, cols, data = _coo(new_grams, vocab, first_row=len(keep))
+            rows = np.concatenate([new_row[state.rows[entry_kept]], rows])
+            cols = np.concatenate([state.cols[entry_kept], cols])
+            data = np.concatenate([state.data[entry_kept], data])
+            ids = [state.ids[pos] for pos in keep] + [row.id for row in fresh]
+            self._state = _IndexState(ids, rows, cols, data, vocab)
+
+        if len(ids) != snapshot.size:
+            # Lệch với snapshot (ví dụ sự kiện bị bỏ lỡ): build lại toàn bộ
+            self.rebuild()
+
+    def get_state(self):
+        state = self._state
+        if state is None:
+            state = self.rebuild()
+        return state
+
+    # ---------- Truy vấn ----------
+    def scores(self, query):
+        """(state, điểm cosine của mọi laptop theo thứ tự state.ids)"""
+        state = self.get_state()
+        q = {state.vocab[gram]: count for gram, count in ngrams(query).items() if gram in state.vocab}
+        q_norm = float(np.sqrt(sum(count * count * state.idf_sq[col] for col, count in q.items())))
+        if not q_norm:
+            return state, np.zeros(len(state.ids), dtype=np.float32)
+        # Tích vô hướng từng dòng với q: chỉ duyệt các cột n-gram có trong câu hỏi
+        rows, weights = [], []
+        for col, count in q.items():
+            start, end = state.col_ptr[col], state.col_ptr[col + 1]
+            rows.append(state.rows[start:end])
+            weights.append(state.data[start:end] * (count * state.idf_sq[col]))
+        dots = np.bincount(np.concatenate(rows), np.concatenate(weights), minlength=len(state.ids))
+        return state, (dots / (state.norms * q_norm)).astype(np.float32)
+
+    def rank(self, query, candidate_ids, limit=None, min_score=0.0):
+        """
+        Sắp xếp candidate_ids theo điểm giảm dần; cùng điểm giữ thứ tự đầu vào
+        (ví dụ giá tăng dần). Bỏ các laptop có điểm <= min_score nếu min_score > 0
+        """
+        state, scores = self.scores(query)
+        positions = np.array([state.positions.get(laptop_id, -1) for laptop_id in candidate_ids], dtype=np.int64)
+        candidate_scores = np.where(positions >= 0, scores[positions] if len(scores) else 0.0, 0.0)
+        order = np.lexsort((np.arange(len(positions)), -candidate_scores))
+        if min_score:
+            order = order[candidate_scores[order] > min_score]
+        if limit:
+            order = order[:limit]
+        return [candidate_ids[i] for i in order]
+
+retrieval_index = RetrievalIndex()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Engine chấm điểm laptop dạng vector (NumPy)
+Tính điểm cho cả tập laptop trong một lượt: mọi nhu cầu (refresh_scores) và điểm hiệu năng
+(/compare), kết quả trùng khớp với calculate_laptop_score và điểm theo cấp của /compare
+"""
+
+import numpy as np
+from recommendation import RECOMMEND_CRITERIA
+
+NEEDS = tuple(RECOMMEND_CRITERIA.keys())
+
+# Các dòng CPU xuất hiện trong tiêu chí
+CPU_SERIES = tuple(sorted({s for crit in RECOMMEND_CRITERIA.values() for s in crit["cpu_series"]} | {"U"}))
+
+def _gpu_tier(gpu):
+    if not gpu:
+        return 0.0
+    gpu_lower = gpu.lower()
+    if any(g in gpu_lower for g in ['rtx', 'gtx', 'rx', 'radeon']):
+        return 1.0
+    if any(g in gpu_lower for g in ['mx', 'iris xe']):
+        return 0.6
+    return 0.3
+
+def _storage_tier(storage):
+    storage_lower = storage.lower()
+    if "ssd" in storage_lower:
+        return 1.0
+    if "hdd" in storage_lower:
+        return 0.3
+    return 0.5
+
+class LaptopArrays:
+    """Tập laptop dưới dạng cột NumPy + cờ phân loại đã parse sẵn từ chuỗi cpu/gpu/storage"""
+
+    def __init__(self, laptops):
+        laptops = list(laptops)
+        self.size = len(laptops)
+        self.ids = np.array([l.id or 0 for l in laptops], dtype=np.int64)
+        self.price = np.array([l.price for l in laptops], dtype=np.float64)
+        self.ram = np.array([l.ram_gb for l in laptops], dtype=np.float64)
+
+        # Cờ parse từ chuỗi: chỉ làm một lần cho cả tập
+        cpu_upper = [l.cpu.upper() for l in laptops]
+        self.cpu_series = {
+            series: np.array([series in c for c in cpu_upper], dtype=bool)
+            for series in CPU_SERIES
+        }
+        self.gpu_tier = np.array([_gpu_tier(l.gpu) for l in laptops], dtype=np.float64)
+        self.storage_tier = np.array([_storage_tier(l.storage) for l in laptops], dtype=np.float64)
+
+        # Cờ cho điểm hiệu năng theo cấp (phân biệt hoa/thường như bản gốc)
+        self.cpu_has_h = np.array(['H' in l.cpu for l in laptops], dtype=bool)
+        self.cpu_has_p = np.array(['P' in l.cpu for l in laptops], dtype=bool)
+        gpu_lower = [(l.gpu or '').lower() for l in laptops]
+        self.gpu_discrete = np.array([('rtx' in g or 'gtx' in g) for g in gpu_lower], dtype=bool)
+        self.gpu_mid = np.array([('mx' in g or 'iris' in g) for g in gpu_lower], dtype=bool)
+        self.storage_ssd = np.array(['ssd' in l.storage.lower() for l in laptops], dtype=bool)
+
+    def __len__(self):
+        return self.size
+
+def need_scores(arrays, needs=NEEDS):
+    """Điểm cơ bản (priority balanced) cho mọi nhu cầu: ma trận (số laptop x số nhu cầu)"""
+    ram_score = np.minimum(arrays.ram / 32.0, 1.0)
+    price_score = np.maximum(0, 1.0 - (arrays.price / 50000000.0))
+    has_u = arrays.cpu_series["U"]
+
+    result = np.empty((arrays.size, len(needs)), dtype=np.float64)
+    for j, need in enumerate(needs):
+        crit = RECOMMEND_CRITERIA[need]
+        weights = crit["weight"]
+        in_series = np.zeros(arrays.size, dtype=bool)
+        for series in crit.get("cpu_series", []):
+            in_series |= arrays.cpu_series[series]
+        cpu_score = np.where(in_series, 1.0, np.where(has_u, 0.5, 0.0))
+        # Cộng theo đúng thứ tự của calculate_laptop_score để kết quả trùng khớp
+        result[:, j] = (
+            cpu_score * weights.get("cpu", 0.2) +
+            ram_score * weights.get("ram", 0.2) +
+            arrays.gpu_tier * weights.get("gpu", 0.1) +
+            price_score * weights.get("price", 0.3) +
+            arrays.storage_tier * weights.get("storage", 0.1)
+        )
+    return result
+
+def tier_performance_scores(arrays):
+    """Bản vector của điểm hiệu năng theo cấp CPU/RAM/GPU/storage dùng ở /compare"""
+    cpu = np.where(arrays.cpu_has_h, 30, np.where(arrays.cpu_has_p, 20, 10))
+    ram = np.where(arrays.ram >= 16, 25, np.where(arrays.ram >= 8, 15, 5))
+    gpu = np.where(arrays.gpu_discrete, 30, np.where(arrays.gpu_mid, 15, 0))
+    storage = np.where(arrays.storage_ssd, 15, 0)
+    return cpu + ram + gpu + storage
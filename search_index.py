@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chỉ mục full-text SQLite FTS5 cho bảng laptops
+Xếp hạng kết quả bằng BM25 và trả về highlight các từ khớp
+"""
+
+import re
+from collections import namedtuple
+from markupsafe import escape
+from sqlalchemy import DDL, event, text
+from models import db, Laptop
+
+FTS_TABLE = 'laptops_fts'
+
+# Thứ tự cột trong bảng FTS và trọng số BM25 tương ứng
+FTS_COLUMNS = ('name', 'brand', 'category', 'cpu', 'gpu', 'storage')
+BM25_WEIGHTS = (10.0, 5.0, 2.0, 3.0, 3.0, 1.0)
+
+_cols = ', '.join(FTS_COLUMNS)
+_new = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+_old = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+
+# External-content FTS5 table, đồng bộ với laptops qua trigger
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_cols}, content='laptops', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2');",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON laptops BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new}); END;",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON laptops BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) VALUES ('delete', old.id, {_old}); END;",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON laptops BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) VALUES ('delete', old.id, {_old}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new}); END;",
+]
+FTS_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild');"
+FTS_DROP = f"DROP TABLE IF EXISTS {FTS_TABLE};"
+
+# Tạo/xóa bảng FTS cùng lúc với bảng laptops (db.create_all / db.drop_all)
+for _statement in FTS_DDL:
+    event.listen(Laptop.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(Laptop.__table__, 'before_drop', DDL(FTS_DROP).execute_if(dialect='sqlite'))
+
+SearchHit = namedtuple('SearchHit', ['id', 'rank', 'highlights'])
+
+# Ký tự đánh dấu tạm cho highlight, được thay bằng <mark> sau khi escape HTML
+_MARK_OPEN = '\x02'
+_MARK_CLOSE = '\x03'
+
+def init_app(app):
+    """Tạo bảng FTS cho database cũ nếu bảng laptops đã tồn tại mà chưa có index"""
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return
+        with db.engine.begin() as conn:
+            has_laptops = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='laptops'"
+            )).first()
+            has_fts = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"
+            ), {'name': FTS_TABLE}).first()
+            if has_laptops and not has_fts:
+                for statement in FTS_DDL:
+                    conn.execute(text(statement))
+                conn.execute(text(FTS_REBUILD))
+
+def extract_terms(query, min_length=1):
+    """Tách từ khóa từ câu tìm kiếm (giống tokenizer của FTS)"""
+    if not query:
+        return []
+    return [t for t in re.findall(r'\w+', query.lower()) if len(t) >= min_length]
+
+def build_match_query(terms, match_all=False):
+    """Tạo biểu thức MATCH an toàn: mỗi từ được quote và tìm theo prefix"""
+    quoted = ['"' + t.replace('"', '""') + '"*' for t in terms]
+    return (' AND ' if match_all else ' OR ').join(quoted)
+
+def _render_highlight(value):
+    html = str(escape(value))
+    return html.replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+def search(query, match_all=False, limit=None, min_length=1):
+    """Tìm laptop theo full-text, xếp hạng BM25 (tốt nhất trước)
+
+    Trả về list SearchHit, hoặc None nếu câu tìm kiếm không có từ khóa hợp lệ.
+    """
+    terms = extract_terms(query, min_length=min_length)
+    if not terms:
+        return None
+
+    if db.engine.dialect.name != 'sqlite':
+        return _search_like(terms, match_all, limit)
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    highlights = ', '.join(
+        f"highlight({FTS_TABLE}, {i}, :mark_open, :mark_close) AS hl_{column}"
+        for i, column in enumerate(FTS_COLUMNS)
+    )
+    sql = (f"SELECT rowid AS id, bm25({FTS_TABLE}, {weights}) AS rank, {highlights} "
+           f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match ORDER BY rank")
+    params = {
+        'match': build_match_query(terms, match_all),
+        'mark_open': _MARK_OPEN,
+        'mark_close': _MARK_CLOSE
+    }
+    if limit:
+        sql += " LIMIT :limit"
+        params['limit'] = limit
+
+    hits = []
+    for row in db.session.execute(text(sql), params).mappings():
+        row_highlights = {}
+        for column in FTS_COLUMNS:
+            value = row[f'hl_{column}']
+            if value and _MARK_OPEN in value:
+                row_highlights[column] = _render_highlight(value)
+        # bm25() trả về số âm, càng nhỏ càng liên quan
+        hits.append(SearchHit(row['id'], -row['rank'], row_highlights))
+    return hits
+
+def _search_like(terms, match_all, limit):
+    """Fallback cho database không hỗ trợ FTS5: LIKE trên các cột, sắp xếp theo giá"""
+    conditions = [
+        db.or_(*[getattr(Laptop, column).ilike(f'%{term}%') for column in FTS_COLUMNS])
+        for term in terms
+    ]
+    combined = db.and_(*conditions) if match_all else db.or_(*conditions)
+    query = db.session.query(Laptop.id).filter(combined).order_by(Laptop.price.asc())
+    if limit:
+        query = query.limit(limit)
+    return [SearchHit(laptop_id, None, {}) for (laptop_id,) in query.all()]
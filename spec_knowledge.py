@@ -0,0 +1,319 @@
+"""
+Local answers for spec-explanation questions ("RAM là gì", "CPU H và U khác nhau")
+A fixed knowledge base of a few dozen laptop concepts, matched in-process against the
+accent-stripped message; each answer ends with live catalog numbers for the user's scope
+(budget, category, brand), e.g. how many laptops in their budget have 16GB+ RAM.
+Only explain questions that match no topic go on to the model.
+Counters are per process, like the ChatbotService that owns the knowledge base.
+"""
+
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from retrieval_index import normalize
+from laptop_summaries import CATEGORY_LABELS, SHARP_SCREEN_WORDS, is_integrated_gpu
+
+# At most this many topics are combined into one answer ("RAM và SSD là gì")
+MAX_TOPICS = 2
+
+REFRESH_PATTERN = re.compile(r'(\d+)\s*hz')
+STORAGE_PATTERN = re.compile(r'(\d+)\s*(tb|gb)')
+H_SERIES_PATTERN = re.compile(r'\d{4,5}h[sx]?\b')
+U_SERIES_PATTERN = re.compile(r'\d{4,5}u\b')
+
+# ---------- Per-laptop predicates (snapshot, row position) ----------
+def _text(snapshot, column: str, pos: int) -> str:
+    return (snapshot.columns[column][pos] or '').lower()
+
+def _refresh_rate(snapshot, pos: int) -> int:
+    match = REFRESH_PATTERN.search(_text(snapshot, 'screen', pos))
+    return int(match.group(1)) if match else 60
+
+def _storage_gb(snapshot, pos: int) -> int:
+    match = STORAGE_PATTERN.search(_text(snapshot, 'storage', pos))
+    if not match:
+        return 0
+    return int(match.group(1)) * (1024 if match.group(2) == 'tb' else 1)
+
+def _dedicated_gpu(snapshot, pos: int) -> bool:
+    return not is_integrated_gpu(snapshot.columns['gpu'][pos])
+
+def _brand(snapshot, pos: int) -> str:
+    return (snapshot.brand_values[snapshot.brand_codes[pos]] or '').lower()
+
+Stat = Tuple[Callable, str]  # (predicate, Vietnamese phrase completing "N/M laptop ...")
+
+STATS: Dict[str, Stat] = {
+    'ram_16': (lambda s, p: s.ram[p] >= 16, "có RAM từ 16GB trở lên"),
+    'ssd_512': (lambda s, p: 'ssd' in _text(s, 'storage', p) and _storage_gb(s, p) >= 512,
+                "có SSD từ 512GB trở lên"),
+    'emmc': (lambda s, p: 'emmc' in _text(s, 'storage', p), "dùng ổ eMMC"),
+    'dedicated_gpu': (_dedicated_gpu, "có GPU rời"),
+    'refresh_120': (lambda s, p: _refresh_rate(s, p) >= 120, "có màn hình từ 120Hz trở lên"),
+    'sharp_screen': (lambda s, p: any(w in _text(s, 'screen', p) for w in SHARP_SCREEN_WORDS),
+                     "có màn hình độ phân giải cao hơn Full HD"),
+    'oled': (lambda s, p: 'oled' in _text(s, 'screen', p), "dùng màn hình OLED"),
+    'battery_8h': (lambda s, p: (s.columns['battery_life_office'][p] or 0) >= 480,
+                   "dùng văn phòng được từ 8 tiếng trở lên"),
+    'cpu_h': (lambda s, p: bool(H_SERIES_PATTERN.search(_text(s, 'cpu', p))), "dùng CPU dòng H/HS/HX"),
+    'cpu_u': (lambda s, p: bool(U_SERIES_PATTERN.search(_text(s, 'cpu', p))), "dùng CPU dòng U"),
+    'cpu_strong': (lambda s, p: (s.columns['cpu_multi_core_plugged'][p] or 0) >= 7500,
+                   "có CPU đa nhân mạnh (Geekbench từ 7500)"),
+    'intel': (lambda s, p: 'intel' in _text(s, 'cpu', p) or 'core' in _text(s, 'cpu', p)
+              or 'celeron' in _text(s, 'cpu', p), "dùng CPU Intel"),
+    'amd': (lambda s, p: 'ryzen' in _text(s, 'cpu', p) or 'athlon' in _text(s, 'cpu', p), "dùng CPU AMD"),
+    'apple': (lambda s, p: _brand(s, p) == 'apple' or 'apple' in _text(s, 'cpu', p), "là MacBook chip Apple"),
+}
+
+class Topic:
+    """
+    One concept: `patterns` match an explain question, `compare_patterns` match a
+    concept comparison (which classify_intent labels compare, e.g. "SSD hay HDD");
+    `stats` name the STATS entries shown under the answer
+    """
+
+    def __init__(self, key: str, title: str, answer: str, patterns: Sequence[str] = (),
+                 compare_patterns: Sequence[str] = (), stats: Sequence[str] = (),
+                 covers: Sequence[str] = ()):
+        self.key = key
+        self.title = title
+        self.answer = answer
+        self.patterns = [re.compile(p) for p in patterns]
+        self.compare_patterns = [re.compile(p) for p in compare_patterns]
+        self.stats = tuple(stats)
+        # More general topics this one already answers ("chip M2" should not also explain CPUs)
+        self.covers = frozenset(covers)
+
+    def find(self, text: str, comparison: bool = False) -> Optional[int]:
+        """Position of the earliest pattern match in text, or None"""
+        patterns = self.compare_patterns if comparison else self.patterns + self.compare_patterns
+        starts = [match.start() for match in (regex.search(text) for regex in patterns) if match]
+        return min(starts) if starts else None
+
+# Patterns run on normalize()d text (lower case, no Vietnamese accents).
+# Order matters: specific topics come before the generic ones they overlap with.
+TOPICS: List[Topic] = [
+    Topic('cpu_suffix', "CPU dòng H và dòng U khác nhau thế nào?",
+          "Hậu tố cuối tên CPU cho biết mức điện năng và hiệu năng:\n"
+          "• **U** (ví dụ i5-1235U, Ryzen 5 7530U): tiết kiệm điện ~15-28W, máy mỏng nhẹ, pin lâu, "
+          "đủ cho học tập và văn phòng.\n"
+          "• **H / HS / HX** (ví dụ i7-13700H, Ryzen 7 7840HS): 35-55W trở lên, mạnh hơn rõ khi "
+          "render, biên dịch, chơi game; máy nặng hơn, pin ngắn hơn, quạt ồn hơn.\n"
+          "👉 Cần di động và pin: chọn U. Cần hiệu năng bền bỉ (game, đồ họa, lập trình nặng): chọn H.",
+          patterns=[r'hau to', r'\b(cpu|chip|dong)\s+(h|hs|hx|u)\b'],
+          compare_patterns=[r'\b(h|hs|hx)\s*(va|vs|hay|voi|so voi)\s*(dong\s+)?(u|p)\b',
+                            r'\b(u|p)\s*(va|vs|hay|voi|so voi)\s*(dong\s+)?(h|hs|hx)\b'],
+          stats=('cpu_h', 'cpu_u'),
+          covers=('cpu',)),
+    Topic('intel_amd', "Intel hay AMD?",
+          "Cả hai đều tốt ở cùng phân khúc:\n"
+          "• **AMD Ryzen** thường tiết kiệm điện, đa nhân mạnh và GPU tích hợp (Radeon) khá hơn.\n"
+          "• **Intel Core** thường đơn nhân tốt, tương thích phần mềm rộng, có Thunderbolt trên nhiều máy.\n"
+          "👉 Nên so sánh theo đời chip và điểm hiệu năng cụ thể hơn là theo hãng.",
+          compare_patterns=[r'\bintel\b.*\b(amd|ryzen)\b', r'\b(amd|ryzen)\b.*\bintel\b'],
+          stats=('intel', 'amd'),
+          covers=('cpu',)),
+    Topic('cpu_tier', "Core i3 / i5 / i7 (Ryzen 3 / 5 / 7) khác nhau thế nào?",
+          "Số càng lớn thì càng nhiều nhân/luồng và xung cao hơn trong **cùng một đời chip**:\n"
+          "• **i3 / Ryzen 3**: học online, văn phòng nhẹ.\n"
+          "• **i5 / Ryzen 5**: cân bằng, đủ cho đa số người dùng, lập trình, game nhẹ.\n"
+          "• **i7 / Ryzen 7 trở lên**: đồ họa, render, máy ảo, game nặng.\n"
+          "👉 Một chip i5 đời mới có thể mạnh hơn i7 đời cũ, nên xem cả số đời (ví dụ 13xxx) và hậu tố.",
+          compare_patterns=[r'\bi[3579]\b.*\bi[3579]\b', r'ryzen\s*[3579]\b.*\b(ryzen\s*)?[3579]\b'],
+          stats=('cpu_strong',),
+          covers=('cpu',)),
+    Topic('apple_silicon', "Chip Apple M là gì?",
+          "**Apple M1/M2/M3** là chip ARM do Apple tự thiết kế cho MacBook: CPU, GPU và RAM nằm chung "
+          "một con chip (bộ nhớ hợp nhất).\n"
+          "• Ưu điểm: rất tiết kiệm điện (pin 12-18 giờ), mát, mạnh khi chỉnh ảnh/video.\n"
+          "• Lưu ý: RAM không nâng cấp được, chạy macOS nên một số phần mềm/game Windows không hỗ trợ.",
+          patterns=[r'\bchip\s*(apple\s*)?m[1-4]\b', r'\bapple\s*m[1-4]?\b', r'apple silicon'],
+          stats=('apple',),
+          covers=('cpu',)),
+    Topic('vram', "VRAM là gì?",
+          "**VRAM** là bộ nhớ riêng của card đồ họa rời, chứa texture, khung hình và dữ liệu dựng hình.\n"
+          "• 4GB: game eSports, đồ họa 2D.\n"
+          "• 6-8GB: game AAA ở Full HD, dựng video, 3D cơ bản.\n"
+          "• 12GB trở lên: 3D nặng, AI/ML.\n"
+          "👉 GPU tích hợp không có VRAM riêng mà dùng chung RAM hệ thống.",
+          patterns=[r'\bvram\b', r'bo nho (do hoa|card)'],
+          stats=('dedicated_gpu',),
+          covers=('gpu', 'ram')),
+    Topic('emmc', "Ổ eMMC là gì?",
+          "**eMMC** là bộ nhớ flash hàn chết trên bo mạch, thường 64-128GB, gặp ở laptop giá rẻ.\n"
+          "• Chậm hơn SSD NVMe nhiều lần, dung lượng nhỏ, không thay được.\n"
+          "👉 Chỉ hợp với nhu cầu rất nhẹ (web, Office); nếu được hãy chọn máy có SSD.",
+          patterns=[r'\bemmc\b'],
+          stats=('emmc', 'ssd_512'),
+          covers=('ssd',)),
+    Topic('ssd', "SSD là gì?",
+          "**SSD** là ổ lưu trữ bằng chip nhớ flash, không có bộ phận quay như **HDD**:\n"
+          "• Khởi động máy, mở ứng dụng nhanh hơn HDD nhiều lần; bền va đập, êm, mát.\n"
+          "• **NVMe** (cắm khe M.2, chạy PCIe) nhanh hơn SSD SATA vài lần.\n"
+          "• Dung lượng: 256GB đủ dùng cơ bản, 512GB trở lên thoải mái cho game và dữ liệu học tập/làm việc.",
+          patterns=[r'\bssd\b', r'\bnvme\b', r'\bm\.2\b', r'o (cung|luu tru)\b'],
+          compare_patterns=[r'\bssd\b.*\bhdd\b', r'\bhdd\b.*\bssd\b'],
+          stats=('ssd_512',)),
+    Topic('ram', "RAM là gì?",
+          "**RAM** là bộ nhớ tạm mà máy dùng để chạy ứng dụng và các tab đang mở; càng nhiều RAM thì "
+          "càng mở được nhiều thứ cùng lúc mà không giật:\n"
+          "• **8GB**: web, Office, học online.\n"
+          "• **16GB**: lập trình, chơi game, chỉnh ảnh, đa nhiệm nhiều tab - mức nên chọn hiện nay.\n"
+          "• **32GB trở lên**: dựng video, 3D, máy ảo, Docker nhiều container.\n"
+          "👉 Một số máy hàn RAM trên bo mạch, không nâng cấp được về sau.",
+          patterns=[r'\bram\b', r'bo nho (tam|trong)\b', r'\bddr[45]x?\b'],
+          stats=('ram_16',)),
+    Topic('gpu', "GPU (card đồ họa) là gì?",
+          "**GPU** xử lý hình ảnh: chơi game, dựng video, 3D, AI.\n"
+          "• **GPU tích hợp** (Intel Iris Xe, Radeon Graphics, Apple M): nằm chung với CPU, tiết kiệm điện, "
+          "đủ cho học tập, văn phòng, xem phim.\n"
+          "• **GPU rời** (NVIDIA RTX/GTX, RTX A): chip riêng có VRAM riêng, cần cho game và đồ họa nặng; "
+          "máy nặng hơn và pin ngắn hơn.\n"
+          "👉 Số càng lớn trong cùng thế hệ càng mạnh (RTX 4050 < 4060 < 4070).",
+          patterns=[r'\bgpu\b', r'\bvga\b', r'card (do hoa|man hinh|roi)', r'do hoa (roi|tich hop)',
+                    r'\b(rtx|gtx)\b'],
+          compare_patterns=[r'\b(rtx|gtx)\b.*\b(rtx|gtx)\b', r'\broi\b.*tich hop', r'tich hop.*\broi\b'],
+          stats=('dedicated_gpu',)),
+    Topic('refresh_rate', "Tần số quét (Hz) là gì?",
+          "**Tần số quét** là số lần màn hình làm mới hình ảnh mỗi giây:\n"
+          "• **60Hz**: đủ cho văn phòng, học tập, xem phim.\n"
+          "• **120-165Hz**: chuyển động mượt hơn hẳn, cần cho game bắn súng/eSports; cuộn trang cũng dễ chịu hơn.\n"
+          "👉 Tần số cao chỉ phát huy khi GPU đủ mạnh để xuất nhiều khung hình.",
+          patterns=[r'tan so quet', r'\brefresh', r'\b\d+\s*hz\b', r'\bhz\b'],
+          stats=('refresh_120',)),
+    Topic('oled', "Màn hình OLED là gì?",
+          "**OLED** tự phát sáng từng điểm ảnh: màu đen sâu, tương phản rất cao, màu rực, phù hợp xem phim "
+          "và chỉnh ảnh.\n"
+          "• **IPS**: phổ biến, màu tốt, góc nhìn rộng, không lo lưu ảnh (burn-in), thường rẻ hơn.\n"
+          "👉 Làm đồ họa, xem nội dung HDR: OLED. Văn phòng cả ngày với giao diện tĩnh: IPS là đủ.",
+          patterns=[r'\boled\b'],
+          compare_patterns=[r'\boled\b.*\bips\b', r'\bips\b.*\boled\b'],
+          stats=('oled',),
+          covers=('resolution',)),
+    Topic('resolution', "Độ phân giải màn hình (FHD, 2K, 4K) là gì?",
+          "**Độ phân giải** là số điểm ảnh trên màn hình, càng cao chữ và ảnh càng nét:\n"
+          "• **Full HD (1920x1080)**: tiêu chuẩn, đủ cho màn 14-15.6 inch.\n"
+          "• **2K / 2.5K / 2.8K**: nét hơn rõ, dư không gian làm việc, hợp lập trình và thiết kế.\n"
+          "• **4K / Retina**: rất nét, hợp chỉnh ảnh/video; tốn pin hơn.",
+          patterns=[r'do phan giai', r'\bfhd\b', r'full hd', r'\b[2-4](\.\d)?k\b', r'\bqhd\b', r'\bretina\b'],
+          compare_patterns=[r'\b(fhd|full hd|[2-4](\.\d)?k)\b.*\b(fhd|full hd|[2-4](\.\d)?k)\b'],
+          stats=('sharp_screen',)),
+    Topic('battery', "Pin laptop (Wh, thời lượng) nên hiểu thế nào?",
+          "**Dung lượng pin** tính bằng Wh: càng lớn càng dùng lâu, nhưng thời lượng thực tế còn phụ thuộc "
+          "CPU, GPU và màn hình.\n"
+          "• Máy văn phòng chip U / Apple M: thường 8-15 giờ.\n"
+          "• Máy gaming có GPU rời: thường 3-6 giờ, khi chơi game còn ngắn hơn.\n"
+          "👉 Hay di chuyển thì ưu tiên máy pin từ 8 giờ trở lên.",
+          patterns=[r'\bpin\b', r'\bwh\b', r'thoi luong'],
+          stats=('battery_8h',)),
+    Topic('benchmark', "Điểm hiệu năng (Geekbench đơn nhân, đa nhân) là gì?",
+          "**Điểm đơn nhân** đo tốc độ một nhân - quyết định độ nhanh nhạy khi dùng hằng ngày, web, Office.\n"
+          "**Điểm đa nhân** đo tất cả các nhân cùng chạy - quan trọng khi render, biên dịch code, máy ảo.\n"
+          "👉 Điểm GPU cho biết sức mạnh đồ họa khi chơi game và dựng 3D. Điểm càng cao càng mạnh.",
+          patterns=[r'geekbench', r'benchmark', r'diem (cpu|gpu|hieu nang|don nhan|da nhan)',
+                    r'(don|da) nhan', r'single.?core', r'multi.?core'],
+          stats=('cpu_strong',),
+          covers=('cpu',)),
+    Topic('cpu', "CPU là gì?",
+          "**CPU** (vi xử lý) là bộ não của máy, quyết định tốc độ xử lý chung:\n"
+          "• Số **nhân/luồng** nhiều giúp đa nhiệm và render nhanh; **xung nhịp** cao giúp thao tác nhạy.\n"
+          "• Tên chip cho biết phân khúc (i3/i5/i7, Ryzen 3/5/7), đời (ví dụ 13xxx) và hậu tố "
+          "(U tiết kiệm điện, H hiệu năng cao).",
+          patterns=[r'\bcpu\b', r'vi xu ly', r'\bchip\b', r'bo xu ly'],
+          stats=('cpu_strong',)),
+]
+
+def _millions(amount) -> str:
+    return f"{round(amount / 1_000_000, 1):g}"
+
+def scope_label(preferences: Dict) -> str:
+    """Human-readable scope of the catalog statistics ("tầm giá 16-24 triệu, laptop gaming")"""
+    parts = []
+    low, high = preferences.get('budget_min'), preferences.get('budget_max')
+    if low and high:
+        parts.append(f"tầm giá {_millions(low)}-{_millions(high)} triệu")
+    elif high:
+        parts.append(f"tầm giá dưới {_millions(high)} triệu")
+    elif low:
+        parts.append(f"tầm giá trên {_millions(low)} triệu")
+    if preferences.get('category'):
+        parts.append(f"laptop {CATEGORY_LABELS.get(preferences['category'], preferences['category'])}")
+    if preferences.get('brand'):
+        parts.append(f"hãng {preferences['brand']}")
+    return ', '.join(parts)
+
+class SpecKnowledge:
+    """Topic matching, personalized answers and hit/miss counters"""
+
+    def __init__(self, topics: Optional[List[Topic]] = None):
+        self.topics = topics if topics is not None else TOPICS
+        self._lock = threading.Lock()
+        self.counters = {'explain_hits': 0, 'explain_misses': 0, 'compare_hits': 0}
+        self.topic_hits = {topic.key: 0 for topic in self.topics}
+
+    def match(self, message: str, comparison: bool = False) -> List[Topic]:
+        """Topics asked about in the message (at most MAX_TOPICS, in the order they are mentioned)"""
+        text = normalize(message)
+        matched = []
+        covered = set()
+        for topic in self.topics:
+            if topic.key in covered:
+                continue
+            position = topic.find(text, comparison)
+            if position is not None:
+                matched.append((position, topic))
+                covered |= topic.covers
+                if len(matched) == MAX_TOPICS:
+                    break
+        return [topic for _, topic in sorted(matched, key=lambda item: item[0])]
+
+    def record(self, intent: str, topics: List[Topic]) -> None:
+        """Count one explain/compare question (hit when any topic matched)"""
+        with self._lock:
+            if topics:
+                self.counters['compare_hits' if intent == 'compare' else 'explain_hits'] += 1
+                for topic in topics:
+                    self.topic_hits[topic.key] += 1
+            elif intent == 'explain':
+                self.counters['explain_misses'] += 1
+
+    def statistics(self, snapshot, topics: List[Topic], preferences: Dict) -> List[str]:
+        """Catalog numbers for the topics, counted over laptops in the user's scope"""
+        positions = snapshot.filter(
+            brand=preferences.get('brand'),
+            category=preferences.get('category'),
+            price_min=preferences.get('budget_min') or None,
+            price_max=preferences.get('budget_max') or None
+        )
+        scope = scope_label(preferences)
+        where = f"Trong {scope}" if scope else "Trong catalog hiện tại"
+        if not positions:
+            return [f"{where} chưa có laptop nào, bạn thử nới ngân sách hoặc tiêu chí nhé."] if scope else []
+        lines = []
+        seen = set()
+        for topic in topics:
+            for name in topic.stats:
+                if name in seen:
+                    continue
+                seen.add(name)
+                predicate, phrase = STATS[name]
+                count = sum(1 for pos in positions if predicate(snapshot, pos))
+                lines.append(f"{where}, **{count}/{len(positions)}** laptop {phrase}.")
+        return lines
+
+    def answer(self, topics: List[Topic], snapshot, preferences: Dict) -> str:
+        """Markdown answer: one section per topic, then the personalized statistics"""
+        sections = [f"**{topic.title}**\n{topic.answer}" for topic in topics]
+        stats = self.statistics(snapshot, topics, preferences)
+        if stats:
+            sections.append("📊 " + "\n📊 ".join(stats))
+        return "\n\n".join(sections)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            answered = self.counters['explain_hits'] + self.counters['explain_misses']
+            return {
+                **self.counters,
+                "explain_hit_rate": round(self.counters['explain_hits'] / answered, 3) if answered else 0.0,
+                "topics": {key: hits for key, hits in self.topic_hits.items() if hits}
+            }
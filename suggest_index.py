@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chỉ mục prefix trong bộ nhớ cho autocomplete (/api/search_suggest)
+Bỏ dấu tiếng Việt + chữ hoa/thường, cập nhật từng laptop khi catalog thay đổi
+"""
+
+import re
+import time
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from catalog_events import on_catalog_change
+from catalog_snapshot import catalog_store
+
+# Các cột được tách token cho gợi ý
+SUGGEST_COLUMNS = ('name', 'brand', 'cpu', 'gpu')
+
+def fold_text(value):
+    """Bỏ dấu tiếng Việt và chuyển về chữ thường: 'Đồ họa' -> 'do hoa'"""
+    if not value:
+        return ''
+    value = value.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+def tokenize(value):
+    return re.findall(r'\w+', fold_text(value))
+
+class SuggestIndex:
+    """Mảng token đã sắp xếp (token, laptop_id); tìm prefix bằng bisect"""
+
+    def __init__(self, cache_ttl=2.0, cache_size=1024):
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._entries = []
+        self._tokens_by_id = {}
+        self._items = {}
+        self._cache = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.cache_ttl = app.config.get('SEARCH_SUGGEST_CACHE_TTL', self.cache_ttl)
+        self._loaded = False
+        app.extensions['suggest_index'] = self
+        # Đăng ký sau catalog_store để snapshot đã được rebuild khi callback chạy
+        on_catalog_change(self._on_change)
+
+    # ---------- Xây dựng / cập nhật ----------
+    def _load(self):
+        snapshot = catalog_store.get()
+        with self._lock:
+            self._entries = []
+            self._tokens_by_id = {}
+            self._items = {}
+            for laptop_id in snapshot.ids:
+                self._add(snapshot.get(laptop_id))
+            self._entries.sort()
+            self._cache.clear()
+            self._loaded = True
+
+    def _add(self, laptop, keep_sorted=False):
+        tokens = set()
+        for column in SUGGEST_COLUMNS:
+            tokens.update(tokenize(getattr(laptop, column)))
+        self._tokens_by_id[laptop.id] = tokens
+        self._items[laptop.id] = {
+            "id": laptop.id,
+            "name": laptop.name,
+            "brand": laptop.brand,
+            "cpu": laptop.cpu,
+            "image_url": laptop.image_url,
+            "price": laptop.price
+        }
+        for token in tokens:
+            if keep_sorted:
+                insort(self._entries, (token, laptop.id))
+            else:
+                self._entries.append((token, laptop.id))
+
+    def _remove(self, laptop_id):
+        for token in self._tokens_by_id.pop(laptop_id, ()):
+            i = bisect_left(self._entries, (token, laptop_id))
+            if i < len(self._entries) and self._entries[i] == (token, laptop_id):
+                del self._entries[i]
+        self._items.pop(laptop_id, None)
+
+    def _on_change(self, changes):
+        if not self._loaded:
+            return
+        snapshot = catalog_store.get()
+        with self._lock:
+            for laptop_id in changes['delete'] | changes['update']:
+                self._remove(laptop_id)
+            for laptop_id in changes['insert'] | changes['update']:
+                laptop = snapshot.get(laptop_id)
+                if laptop is not None:
+                    self._add(laptop, keep_sorted=True)
+            self._cache.clear()
+
+    # ---------- Truy vấn ----------
+    def _prefix_ids(self, prefix):
+        ids = set()
+        i = bisect_left(self._entries, (prefix,))
+        entries = self._entries
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            ids.add(entries[i][1])
+            i += 1
+        return ids
+
+    def suggest(self, query, limit=5):
+        """Top-k laptop có mọi token trong query khớp prefix, rẻ nhất trước"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        if not self._loaded:
+            self._load()
+
+        key = (' '.join(terms), limit)
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        with self._lock:
+            matched = None
+            for term in terms:
+                ids = self._prefix_ids(term)
+                matched = ids if matched is None else matched & ids
+                if not matched:
+                    break
+            items = sorted((self._items[i] for i in matched or ()),
+                           key=lambda it: (it['price'], it['id']))[:limit]
+
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = (now + self.cache_ttl, items)
+        return items
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra snapshot catalog trong bộ nhớ (catalog_snapshot.py)
+- Lọc/sắp xếp/phân trang trên snapshot cho cùng kết quả với query SQL tương ứng
+- Snapshot vá theo thay đổi (patch) giống hệt snapshot build lại từ đầu
+Chạy: python -m pytest test_catalog_snapshot.py
+"""
+
+import random
+import pytest
+from sqlalchemy import func
+from catalog_snapshot import CatalogSnapshot, COLUMNS, catalog_store
+from models import db, Laptop
+
+# Các trường so sánh giữa hai snapshot
+SNAPSHOT_FIELDS = (
+    'size', 'ids', 'prices', 'ram', 'columns', 'names_lower', 'positions', 'orders',
+    'brand_values', 'brand_codes', 'category_values', 'category_codes', 'brand_index', 'category_index'
+)
+
+SQL_ORDER = {
+    'id': lambda: [Laptop.id],
+    'price_asc': lambda: [Laptop.price, Laptop.id],
+    'price_desc': lambda: [Laptop.price.desc(), Laptop.id],
+    'name_asc': lambda: [func.lower(Laptop.name), Laptop.id],
+    'name_desc': lambda: [func.lower(Laptop.name).desc(), Laptop.id.desc()],
+}
+
+FILTERS = [
+    {},
+    {'brand': 'ASUS'},
+    {'category': 'gaming'},
+    {'price_min': 15000000, 'price_max': 30000000},
+    {'ram_min': 16, 'category': 'gaming'},
+    {'brand': 'Dell', 'ram_min': 16},
+    {'brand': 'Không có'},
+]
+
+def sql_ids(filters, sort):
+    query = Laptop.query
+    if filters.get('brand'):
+        query = query.filter(Laptop.brand == filters['brand'])
+    if filters.get('category'):
+        query = query.filter(Laptop.category == filters['category'])
+    if filters.get('price_min') is not None:
+        query = query.filter(Laptop.price >= filters['price_min'])
+    if filters.get('price_max') is not None:
+        query = query.filter(Laptop.price <= filters['price_max'])
+    if filters.get('ram_min') is not None:
+        query = query.filter(Laptop.ram_gb >= filters['ram_min'])
+    return [laptop.id for laptop in query.order_by(*SQL_ORDER[sort]()).all()]
+
+def assert_same_snapshot(actual, expected):
+    for field in SNAPSHOT_FIELDS:
+        assert getattr(actual, field) == getattr(expected, field), field
+
+def fresh_snapshot():
+    rows = [{c: getattr(laptop, c) for c in COLUMNS} for laptop in Laptop.query.all()]
+    return CatalogSnapshot(rows)
+
+@pytest.mark.parametrize("sort", list(SQL_ORDER))
+@pytest.mark.parametrize("filters", FILTERS)
+def test_query_matches_sql(app, filters, sort):
+    with app.app_context():
+        expected = sql_ids(filters, sort)
+        snapshot = catalog_store.get()
+        assert [snapshot.ids[pos] for pos in snapshot.filter(sort=sort, **filters)] == expected
+
+        page = snapshot.query(page=2, per_page=5, sort=sort, **filters)
+        assert [laptop.id for laptop in page.items] == expected[5:10]
+        assert page.total == len(expected)
+
+def random_row(rng, laptop_id):
+    row = dict.fromkeys(COLUMNS)
+    row.update(
+        id=laptop_id,
+        name=rng.choice(['Laptop', 'ASUS x', 'dell']) + str(rng.randrange(50)),
+        brand=rng.choice('ABCDEFG'),
+        category=rng.choice(['office', 'gaming', None]),
+        price=rng.choice([None, rng.randrange(10 ** 6, 10 ** 8)]),
+        ram_gb=rng.choice([8, 16, None]),
+        cpu=str(rng.random())
+    )
+    return row
+
+@pytest.mark.parametrize("seed", range(3))
+def test_patch_matches_rebuild(seed):
+    rng = random.Random(seed)
+    rows = {i: random_row(rng, i) for i in range(1, 200)}
+    snapshot = CatalogSnapshot(rows.values())
+    next_id = 200
+    for _ in range(100):
+        updated = set(rng.sample(sorted(rows), rng.randrange(0, 4)))
+        deleted = set(rng.sample(sorted(set(rows) - updated), rng.randrange(0, 3)))
+        changed = []
+        for laptop_id in updated:
+            rows[laptop_id] = random_row(rng, laptop_id)
+            changed.append(rows[laptop_id])
+        for laptop_id in deleted:
+            del rows[laptop_id]
+        for _ in range(rng.randrange(0, 3)):
+            rows[next_id] = random_row(rng, next_id)
+            changed.append(rows[next_id])
+            next_id += 1
+
+        before = CatalogSnapshot(snapshot.row(pos).to_dict() for pos in range(snapshot.size))
+        patched = snapshot.patch(changed, deleted)
+        assert_same_snapshot(patched, CatalogSnapshot(rows.values()))
+        # Snapshot cũ vẫn được reader khác dùng: không bị sửa tại chỗ
+        assert_same_snapshot(snapshot, before)
+        snapshot = patched
+
+def test_patch_rejects_insert_below_max_id():
+    rng = random.Random(0)
+    snapshot = CatalogSnapshot([random_row(rng, 1), random_row(rng, 5)])
+    assert snapshot.patch([random_row(rng, 3)]) is None
+
+def test_store_follows_commits(app):
+    with app.app_context():
+        version = catalog_store.get().version
+        laptop = Laptop(name='Test Patch 14', brand='TestBrand', cpu='Core i5-1235U', ram_gb=8,
+                        gpu=None, storage='512GB SSD', screen='14 FHD', price=12345000, category='office')
+        db.session.add(laptop)
+        db.session.commit()
+        try:
+            snapshot = catalog_store.get()
+            assert snapshot.get(laptop.id).name == 'Test Patch 14'
+            assert 'TestBrand' in snapshot.brands
+            assert snapshot.version > version
+            assert_same_snapshot(snapshot, fresh_snapshot())
+
+            laptop.price = 99000000
+            laptop.brand = 'ASUS'
+            db.session.commit()
+            snapshot = catalog_store.get()
+            assert snapshot.get(laptop.id).price == 99000000
+            assert 'TestBrand' not in snapshot.brands
+            assert_same_snapshot(snapshot, fresh_snapshot())
+        finally:
+            db.session.delete(laptop)
+            db.session.commit()
+
+        snapshot = catalog_store.get()
+        assert snapshot.get(laptop.id) is None
+        assert_same_snapshot(snapshot, fresh_snapshot())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra đồng bộ cache giữa các worker (catalog_sync.py)
+Worker khác được giả lập bằng cách sửa bảng laptops bằng SQL thô và ghi dòng catalog_changes
+với origin khác: poll() phải cập nhật snapshot, gợi ý tìm kiếm và facet; dòng của chính
+process bị bỏ qua; nhật ký bị tạo lại (kể cả khi MAX(id) mới vượt vị trí cũ) được đọc lại từ đầu
+Chạy: python -m pytest test_catalog_sync.py
+"""
+
+import pytest
+from sqlalchemy import update, delete, insert
+import catalog_events
+from catalog_snapshot import catalog_store
+from suggest_index import suggest_index
+from facets import facet_index
+from models import db, Laptop, CatalogChange
+
+OTHER_WORKER = 'other-worker'
+
+laptops = Laptop.__table__
+changes = CatalogChange.__table__
+
+@pytest.fixture
+def sync(app):
+    with app.app_context():
+        sync = app.extensions['catalog_sync']
+        poll(sync)
+        yield sync
+
+def poll(sync):
+    sync._next_check = 0
+    sync.poll()
+
+def write(*statements):
+    """Ghi như một worker khác: SQL thô, không qua session nên không phát sự kiện trong process"""
+    with db.engine.begin() as conn:
+        results = [conn.execute(statement) for statement in statements]
+    return results
+
+def logged(laptop_id, op, origin=OTHER_WORKER, **values):
+    return insert(changes).values(laptop_id=laptop_id, op=op, origin=origin, **values)
+
+@pytest.fixture
+def laptop(sync):
+    row = catalog_store.get().row(0)
+    yield row
+    write(update(laptops).where(laptops.c.id == row.id).values(name=row.name, brand=row.brand),
+          logged(row.id, 'update'))
+    poll(sync)
+    assert catalog_store.get().get(row.id).name == row.name
+
+def test_foreign_update_patches_caches(sync, laptop):
+    write(update(laptops).where(laptops.c.id == laptop.id).values(name='Synczen Foreign 14', brand='Syncbrand'))
+    assert catalog_store.get().get(laptop.id).name == laptop.name
+
+    write(logged(laptop.id, 'update'))
+    poll(sync)
+    assert catalog_store.get().get(laptop.id).name == 'Synczen Foreign 14'
+    assert [item['id'] for item in suggest_index.suggest('synczen foreign')] == [laptop.id]
+    assert facet_index.counts()['facets']['brand']['Syncbrand'] == 1
+    assert sync._last_id == catalog_store.get().version
+
+def test_own_changes_skipped(sync, laptop):
+    write(update(laptops).where(laptops.c.id == laptop.id).values(name='Own Worker Name'),
+          logged(laptop.id, 'update', origin=catalog_events.ORIGIN))
+    poll(sync)
+    # Process này đã tự phát sự kiện lúc commit; dòng của chính nó không được phát lại
+    assert catalog_store.get().get(laptop.id).name == laptop.name
+
+def test_foreign_insert_and_delete(sync):
+    result, = write(insert(laptops).values(
+        name='Synced Insert 16', brand='Acer', cpu='Core i5-12450H', ram_gb=16, gpu='RTX 3050',
+        storage='512GB SSD', screen='15.6 FHD 144Hz', price=19000000, category='gaming'))
+    laptop_id = result.inserted_primary_key[0]
+    try:
+        write(logged(laptop_id, 'insert'))
+        poll(sync)
+        assert catalog_store.get().get(laptop_id).name == 'Synced Insert 16'
+    finally:
+        write(delete(laptops).where(laptops.c.id == laptop_id), logged(laptop_id, 'delete'))
+    poll(sync)
+    assert catalog_store.get().get(laptop_id) is None
+
+def test_recreated_log_is_reread(sync, laptop):
+    last_id = sync._last_id
+    assert last_id > 1
+    other = catalog_store.get().row(1)
+    # Nhật ký bị tạo lại và đã có nhiều dòng hơn vị trí cũ: dòng 1 phải được đọc dù id < last_id
+    write(update(laptops).where(laptops.c.id == laptop.id).values(name='Recreated Log Name'),
+          delete(changes),
+          logged(laptop.id, 'update', id=1),
+          logged(other.id, 'update', id=last_id + 1))
+    poll(sync)
+    assert catalog_store.get().get(laptop.id).name == 'Recreated Log Name'
+    assert sync._last_id == last_id + 1
+
+def test_no_changes_no_dispatch(sync, monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(catalog_events, "dispatch", dispatched.append)
+    poll(sync)
+    assert dispatched == []
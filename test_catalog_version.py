@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra ETag/304 theo phiên bản catalog (catalog_version.py)
+- Cùng phiên bản + cùng URL: If-None-Match trả 304, URL có ?v= đúng phiên bản được cache lâu
+- Ghi laptop làm đổi phiên bản: ETag cũ không còn khớp và dữ liệu mới được trả về
+- Trang HTML (có CSRF token) không bao giờ trả 304
+Chạy: python -m pytest test_catalog_version.py
+"""
+
+from sqlalchemy import func
+from catalog_snapshot import CatalogSnapshot, COLUMNS
+from catalog_version import catalog_version
+from models import db, Laptop, CatalogChange
+
+def test_not_modified(client):
+    first = client.get('/api/brands')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'public, no-cache'
+
+    again = client.get('/api/brands', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+
+    # ETag gắn với URL: tham số khác thì không khớp
+    other = client.get('/api/brands?x=1', headers={'If-None-Match': etag})
+    assert other.status_code == 200
+
+def test_versioned_url_is_immutable(client):
+    token = catalog_version.token
+    response = client.get(f'/api/categories?v={token}')
+    assert response.headers['Cache-Control'] == 'public, max-age=3600, immutable'
+    stale = client.get('/api/categories?v=0.00000000')
+    assert stale.headers['Cache-Control'] == 'public, no-cache'
+
+def test_write_changes_etag(app, client):
+    before = client.get('/api/brands')
+    token = catalog_version.token
+    with app.app_context():
+        laptop = Laptop(name='ETag Test 13', brand='EtagBrand', cpu='Core i5-1335U', ram_gb=16,
+                        gpu=None, storage='512GB SSD', screen='13.3 FHD', price=15000000, category='office')
+        db.session.add(laptop)
+        db.session.commit()
+        try:
+            assert catalog_version.token != token
+            after = client.get('/api/brands', headers={'If-None-Match': before.headers['ETag']})
+            assert after.status_code == 200
+            assert after.headers['ETag'] != before.headers['ETag']
+            assert 'EtagBrand' in after.get_json()['brands']
+        finally:
+            db.session.delete(laptop)
+            db.session.commit()
+    assert 'EtagBrand' not in client.get('/api/brands').get_json()['brands']
+
+def test_brands_and_categories_match_database(app, client):
+    with app.app_context():
+        brands = {row[0] for row in db.session.query(Laptop.brand).distinct()}
+        categories = {row[0] for row in db.session.query(Laptop.category).distinct()}
+    assert set(client.get('/api/brands').get_json()['brands']) == brands
+    assert set(client.get('/api/categories').get_json()['categories']) == categories
+
+def test_html_page_has_no_etag(client):
+    laptop_id = client.get('/api/products').get_json()['products'][0]['id']
+    response = client.get(f'/laptop/{laptop_id}')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert client.get(f'/laptop/{laptop_id}', headers={'If-None-Match': '*'}).status_code == 200
+
+def test_token_shared_between_workers(app):
+    """Worker khác build snapshot từ đầu (không qua sự kiện) phải có cùng token"""
+    with app.app_context():
+        version = db.session.query(func.max(CatalogChange.id)).scalar()
+        rows = [{c: getattr(laptop, c) for c in COLUMNS} for laptop in Laptop.query.all()]
+    assert version
+    assert CatalogSnapshot(rows, version).token == catalog_version.token
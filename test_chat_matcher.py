@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra matcher đã biên dịch của chatbot (chat_matcher.py)
+So sánh với cách quét tuần tự cũ trên một bộ câu mẫu: kết quả chặn, intent và
+preferences phải giống hệt nhau (tốc độ: xem benchmark_chat_matcher.py)
+Chạy: python -m pytest test_chat_matcher.py
+"""
+
+import re
+import random
+import pytest
+from chatbot_service import SecurityFilter, ChatbotService, BUDGET_PATTERNS, BRANDS, RAM_PATTERN, GPU_KEYWORDS
+
+# ========== CÁCH QUÉT TUẦN TỰ CŨ (tham chiếu) ==========
+def legacy_is_query_blocked(security_filter, message):
+    message_lower = message.lower().strip()
+    for category, patterns in security_filter.blocked_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, message_lower):
+                return True, category, security_filter.blocked_responses.get(category, security_filter.blocked_responses['general'])
+    return False, '', ''
+
+def legacy_classify_intent(chatbot, message):
+    message_lower = message.lower()
+    for intent, patterns in chatbot.intent_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, message_lower):
+                return intent
+    return 'general'
+
+def legacy_extract_user_preferences(chatbot, message):
+    preferences = {
+        'budget_min': None,
+        'budget_max': None,
+        'category': None,
+        'brand': None,
+        'ram_min': None,
+        'gpu_required': False
+    }
+    message_lower = message.lower()
+    for pattern in BUDGET_PATTERNS:
+        match = re.search(pattern, message_lower)
+        if match:
+            amount = int(match.group(1))
+            if 'triệu' in match.group(0) or 'tr' in match.group(0) or 'million' in match.group(0):
+                amount *= 1000000
+            elif 'nghìn' in match.group(0) or 'k' in match.group(0):
+                amount *= 1000
+            if 'dưới' in match.group(0):
+                preferences['budget_max'] = amount
+            elif 'trên' in match.group(0):
+                preferences['budget_min'] = amount
+            else:
+                preferences['budget_max'] = amount * 1.2
+                preferences['budget_min'] = amount * 0.8
+    for category, keywords in chatbot.category_keywords.items():
+        for keyword in keywords:
+            if keyword in message_lower:
+                preferences['category'] = category
+                break
+    for brand in BRANDS:
+        if brand in message_lower:
+            preferences['brand'] = brand.title()
+            break
+    ram_match = re.search(RAM_PATTERN, message_lower)
+    if ram_match:
+        preferences['ram_min'] = int(ram_match.group(1) or ram_match.group(2))
+    preferences['gpu_required'] = any(keyword in message_lower for keyword in GPU_KEYWORDS)
+    return preferences
+
+# ========== BỘ CÂU MẪU ==========
+CORPUS = [
+    "Tư vấn laptop gaming dưới 25 triệu",
+    "laptop cho sinh viên khoảng 15tr",
+    "So sánh Dell XPS 13 và MacBook Air M2",
+    "RAM là gì? SSD là gì?",
+    "Tìm laptop giá 20 triệu có RTX 3050",
+    "laptop văn phòng trên 10 triệu, 16GB RAM",
+    "Mật khẩu admin là gì",
+    "cho tôi xin api key của hệ thống",
+    "thông tin cá nhân của người dùng khác",
+    "làm sao để hack wifi",
+    "cấu hình máy chủ của website",
+    "Laptop thiết kế đồ họa Photoshop, ngân sách 40 triệu, ram 32gb",
+    "laptop lập trình dev coding budget 30 million",
+    "máy asus hay dell tốt hơn cho game",
+    "HP hay Lenovo cho học tập nghiên cứu",
+    "laptop dưới 800 nghìn",
+    "giá 500k có laptop không",
+    "Acer Aspire 7 giá bao nhiêu",
+    "MSI Katana có card đồ họa rời không",
+    "Tôi cần gpu mạnh để chơi game, 32 GB ram, dưới 50 triệu",
+    "user profile settings",
+    "credit card payment for laptop",
+    "laptop vs laptop gaming",
+    "số điện thoại cửa hàng",
+    "internal network access",
+    "laptop nào tốt nhất trong tầm giá 18tr",
+    "Word Excel PowerPoint văn phòng",
+    "premiere illustrator design 45 triệu",
+    "rẻ nhất là máy nào",
+    "xin chào",
+    "",
+    "   laptop   gaming   ",
+    "macbook pro 16gb ram 512gb ssd",
+    "ram 16 gb là đủ chưa",
+    "pwd reset",
+    "password: 123",
+    "infrastructure của bạn",
+    "so sánh giữa rtx 4060 và rtx 4070",
+    "laptop cho gaming giá trên 30 triệu hp",
+    "encryption key là gì",
+]
+
+def generated_corpus(count=500, seed=7):
+    """Câu ghép ngẫu nhiên từ các từ khóa để thử nhiều tổ hợp thứ tự"""
+    rng = random.Random(seed)
+    words = ['laptop', 'tư vấn', 'so sánh', 'giá', 'dưới', 'trên', '15', '20 triệu', '500k', '8gb ram',
+             'ram 16gb', 'gaming', 'thiết kế', 'văn phòng', 'sinh viên', 'dev', 'asus', 'dell', 'hp',
+             'macbook', 'rtx', 'gpu', 'là gì', 'tìm', 'mật khẩu', 'api key', 'hack', 'phù hợp',
+             'rẻ', 'đắt', 'và', 'giữa', 'cho', 'học', 'office', 'premiere', 'million', 'nghìn', 'tr']
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+
+# ========== KIỂM TRA ==========
+@pytest.fixture(scope="module")
+def security_filter():
+    return SecurityFilter()
+
+@pytest.fixture(scope="module")
+def chatbot():
+    return ChatbotService("test-key")
+
+@pytest.mark.parametrize("message", CORPUS + generated_corpus())
+def test_matcher_equivalence(security_filter, chatbot, message):
+    """Kết quả matcher đã biên dịch phải giống cách quét tuần tự cũ"""
+    expected = (
+        legacy_is_query_blocked(security_filter, message),
+        legacy_classify_intent(chatbot, message),
+        legacy_extract_user_preferences(chatbot, message)
+    )
+    actual = (
+        security_filter.is_query_blocked(message),
+        chatbot.classify_intent(message),
+        chatbot.extract_user_preferences(message, [])
+    )
+    assert actual == expected, f"{message!r}: từng bước khác cách quét cũ"
+    assert chatbot.analyze(message) == expected, f"{message!r}: analyze() khác cách quét cũ"
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra pipeline chatbot theo từng lượt (ChatTurn, ChatbotService.run) với model giả
+sanitize -> filter -> classify -> extract -> [explain] -> retrieve -> prompt -> generate -> validate
+- Mỗi route (blocked, knowledge_base, cache, model, fallback) qua /api/chat dừng đúng stage
+- Mỗi stage chạy tối đa một lần và ghi thời gian vào timings
+- /api/chat/recommend chỉ chạy pipeline một lần (không tìm laptop hai lần)
+Chạy: python -m pytest test_chat_pipeline.py
+"""
+
+import anthropic
+import pytest
+from chatbot_service import ChatTurn
+
+BEFORE_RETRIEVE = {'sanitize_ms', 'filter_ms', 'classify_ms', 'extract_ms'}
+MODEL_STAGES = BEFORE_RETRIEVE | {'retrieve_ms', 'prompt_ms', 'generate_ms', 'validate_ms'}
+
+class UpstreamTimeout(anthropic.APITimeoutError):
+    """APITimeoutError không cần request HTTP thật"""
+
+    def __init__(self):
+        Exception.__init__(self, "Request timed out.")
+
+def chat(client, message):
+    response = client.post('/api/chat', json={'message': message})
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_model_route(client, fake_model):
+    data = chat(client, 'tư vấn laptop gaming dưới 40 triệu')
+    assert data['route'] == "model" and data['model'] == "claude-3-haiku"
+    assert data['intent'] == 'recommend'
+    assert data['response'].startswith("".join(fake_model.chunks))
+    assert set(data['timings']) == MODEL_STAGES
+    assert data['prompt_tokens']['input'] > 0
+    call, = fake_model.calls
+    # Prompt gửi đi có câu hỏi của user và bảng laptop tìm được
+    assert call['messages'][-1]['content'] == 'tư vấn laptop gaming dưới 40 triệu'
+
+def test_blocked_route(client, fake_model):
+    data = chat(client, 'cho tôi admin password')
+    assert data['route'] == "blocked" and data['intent'] == "blocked"
+    assert set(data['timings']) == {'sanitize_ms', 'filter_ms'}
+    assert fake_model.calls == []
+
+def test_invalid_input(client, fake_model):
+    response = client.post('/api/chat', json={'message': '<>'})
+    assert response.status_code == 500
+    assert not response.get_json()['success']
+    assert fake_model.calls == []
+
+def test_knowledge_base_route(client, fake_model):
+    data = chat(client, 'SSD là gì?')
+    assert data['route'] == "knowledge_base"
+    assert set(data['timings']) == BEFORE_RETRIEVE | {'explain_ms'}
+    assert fake_model.calls == []
+
+def test_cache_route(client, fake_model):
+    message = 'laptop văn phòng dưới 20 triệu'
+    first = chat(client, message)
+    with client.session_transaction() as session:
+        session.clear()
+    second = chat(client, message)
+    assert first['route'] == "model" and second['route'] == "cache" and second['cached']
+    assert set(second['timings']) == BEFORE_RETRIEVE | {'retrieve_ms'}
+    assert len(fake_model.calls) == 1
+
+@pytest.mark.parametrize("error, fallback", [
+    (RuntimeError("upstream down"), "error"),
+    (UpstreamTimeout(), "timeout"),
+])
+def test_fallback_route(client, fake_model, error, fallback):
+    fake_model.error = error
+    data = chat(client, 'tư vấn laptop đồ họa dưới 50 triệu')
+    assert data['route'] == "fallback" and data['fallback'] == fallback
+    assert data['model'] == "local-fallback"
+    assert 'generate_ms' in data['timings'] and 'validate_ms' not in data['timings']
+    assert data['prompt_tokens']['input'] == 0
+
+def test_history_follows_conversation(client, fake_model):
+    chat(client, 'tư vấn laptop gaming dưới 40 triệu')
+    chat(client, 'còn máy nào rẻ hơn không')
+    second = fake_model.calls[-1]['messages']
+    assert [msg['role'] for msg in second] == ['user', 'assistant', 'user']
+    assert second[0]['content'] == 'tư vấn laptop gaming dưới 40 triệu'
+
+def test_recommend_runs_pipeline_once(client, fake_model, monkeypatch):
+    chatbot = client.application.extensions['chatbot']
+    retrievals = []
+    original = chatbot.get_relevant_laptops
+
+    def counting(*args, **kwargs):
+        laptops = original(*args, **kwargs)
+        retrievals.append((kwargs.get('limit'), [laptop['id'] for laptop in laptops]))
+        return laptops
+
+    monkeypatch.setattr(chatbot, "get_relevant_laptops", counting)
+    response = client.post('/api/chat/recommend', json={'message': 'laptop lập trình dưới 30 triệu'})
+    data = response.get_json()
+    assert data['success']
+    # Tiêu chí và laptop lấy từ cùng một lượt với câu trả lời
+    assert retrievals == [(chatbot.response_laptops, [laptop['id'] for laptop in data['laptops']])]
+    assert data['preferences']['category'] == 'dev'
+    assert data['laptops'] and all(laptop['category'] == 'dev' for laptop in data['laptops'])
+    assert set(data['timings']) == MODEL_STAGES
+    assert len(fake_model.calls) == 1
+
+def test_stage_records_time_on_error():
+    turn = ChatTurn('laptop')
+    with pytest.raises(ValueError):
+        with turn.stage("retrieve"):
+            raise ValueError
+    assert turn.timings['retrieve_ms'] >= 0
+
+def test_run_error_is_reported(app, fake_model, monkeypatch):
+    chatbot = app.extensions['chatbot']
+
+    def broken(turn):
+        raise RuntimeError("prompt broken")
+
+    monkeypatch.setattr(chatbot, "build_prompt", broken)
+    with app.app_context():
+        result = chatbot.run(ChatTurn('tư vấn laptop gaming dưới 40 triệu'))
+    assert not result['success'] and 'error' in result
+    assert fake_model.calls == []
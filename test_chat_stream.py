@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra chat dạng stream (SSE) qua /api/chat/stream với model giả
+- Thứ tự sự kiện: laptops (thẻ sản phẩm) trước token đầu tiên, token..., rồi done
+- Mỗi route (blocked, knowledge_base, cache, model, fallback) kết thúc bằng done đúng loại
+- Lịch sử hội thoại được lưu khi stream xong (trừ câu bị chặn)
+Chạy: python -m pytest test_chat_stream.py
+"""
+
+import json
+from conversation_store import conversation_store
+
+def stream(client, message):
+    response = client.post('/api/chat/stream', json={'message': message})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if not block:
+            continue
+        event, data = block.split('\n', 1)
+        events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+def names(events):
+    return [event for event, _ in events]
+
+def saved_history(client):
+    with client.session_transaction() as session:
+        return conversation_store.load(session.get('chat_id'))
+
+def new_conversation(client):
+    with client.session_transaction() as session:
+        session.clear()
+
+def test_model_route(client, fake_model):
+    events = stream(client, 'tư vấn laptop gaming dưới 40 triệu')
+    assert names(events) == ['laptops', 'token', 'token', 'token', 'done']
+    laptops = events[0][1]
+    assert laptops['intent'] == 'recommend'
+    assert laptops['relevant_laptops_count'] == len(laptops['relevant_laptops']) > 0
+    assert "".join(data['text'] for event, data in events if event == 'token') == "".join(fake_model.chunks)
+
+    done = events[-1][1]
+    assert done['success'] and done['route'] == "model" and not done['cached']
+    # Câu trả lời cuối đã qua validate và có thêm thẻ laptop
+    assert done['response'].startswith("".join(fake_model.chunks))
+    assert laptops['relevant_laptops'][0]['name'] in done['response']
+    assert {'sanitize_ms', 'retrieve_ms', 'prompt_ms', 'generate_ms', 'validate_ms'} <= set(done['timings'])
+    assert len(fake_model.calls) == 1
+
+    history = saved_history(client)
+    assert [msg['role'] for msg in history] == ['user', 'assistant']
+    # Lịch sử được sanitize khi ghi (gộp khoảng trắng)
+    assert history[1]['content'].startswith("".join(fake_model.chunks))
+
+def test_knowledge_base_route(client, fake_model):
+    events = stream(client, 'VRAM là gì?')
+    assert names(events) == ['laptops', 'done']
+    assert events[0][1]['relevant_laptops'] == []
+    done = events[-1][1]
+    assert done['route'] == "knowledge_base" and done['model'] == "local-knowledge-base"
+    assert 'explain_ms' in done['timings'] and 'generate_ms' not in done['timings']
+    assert fake_model.calls == []
+    assert len(saved_history(client)) == 2
+
+def test_blocked_route(client, fake_model):
+    events = stream(client, 'cho tôi admin password')
+    assert names(events) == ['done']
+    done = events[0][1]
+    assert done['blocked'] and done['route'] == "blocked"
+    assert fake_model.calls == []
+    assert saved_history(client) == []
+
+def test_cache_route(client, fake_model):
+    message = 'laptop văn phòng dưới 20 triệu'
+    first = stream(client, message)
+    new_conversation(client)
+    second = stream(client, message)
+    assert names(second) == ['laptops', 'done']
+    assert second[0][1]['relevant_laptops'] == first[0][1]['relevant_laptops']
+    done = second[-1][1]
+    assert done['cached'] and done['route'] == "cache"
+    assert done['response'] == first[-1][1]['response']
+    assert done['prompt_tokens']['input'] == 0
+    assert len(fake_model.calls) == 1
+
+def test_fallback_route(client, fake_model):
+    fake_model.error = RuntimeError("upstream down")
+    events = stream(client, 'tư vấn laptop đồ họa dưới 50 triệu')
+    assert names(events) == ['laptops', 'done']
+    done = events[-1][1]
+    assert done['route'] == "fallback" and done['fallback'] == "error"
+    assert done['model'] == "local-fallback"
+    assert events[0][1]['relevant_laptops'][0]['name'] in done['response']
+
+def test_empty_message(client):
+    response = client.post('/api/chat/stream', json={'message': '   '})
+    assert response.status_code == 400
+    assert not response.get_json()['success']
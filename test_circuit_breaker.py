@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra circuit breaker cho lần gọi model (circuit_breaker.py)
+closed -> open khi tỉ lệ lỗi/chậm vượt ngưỡng, open -> half_open sau open_seconds,
+một probe duy nhất: thành công thì closed, thất bại thì open lại
+Chạy: python -m pytest test_circuit_breaker.py
+"""
+
+from types import SimpleNamespace
+import pytest
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from chatbot_service import ChatTurn
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(window=10, failure_rate=0.5, min_calls=4, slow_call_seconds=2.0, open_seconds=30.0)
+
+def test_stays_closed_below_threshold(breaker):
+    for success in (True, True, False, True, True, False, True):
+        assert breaker.allow()
+        breaker.record(success, 0.1)
+    assert breaker.state == CLOSED
+
+def test_needs_min_calls(breaker):
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.counters['trips'] == 1
+
+def test_slow_calls_count_as_failures(breaker):
+    for _ in range(4):
+        breaker.record(True, 5.0)
+    assert breaker.state == OPEN
+    assert breaker.counters['slow_calls'] == 4
+    assert breaker.counters['failures'] == 0
+
+def test_open_rejects_until_probe(breaker, clock):
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    assert breaker.reject_if_open()
+    assert not breaker.allow()
+    assert breaker.stats()['open_for_seconds'] == 30.0
+
+    clock.now += 30.0
+    assert not breaker.reject_if_open()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Chỉ một probe được đi trong lúc half-open
+    assert not breaker.allow()
+
+def test_probe_success_closes(breaker, clock):
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 31.0
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.stats()['recent_calls'] == 0
+    assert breaker.allow()
+
+@pytest.mark.parametrize("success, seconds", [(False, 0.1), (True, 5.0)])
+def test_probe_failure_reopens(breaker, clock, success, seconds):
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 31.0
+    assert breaker.allow()
+    breaker.record(success, seconds)
+    assert breaker.state == OPEN
+    assert breaker.counters['trips'] == 2
+    assert breaker.reject_if_open()
+
+def test_open_breaker_uses_local_answer(app, monkeypatch):
+    chatbot = app.extensions['chatbot']
+    monkeypatch.setattr(chatbot, "breaker", CircuitBreaker(min_calls=1))
+    chatbot.breaker.record(False, 0.1)
+    monkeypatch.setattr(chatbot, "_create_within_budget",
+                        lambda turn: pytest.fail("the model must not be called while the breaker is open"))
+    fallbacks = chatbot.fallbacks["open"]
+    with app.app_context():
+        result = chatbot.run(ChatTurn('tư vấn laptop gaming dưới 40 triệu'))
+    assert result["success"]
+    assert result["model"] == "local-fallback"
+    assert result["fallback"] == "open"
+    assert chatbot.fallbacks["open"] == fallbacks + 1
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra lịch sử chat lưu phía server (conversation_store.py)
+Giới hạn số tin nhắn, số byte, luôn bắt đầu bằng lượt user, sanitize khi ghi và hết hạn theo TTL
+Chạy: python -m pytest test_conversation_store.py
+"""
+
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from conversation_store import conversation_store
+from models import db, ChatConversation
+
+@pytest.fixture
+def store(app):
+    return conversation_store
+
+def chat(store, conversation_id, turns, size=10):
+    history = store.load(conversation_id)
+    for i in range(turns):
+        history = store.append_turn(conversation_id, history, f"hỏi {i} " + "x" * size, f"đáp {i} " + "y" * size)
+    return history
+
+def test_round_trip(store):
+    conversation_id = store.new_id()
+    history = chat(store, conversation_id, 2)
+    assert store.load(conversation_id) == history
+    assert [msg["role"] for msg in history] == ["user", "assistant", "user", "assistant"]
+    assert store.load(store.new_id()) == []
+    assert store.load(None) == []
+
+def test_message_cap(store, monkeypatch):
+    monkeypatch.setattr(store, "max_messages", 5)
+    conversation_id = store.new_id()
+    chat(store, conversation_id, 6)
+    history = store.load(conversation_id)
+    # 5 tin mới nhất bắt đầu bằng assistant nên bỏ thêm một tin
+    assert len(history) == 4
+    assert history[0] == {"role": "user", "content": "hỏi 4 " + "x" * 10}
+    assert history[-1]["content"].startswith("đáp 5")
+
+def test_byte_cap(store, monkeypatch):
+    monkeypatch.setattr(store, "max_bytes", 1000)
+    conversation_id = store.new_id()
+    chat(store, conversation_id, 8, size=120)
+    history = store.load(conversation_id)
+    assert history and history[0]["role"] == "user"
+    assert len(json.dumps(history, ensure_ascii=False).encode()) <= 1000
+    assert history[-1]["content"].startswith("đáp 7")
+
+def test_sanitized_on_write(store):
+    conversation_id = store.new_id()
+    history = store.append_turn(conversation_id, [], "<script>alert(1)</script>  laptop   gaming", "ok")
+    assert history[0]["content"] == "scriptalert1/script laptop gaming"
+    # Tin nhắn rỗng sau sanitize không được lưu
+    history = store.append_turn(conversation_id, history, "<>", "đáp")
+    assert [msg["content"] for msg in history][-1] == "đáp"
+    assert len(history) == 3
+
+def test_expiry_and_clear(app, store):
+    expired, active = store.new_id(), store.new_id()
+    chat(store, expired, 1)
+    chat(store, active, 1)
+    table = ChatConversation.__table__
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(update(table).where(table.c.id == expired)
+                         .values(updated_at=datetime.utcnow() - timedelta(seconds=store.ttl + 60)))
+    assert store.load(expired) == []
+    store.prune()
+    with app.app_context():
+        assert db.session.get(ChatConversation, expired) is None
+        assert db.session.get(ChatConversation, active) is not None
+    store.clear(active)
+    assert store.load(active) == []
+
+def test_cookie_keeps_only_id(client, store):
+    # Câu hỏi giải thích thông số được trả lời tại chỗ (spec_knowledge.py), không gọi model
+    response = client.post('/api/chat', json={'message': 'RAM là gì?'})
+    assert response.get_json()['success']
+    with client.session_transaction() as session:
+        assert 'chat_history' not in session
+        chat_id = session['chat_id']
+    assert len(chat_id) == 32
+    assert [msg["role"] for msg in store.load(chat_id)] == ["user", "assistant"]
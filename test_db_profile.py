@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra profile SQLite (db_profile.py)
+- Pragma từ config, WAL và pool đọc chỉ đọc (query_only)
+- RoutingSession: SELECT qua bind 'read'; flush hoặc câu lệnh ghi chuyển sang writer
+  cho tới hết transaction, sau commit/rollback lại đọc qua pool đọc
+Chạy: python -m pytest test_db_profile.py
+"""
+
+import pytest
+from sqlalchemy import event, select, text, update
+from sqlalchemy.exc import OperationalError
+import db_profile
+from db_profile import READ_BIND, connection_pragmas, is_file_sqlite
+from models import db, Laptop
+
+@pytest.fixture
+def engines(app):
+    """Ghi lại engine ('read' hoặc 'writer') chạy từng câu lệnh"""
+    used = []
+    with app.app_context():
+        all_engines = db.engines
+        listeners = []
+        for name, engine in ((READ_BIND, all_engines[READ_BIND]), ('writer', all_engines[None])):
+            def record(conn, cursor, statement, parameters, context, executemany, name=name):
+                used.append(name)
+            event.listen(engine, 'before_cursor_execute', record)
+            listeners.append((engine, record))
+        try:
+            yield used
+        finally:
+            db.session.rollback()
+            for engine, record in listeners:
+                event.remove(engine, 'before_cursor_execute', record)
+
+def test_is_file_sqlite():
+    assert is_file_sqlite('sqlite:////tmp/app.db')
+    assert not is_file_sqlite('sqlite://')
+    assert not is_file_sqlite('sqlite:///:memory:')
+    assert not is_file_sqlite('postgresql://localhost/app')
+
+def test_connection_pragmas():
+    assert connection_pragmas({})['synchronous'] == 'NORMAL'
+    assert connection_pragmas({'SQLITE_SYNCHRONOUS': 'full'})['synchronous'] == 'FULL'
+    with pytest.raises(ValueError):
+        connection_pragmas({'SQLITE_SYNCHRONOUS': 'fast'})
+
+def test_wal_and_read_only_pool(app):
+    with app.app_context():
+        assert READ_BIND in db.engines
+        with db.engines[None].connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar().lower() == 'wal'
+        with db_profile.read_engine().connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+            with pytest.raises(OperationalError):
+                conn.execute(update(Laptop).values(price=0))
+
+def test_select_uses_read_bind(engines):
+    db.session.execute(select(Laptop.id)).all()
+    Laptop.query.first()
+    db.session.execute(text("SELECT COUNT(*) FROM laptops")).scalar()
+    assert engines and set(engines) == {READ_BIND}
+
+def test_flush_switches_to_writer(engines):
+    laptop = db.session.execute(select(Laptop).limit(1)).scalar_one()
+    assert engines == [READ_BIND]
+    laptop.price += 1
+    db.session.flush()
+    assert engines[-1] == 'writer'
+
+    # Đọc tiếp trong cùng transaction phải thấy dữ liệu chưa commit nên đi qua writer
+    del engines[:]
+    assert db.session.execute(select(Laptop.price).where(Laptop.id == laptop.id)).scalar() == laptop.price
+    assert engines == ['writer']
+
+    # Rollback: transaction mới lại đọc qua pool đọc
+    db.session.rollback()
+    del engines[:]
+    db.session.execute(select(Laptop.id)).all()
+    assert engines == [READ_BIND]
+
+def test_write_statement_uses_writer(engines):
+    db.session.execute(text("UPDATE laptops SET price = price WHERE id = 0"))
+    assert engines[-1] == 'writer'
+    del engines[:]
+    db.session.execute(select(Laptop.id)).all()
+    assert engines == ['writer']
+
+def test_read_only_request_never_touches_writer(client, engines):
+    for url in ('/laptops', '/recommend?need=gaming', '/api/products'):
+        assert client.get(url).status_code == 200, url
+    assert engines and 'writer' not in engines
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra đếm facet bằng bitmap (facets.py)
+So với cách đếm trực tiếp từng laptop: mỗi facet được đếm dưới mọi filter trừ chính nó
+Chạy: python -m pytest test_facets.py
+"""
+
+import pytest
+from facets import FACETS
+from models import db, Laptop
+from utils import get_price_category, get_ram_category, get_battery_category
+
+def facet_values(laptop):
+    return {
+        'brand': laptop.brand,
+        'category': laptop.category,
+        'ram_tier': get_ram_category(laptop.ram_gb),
+        'price_bucket': get_price_category(laptop.price),
+        'battery': get_battery_category(laptop.battery_life_office),
+    }
+
+def reference_counts(selected, price_min=None, price_max=None, ram_min=None):
+    """Đếm từng laptop một (cách chậm, dùng làm chuẩn)"""
+    laptops = [facet_values(laptop) | {'price': laptop.price, 'ram': laptop.ram_gb}
+               for laptop in Laptop.query.all()]
+    base = [
+        values for values in laptops
+        if (price_min is None or values['price'] >= price_min)
+        and (price_max is None or values['price'] <= price_max)
+        and (ram_min is None or values['ram'] >= ram_min)
+    ]
+    facets = {}
+    for facet in FACETS:
+        counts = dict.fromkeys((values[facet] for values in laptops), 0)
+        for values in base:
+            if all(values[other] == value for other, value in selected.items() if other != facet):
+                counts[values[facet]] += 1
+        facets[facet] = counts
+    total = sum(all(values[f] == v for f, v in selected.items()) for values in base)
+    return {'total': total, 'facets': facets}
+
+CASES = [
+    ({}, {}),
+    ({'brand': 'ASUS'}, {}),
+    ({'category': 'gaming', 'ram_tier': 'good'}, {}),
+    ({'brand': 'Dell', 'battery': 'good'}, {'price_min': 20000000}),
+    ({'price_bucket': 'premium'}, {'price_max': 30000000, 'ram_min': 16}),
+    ({'brand': 'Không có'}, {}),
+]
+
+@pytest.mark.parametrize("selected, ranges", CASES)
+def test_counts_match_reference(app, client, selected, ranges):
+    args = dict(selected)
+    if 'ram_min' in ranges:
+        args['ram_gb'] = ranges['ram_min']
+    args.update({k: v for k, v in ranges.items() if k != 'ram_min'})
+    data = client.get('/api/facets', query_string=args).get_json()
+    with app.app_context():
+        expected = reference_counts(selected, **ranges)
+    assert data['total'] == expected['total']
+    assert data['facets'] == expected['facets']
+
+def test_counts_follow_writes(app, client):
+    before = client.get('/api/facets?category=gaming').get_json()
+    with app.app_context():
+        laptop = Laptop(name='Facet Test 15', brand='ASUS', cpu='Core i7-13700H', ram_gb=32,
+                        gpu='RTX 4060', storage='1TB SSD', screen='15.6 FHD', price=31000000, category='gaming')
+        db.session.add(laptop)
+        db.session.commit()
+        try:
+            after = client.get('/api/facets?category=gaming').get_json()
+            assert after['total'] == before['total'] + 1
+            assert after['facets']['brand']['ASUS'] == before['facets']['brand']['ASUS'] + 1
+            assert after['facets']['ram_tier']['excellent'] == before['facets']['ram_tier'].get('excellent', 0) + 1
+        finally:
+            db.session.delete(laptop)
+            db.session.commit()
+    assert client.get('/api/facets?category=gaming').get_json() == before
+
+def test_invalid_price_range(client):
+    assert client.get('/api/facets?price_min=30000000&price_max=10000000').status_code == 400
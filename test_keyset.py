@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra phân trang keyset theo (price, id) (keyset.py, CatalogSnapshot.keyset)
+Đi hết các trang bằng next_cursor rồi quay lại bằng prev_cursor phải gặp đúng mọi
+laptop một lần, theo thứ tự giá tăng dần, giống hệt nhau trên SQL và trên snapshot
+Chạy: python -m pytest test_keyset.py
+"""
+
+import re
+import pytest
+from keyset import encode_cursor, decode_cursor, keyset_paginate, InvalidCursor
+from models import Laptop
+
+def expected_ids(brand=None):
+    query = Laptop.query
+    if brand:
+        query = query.filter(Laptop.brand == brand)
+    return [laptop.id for laptop in query.order_by(Laptop.price, Laptop.id).all()]
+
+def walk(fetch):
+    """Các trang (danh sách id) khi đi tới bằng next_cursor rồi lùi lại bằng prev_cursor"""
+    forward = []
+    page = fetch('')
+    forward.append(page['ids'])
+    while page['next_cursor']:
+        page = fetch(page['next_cursor'])
+        forward.append(page['ids'])
+    backward = [page['ids']]
+    while page['prev_cursor']:
+        page = fetch(page['prev_cursor'])
+        backward.append(page['ids'])
+    return forward, backward[::-1]
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('n', 25990000, 17)
+    assert decode_cursor(cursor) == ('n', (25990000, 17))
+    assert decode_cursor('') == (None, None)
+    for bad in ('không-phải-cursor', encode_cursor('n', 1, 2)[:-2], 'eDoxOjI'):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(bad)
+
+@pytest.mark.parametrize("brand", [None, 'ASUS', 'Lenovo'])
+def test_api_products_walk(app, client, brand):
+    with app.app_context():
+        expected = expected_ids(brand)
+
+    def fetch(cursor):
+        query = {'cursor': cursor, 'per_page': 3}
+        if brand:
+            query['brand'] = brand
+        data = client.get('/api/products', query_string=query).get_json()
+        assert data['pagination']['total'] == len(expected)
+        return {
+            'ids': [product['id'] for product in data['products']],
+            'next_cursor': data['pagination']['next_cursor'],
+            'prev_cursor': data['pagination']['prev_cursor']
+        }
+
+    forward, backward = walk(fetch)
+    assert [laptop_id for page in forward for laptop_id in page] == expected
+    assert backward == forward
+
+def test_sql_keyset_matches_snapshot(app, client):
+    with app.app_context():
+        expected = expected_ids()
+
+        def fetch(cursor):
+            page = keyset_paginate(Laptop.query, Laptop, cursor=cursor, per_page=5)
+            return {'ids': [laptop.id for laptop in page.items],
+                    'next_cursor': page.next_cursor, 'prev_cursor': page.prev_cursor}
+
+        forward, backward = walk(fetch)
+    assert [laptop_id for page in forward for laptop_id in page] == expected
+    assert backward == forward
+
+    legacy = client.get('/api/products_legacy', query_string={'cursor': '', 'per_page': 5}).get_json()
+    assert [product['id'] for product in legacy['products']] == forward[0]
+
+def test_invalid_cursor(client):
+    assert client.get('/api/products?cursor=!!').status_code == 400
+    assert client.get('/api/products_legacy?cursor=!!').status_code == 400
+    # Trang HTML quay về trang đầu thay vì lỗi
+    assert client.get('/laptops?cursor=!!').status_code == 200
+
+def test_laptops_page_links(client):
+    """Link Trước/Sau của trang /laptops giữ nguyên tham số lọc"""
+    def links(url):
+        html = client.get(url).get_data(as_text=True).replace('&amp;', '&')
+        return re.findall(r'href="(/laptops\?[^"]*cursor=[^"]*)"', html)
+
+    first = links('/laptops?cursor=&price_min=1000000')
+    assert len(first) == 1 and 'price_min=1000000' in first[0]
+    second = links(first[0])
+    assert len(second) == 1 and 'price_min=1000000' in second[0]
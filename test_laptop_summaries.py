@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra tóm tắt laptop cho prompt chatbot (laptop_summaries.py)
+- Tóm tắt theo luật luôn qua fact_check
+- fact_check bắt số liệu bịa, nhắc laptop khác, markdown, quá dài
+- Tóm tắt chỉ được dùng khi còn khớp thông số hiện tại
+Chạy: python -m pytest test_laptop_summaries.py
+"""
+
+from types import SimpleNamespace
+import pytest
+from laptop_summaries import rule_summary, fact_check, spec_hash, summary_store, MAX_SUMMARY_CHARS
+from catalog_snapshot import LaptopRow, catalog_store
+from catalog_events import mark_updated
+from manage_data import SAMPLE_LAPTOPS, BENCHMARK_DATA
+from models import db, Laptop, LaptopSummary
+
+def sample_laptops():
+    return [LaptopRow(id=i + 1, **data, **BENCHMARK_DATA.get(data['name'], {}))
+            for i, data in enumerate(SAMPLE_LAPTOPS)]
+
+VICTUS = SimpleNamespace(
+    id=1, name='HP Victus 16', brand='HP', cpu='Ryzen 7 7840HS', ram_gb=16, gpu='RTX 4060',
+    storage='512GB SSD', screen='16.1 FHD 144Hz', price=36000000, category='gaming',
+    battery_life_office=450, battery_life_gaming=90, cpu_multi_core_plugged=7200, gpu_score_plugged=9200
+)
+
+@pytest.mark.parametrize("laptop", sample_laptops(), ids=lambda laptop: laptop.name)
+def test_rule_summary_passes_fact_check(laptop):
+    names = [data['name'] for data in SAMPLE_LAPTOPS] + sorted({data['brand'] for data in SAMPLE_LAPTOPS})
+    summary = rule_summary(laptop)
+    assert summary
+    assert fact_check(summary, laptop, names) == []
+
+@pytest.mark.parametrize("text", [
+    "GPU RTX 4060 mạnh, màn 144Hz, giá 36 triệu.",
+    "Giá 36.000.000đ, RAM 16GB, pin ~7.5h.",
+    "Pin khoảng 8h, hợp chơi game.",
+])
+def test_fact_check_accepts_spec_numbers(text):
+    assert fact_check(text, VICTUS, ['Dell', 'MSI Katana 15']) == []
+
+@pytest.mark.parametrize("text, problem", [
+    ("", "rỗng"),
+    ("RAM 32GB, pin 12h.", "số liệu"),
+    ("Mạnh hơn MSI Katana 15 cùng tầm giá.", "nhắc tới"),
+    ("Rẻ hơn máy Dell.", "nhắc tới"),
+    ("**Mạnh:** GPU tốt", "markdown"),
+    ("Mạnh: GPU tốt.\nYếu: pin.", "markdown"),
+    ("Cân bằng. " * 30, "dài"),
+])
+def test_fact_check_rejects(text, problem):
+    problems = fact_check(text, VICTUS, ['Dell', 'MSI Katana 15', 'HP'])
+    assert any(problem in p for p in problems), problems
+
+def test_own_brand_is_allowed():
+    assert fact_check("HP Victus có GPU mạnh.", VICTUS, ['HP', 'Dell']) == []
+
+def test_rule_summary_length():
+    long_name = SimpleNamespace(**dict(vars(VICTUS), screen='16 OLED 4K 165Hz', ram_gb=64, storage='1TB SSD',
+                                       battery_life_office=700, price=9000000))
+    assert len(rule_summary(long_name)) <= MAX_SUMMARY_CHARS
+
+def test_stale_summary_is_ignored(app):
+    with app.app_context():
+        laptop = Laptop.query.first()
+        row = catalog_store.get().get(laptop.id)
+        summary = LaptopSummary(laptop_id=laptop.id, summary=rule_summary(row), spec_hash=spec_hash(row))
+        db.session.add(summary)
+        mark_updated(db.session, [laptop.id])
+        db.session.commit()
+        price = laptop.price
+        try:
+            assert summary_store.get(catalog_store.get().get(laptop.id)) == summary.summary
+
+            # Đổi thông số: tóm tắt cũ không còn được đưa vào prompt
+            laptop.price = price + 1000000
+            db.session.commit()
+            assert summary_store.get(catalog_store.get().get(laptop.id)) is None
+        finally:
+            laptop.price = price
+            db.session.delete(summary)
+            db.session.commit()
+        assert summary_store.get(catalog_store.get().get(laptop.id)) is None
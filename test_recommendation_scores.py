@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra điểm gợi ý tính sẵn (bảng laptop_scores, recommendation.py)
+- Điểm tính khi ghi: thêm laptop hoặc sửa thông số thì dòng điểm được tính lại
+- Tính cả lô (scoring_engine) cho cùng điểm với calculate_laptop_score
+- GET /recommend chỉ đọc; laptop insert ngoài ORM được tính bù bằng refresh_scores
+Chạy: python -m pytest test_recommendation_scores.py
+"""
+
+import pytest
+import recommendation
+from recommendation import RECOMMEND_CRITERIA, calculate_laptop_score, criteria_hash
+from models import db, Laptop, LaptopScore
+
+def expected_scores(laptop):
+    return {need: calculate_laptop_score(laptop, crit, "balanced") for need, crit in RECOMMEND_CRITERIA.items()}
+
+def actual_scores(laptop):
+    return {need: getattr(laptop.score, need) for need in RECOMMEND_CRITERIA}
+
+@pytest.fixture
+def laptop(app):
+    with app.app_context():
+        laptop = Laptop(name='Score Test 14', brand='Acer', cpu='Core i5-1235U', ram_gb=8,
+                        gpu='Intel Iris Xe', storage='512GB SSD', screen='14 FHD', price=15000000, category='office')
+        db.session.add(laptop)
+        db.session.commit()
+        try:
+            yield laptop
+        finally:
+            db.session.rollback()
+            db.session.delete(db.session.get(Laptop, laptop.id))
+            db.session.commit()
+
+def test_scores_computed_on_insert(laptop):
+    assert laptop.score is not None
+    assert laptop.score.criteria_hash == criteria_hash()
+    assert actual_scores(laptop) == pytest.approx(expected_scores(laptop))
+
+def test_scores_recomputed_on_spec_change(laptop):
+    before = actual_scores(laptop)
+    laptop.ram_gb = 32
+    laptop.gpu = 'RTX 4070'
+    laptop.cpu = 'Core i7-13700H'
+    db.session.commit()
+    db.session.expire_all()
+    row = db.session.get(LaptopScore, laptop.id)
+    assert {need: getattr(row, need) for need in RECOMMEND_CRITERIA} == pytest.approx(expected_scores(laptop))
+    assert row.gaming > before['gaming']
+
+def test_batch_matches_scalar(app):
+    with app.app_context():
+        assert recommendation.refresh_scores(force=True) == Laptop.query.count()
+        for laptop in Laptop.query.all():
+            assert actual_scores(laptop) == pytest.approx(expected_scores(laptop), abs=1e-6), laptop.name
+
+def test_recommend_is_read_only(app, client):
+    with app.app_context():
+        result = db.session.execute(Laptop.__table__.insert().values(
+            name='Bulk Import 15', brand='Acer', cpu='Core i5-12450H', ram_gb=16, gpu='RTX 3050',
+            storage='512GB SSD', screen='15.6 FHD 144Hz', price=18000000, category='student'))
+        db.session.commit()
+        laptop_id = result.inserted_primary_key[0]
+        try:
+            scored = LaptopScore.query.count()
+            response = client.get('/recommend?need=student')
+            assert response.status_code == 200
+            assert LaptopScore.query.count() == scored
+
+            # Laptop thêm ngoài ORM được tính bù bằng manage_data.py scores
+            assert recommendation.refresh_scores() == 1
+            assert db.session.get(LaptopScore, laptop_id) is not None
+        finally:
+            db.session.delete(db.session.get(Laptop, laptop_id))
+            db.session.commit()
+
+def test_recommend_orders_by_score(app, client):
+    response = client.get('/recommend?need=gaming')
+    html = response.get_data(as_text=True)
+    with app.app_context():
+        crit = RECOMMEND_CRITERIA['gaming']
+        top = (Laptop.query.join(LaptopScore)
+               .filter(Laptop.ram_gb >= crit['min_ram'], Laptop.price >= crit['min_price'],
+                       ~Laptop.gpu.like('%Intel UHD%'), ~Laptop.gpu.like('%AMD Radeon Graphics%'),
+                       ~Laptop.gpu.like('%Intel Graphics%'))
+               .order_by(LaptopScore.gaming.desc(), Laptop.id.asc()).limit(2).all())
+    assert len(top) == 2
+    assert html.index(top[0].name) < html.index(top[1].name)
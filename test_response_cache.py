@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra cache câu trả lời chatbot (response_cache.py)
+- Hit khi cùng intent, tiêu chí và laptop; miss khi khác tin nhắn hoặc intent
+- Chỉ cache câu hỏi mua máy có tiêu chí: "hi" và "bye" không dùng chung câu trả lời
+- Hết hạn theo TTL, loại bỏ theo LRU, xóa khi catalog thay đổi
+Chạy: python -m pytest test_response_cache.py
+"""
+
+from types import SimpleNamespace
+import pytest
+import response_cache as response_cache_module
+from response_cache import ResponseCache, response_cache
+from circuit_breaker import CircuitBreaker
+from models import db, Laptop
+
+PREFERENCES = {'budget_min': None, 'budget_max': 25000000, 'category': 'gaming', 'brand': None,
+               'ram_min': None, 'gpu_required': False}
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache_module, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+@pytest.fixture
+def model(app, monkeypatch):
+    """Model giả: đếm số lần gọi, trả lời lặp lại tin nhắn của user"""
+    chatbot = app.extensions['chatbot']
+    calls = []
+
+    def create(turn):
+        calls.append(turn.sanitized)
+        return SimpleNamespace(content=[SimpleNamespace(text=f"Trả lời: {turn.sanitized}")])
+
+    monkeypatch.setattr(chatbot, "_create_within_budget", create)
+    monkeypatch.setattr(chatbot, "breaker", CircuitBreaker())
+    response_cache._on_change([])
+    yield calls
+    response_cache._on_change([])
+
+def test_hit_and_miss(clock):
+    cache = ResponseCache()
+    key = cache.make_key('recommend', PREFERENCES, [1, 2, 3], version='v1')
+    assert cache.get(key) is None
+    cache.put(key, {"response": "ok"})
+    assert cache.get(key) == {"response": "ok"}
+    # Bản sao: sửa kết quả trả về không làm hỏng cache
+    cache.get(key)["response"] = "changed"
+    assert cache.get(key) == {"response": "ok"}
+
+    assert cache.get(cache.make_key('search', PREFERENCES, [1, 2, 3], version='v1')) is None
+    assert cache.get(cache.make_key('recommend', PREFERENCES, [1, 2], version='v1')) is None
+    assert cache.get(cache.make_key('recommend', PREFERENCES, [1, 2, 3], version='v2')) is None
+    assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 4
+
+def test_budget_rounding():
+    rounded = dict(PREFERENCES, budget_max=25000000.0)
+    assert ResponseCache.make_key('price', PREFERENCES, [1], 'v1') == ResponseCache.make_key('price', rounded, [1], 'v1')
+
+@pytest.mark.parametrize("intent, preferences, expected", [
+    ('recommend', PREFERENCES, True),
+    ('price', dict(PREFERENCES, category=None, budget_max=None, gpu_required=True), True),
+    ('recommend', dict.fromkeys(PREFERENCES), False),
+    ('general', PREFERENCES, False),
+    ('explain', PREFERENCES, False),
+])
+def test_cacheable(intent, preferences, expected):
+    assert ResponseCache.cacheable(intent, preferences) is expected
+
+def test_ttl(clock):
+    cache = ResponseCache(ttl=60)
+    cache.put('key', {"response": "ok"})
+    clock.now += 59
+    assert cache.get('key') is not None
+    clock.now += 1
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+
+def test_lru_eviction(clock):
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    # 'b' ít được dùng gần đây nhất
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_disabled():
+    cache = ResponseCache(max_entries=0)
+    cache.put('key', 1)
+    assert cache.get('key') is None
+
+def test_first_turn_shopping_question_is_cached(client, model):
+    message = 'tư vấn laptop gaming dưới 25 triệu'
+    first = client.post('/api/chat', json={'message': message}).get_json()
+    with client.session_transaction() as session:
+        session.clear()
+    second = client.post('/api/chat', json={'message': message}).get_json()
+    assert first['route'] == "model" and second['route'] == "cache"
+    assert second['cached'] and second['response'] == first['response']
+    assert second['prompt_tokens']['input'] == 0
+    assert model == [message]
+
+def test_small_talk_not_shared(client, model):
+    replies = []
+    for message in ('hi', 'bye'):
+        with client.session_transaction() as session:
+            session.clear()
+        replies.append(client.post('/api/chat', json={'message': message}).get_json())
+    assert [reply['route'] for reply in replies] == ["model", "model"]
+    assert replies[1]['response'] == "Trả lời: bye"
+    assert model == ['hi', 'bye']
+    assert response_cache.stats()['entries'] == 0
+
+def test_cleared_on_catalog_change(app, client, model):
+    client.post('/api/chat', json={'message': 'laptop gaming dưới 25 triệu'})
+    assert response_cache.stats()['entries'] == 1
+    with app.app_context():
+        laptop = Laptop.query.first()
+        price = laptop.price
+        laptop.price = price + 1000000
+        db.session.commit()
+        try:
+            assert response_cache.stats()['entries'] == 0
+        finally:
+            laptop.price = price
+            db.session.commit()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra chỉ mục n-gram TF-IDF của chatbot (retrieval_index.py)
+- Điểm từ ma trận thưa bằng cosine TF-IDF tính trực tiếp từ bộ đếm n-gram
+- Xếp hạng: tên gõ sai vẫn tìm ra, cùng điểm giữ thứ tự đầu vào
+- Cập nhật theo thay đổi catalog cho cùng điểm với build lại từ đầu
+Chạy: python -m pytest test_retrieval_index.py
+"""
+
+import math
+from types import SimpleNamespace
+import pytest
+from retrieval_index import RetrievalIndex, retrieval_index, laptop_ngrams, ngrams, normalize
+from catalog_snapshot import catalog_store
+from chatbot_service import ChatTurn
+from models import db, Laptop
+
+ROWS = [
+    SimpleNamespace(id=1, name='Lenovo Legion 5', brand='Lenovo', cpu='Ryzen 7 7840HS', gpu='RTX 4060',
+                    storage='1TB SSD', screen='15.6 QHD 165Hz', category='gaming'),
+    SimpleNamespace(id=2, name='Dell XPS 13', brand='Dell', cpu='Core i7-1360P', gpu='Intel Iris Xe',
+                    storage='512GB SSD', screen='13.4 FHD+', category='office'),
+    SimpleNamespace(id=3, name='ASUS TUF Gaming F15', brand='ASUS', cpu='Core i5-12500H', gpu='RTX 3050',
+                    storage='512GB SSD', screen='15.6 FHD 144Hz', category='gaming'),
+    SimpleNamespace(id=4, name='MacBook Air M2', brand='Apple', cpu='Apple M2', gpu=None,
+                    storage='256GB SSD', screen='13.6 Liquid Retina', category='student'),
+]
+
+@pytest.fixture
+def index():
+    index = RetrievalIndex()
+    index._state = RetrievalIndex._build([row.id for row in ROWS], [laptop_ngrams(row) for row in ROWS], {})
+    return index
+
+def reference_scores(grams, query):
+    """Cosine TF-IDF tính trực tiếp từ dict n-gram (không qua ma trận)"""
+    n = len(grams)
+    df = {}
+    for counts in grams:
+        for gram in counts:
+            df[gram] = df.get(gram, 0) + 1
+    idf = {gram: math.log((1 + n) / (1 + count)) + 1 for gram, count in df.items()}
+    q = {gram: count for gram, count in ngrams(query).items() if gram in idf}
+    q_norm = math.sqrt(sum((count * idf[gram]) ** 2 for gram, count in q.items()))
+    scores = []
+    for counts in grams:
+        norm = math.sqrt(sum((count * idf[gram]) ** 2 for gram, count in counts.items())) or 1.0
+        dot = sum(count * idf[gram] * q.get(gram, 0) * idf[gram] for gram, count in counts.items())
+        scores.append(dot / (norm * q_norm) if q_norm else 0.0)
+    return scores
+
+def test_normalize():
+    assert normalize('Đồ Họa') == 'do hoa'
+    assert normalize(None) == ''
+
+@pytest.mark.parametrize("query", ['laptop gaming rtx', 'dell xps', 'macbook cho sinh viên', 'zzz'])
+def test_scores_match_reference(index, query):
+    _, scores = index.scores(query)
+    expected = reference_scores([laptop_ngrams(row) for row in ROWS], query)
+    assert scores.tolist() == pytest.approx(expected, abs=1e-5)
+
+@pytest.mark.parametrize("query, first", [
+    ('legoin', 1),
+    ('dell xps mỏng nhẹ', 2),
+    ('asus tuf', 3),
+    ('macbok air', 4),
+])
+def test_rank_finds_misspelled_names(index, query, first):
+    assert index.rank(query, [1, 2, 3, 4])[0] == first
+
+def test_rank_keeps_input_order_on_ties(index):
+    # Không n-gram nào khớp: mọi điểm bằng 0, giữ nguyên thứ tự (ví dụ giá tăng dần)
+    assert index.rank('zzz', [4, 2, 3, 1]) == [4, 2, 3, 1]
+    assert index.rank('zzz', [4, 2, 3, 1], min_score=0.1) == []
+    assert index.rank('laptop gaming', [4, 2, 3, 1], limit=2) == [3, 1]
+    # Id không có trong chỉ mục xếp sau cùng với điểm 0
+    assert index.rank('legion', [99, 1]) == [1, 99]
+
+def test_updates_match_rebuild(app):
+    def scores_by_id(state_index, query):
+        state, scores = state_index.scores(query)
+        return dict(zip(state.ids, scores.tolist()))
+
+    with app.app_context():
+        laptop = Laptop(name='Zephyrus Retrieval G14', brand='ASUS', cpu='Ryzen 9 7940HS', ram_gb=32,
+                        gpu='RTX 4070', storage='1TB SSD', screen='14 QHD+', price=52000000, category='gaming')
+        db.session.add(laptop)
+        db.session.commit()
+        try:
+            laptop.name = 'Zephyrus Retrieval G16'
+            db.session.commit()
+            snapshot = catalog_store.get()
+            fresh = RetrievalIndex()
+            rows = [snapshot.row(pos) for pos in range(snapshot.size)]
+            fresh._state = RetrievalIndex._build([row.id for row in rows], [laptop_ngrams(row) for row in rows], {})
+            for query in ('zephyrus g16', 'laptop gaming rtx 4070', 'dell'):
+                actual = scores_by_id(retrieval_index, query)
+                assert actual == pytest.approx(scores_by_id(fresh, query), abs=1e-5)
+            assert retrieval_index.rank('zephyrs g16', snapshot.ids.tolist())[0] == laptop.id
+        finally:
+            db.session.delete(laptop)
+            db.session.commit()
+        assert laptop.id not in retrieval_index.get_state().positions
+
+def test_response_size_separate_from_prompt(app):
+    chatbot = app.extensions['chatbot']
+    with app.app_context():
+        turn = ChatTurn('tư vấn laptop dưới 50 triệu')
+        assert chatbot.prepare(turn)
+    assert len(turn.laptops) == chatbot.response_laptops > chatbot.prompt_builder.max_laptops
+    table = turn.prompt["system"][-1]["text"]
+    for laptop in turn.laptops[:chatbot.prompt_builder.max_laptops]:
+        assert f"\n{laptop['id']}|" in table
+    for laptop in turn.laptops[chatbot.prompt_builder.max_laptops:]:
+        assert f"\n{laptop['id']}|" not in table
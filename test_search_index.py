@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra tìm kiếm full-text FTS5 (search_index.py)
+- Trigger giữ bảng FTS khớp bảng laptops khi thêm, sửa, xóa (cả ORM lẫn SQL thô)
+- Xếp hạng BM25: khớp ở tên đứng trước khớp ở cột phụ
+- Highlight được escape HTML, chỉ <mark> là thẻ thật
+- Fallback LIKE cho database không có FTS5 và tìm kiếm của chatbot
+Chạy: python -m pytest test_search_index.py
+"""
+
+import pytest
+from sqlalchemy import update
+import search_index
+from search_index import build_match_query, extract_terms
+from models import db, Laptop
+
+def ids(hits):
+    return [hit.id for hit in hits]
+
+@pytest.fixture
+def laptop(app):
+    with app.app_context():
+        laptop = Laptop(name='Quasarbook <b>Pro</b> & Co', brand='Acer', cpu='Core i7-13700H', ram_gb=16,
+                        gpu='RTX 4060', storage='1TB SSD', screen='16 QHD 165Hz', price=31000000, category='gaming')
+        db.session.add(laptop)
+        db.session.commit()
+        try:
+            yield laptop
+        finally:
+            db.session.rollback()
+            existing = db.session.get(Laptop, laptop.id)
+            if existing is not None:
+                db.session.delete(existing)
+                db.session.commit()
+
+def test_extract_terms_and_match_query():
+    assert extract_terms('Dell  XPS-13', min_length=3) == ['dell', 'xps']
+    assert extract_terms('') == []
+    assert build_match_query(['dell', 'x"s']) == '"dell"* OR "x""s"*'
+    assert build_match_query(['dell', 'xps'], match_all=True) == '"dell"* AND "xps"*'
+
+def test_triggers_follow_orm_writes(laptop):
+    assert ids(search_index.search('quasarbook')) == [laptop.id]
+
+    laptop.name = 'Nebulabook 14'
+    db.session.commit()
+    assert search_index.search('quasarbook') == []
+    assert ids(search_index.search('nebulabook')) == [laptop.id]
+
+    db.session.delete(laptop)
+    db.session.commit()
+    assert search_index.search('nebulabook') == []
+
+def test_triggers_follow_raw_sql(laptop):
+    table = Laptop.__table__
+    db.session.execute(update(table).where(table.c.id == laptop.id).values(gpu='Radeon Pulsarchip'))
+    db.session.commit()
+    assert ids(search_index.search('pulsarchip')) == [laptop.id]
+
+def test_bm25_prefers_name(laptop):
+    other = Laptop(name='Plain Office 14', brand='Acer', cpu='Core i5-1235U', ram_gb=8, gpu='Intel Iris Xe',
+                   storage='512GB Quasarbook SSD', screen='14 FHD', price=12000000, category='office')
+    db.session.add(other)
+    db.session.commit()
+    try:
+        hits = search_index.search('quasarbook')
+        assert ids(hits) == [laptop.id, other.id]
+        assert hits[0].rank > hits[1].rank
+        assert set(hits[0].highlights) == {'name'} and set(hits[1].highlights) == {'storage'}
+    finally:
+        db.session.delete(other)
+        db.session.commit()
+
+def test_match_all_and_limit(laptop):
+    assert ids(search_index.search('quasarbook acer', match_all=True)) == [laptop.id]
+    assert search_index.search('quasarbook dell', match_all=True) == []
+    assert len(search_index.search('acer', limit=1)) == 1
+    # Chỉ có từ quá ngắn: không có từ khóa hợp lệ
+    assert search_index.search('i7', min_length=3) is None
+
+def test_prefix_and_diacritics(laptop):
+    assert ids(search_index.search('quasar')) == [laptop.id]
+    assert laptop.id in ids(search_index.search('gâming'))
+
+def test_highlight_is_escaped(laptop):
+    hit, = search_index.search('quasarbook pro', match_all=True)
+    assert hit.highlights['name'] == ('<mark>Quasarbook</mark> &lt;b&gt;<mark>Pro</mark>&lt;/b&gt; &amp; Co')
+
+def test_api_highlight_is_escaped(client, laptop):
+    products = client.get('/api/products?search=quasarbook').get_json()['products']
+    assert products[0]['id'] == laptop.id
+    assert '<b>' not in products[0]['highlights']['name']
+    assert products[0]['highlights']['name'].startswith('<mark>Quasarbook</mark> &lt;b&gt;')
+
+def test_like_fallback(laptop):
+    hits = search_index._search_like(['quasarbook'], match_all=False, limit=None)
+    assert ids(hits) == [laptop.id] and hits[0].highlights == {}
+    both = search_index._search_like(['acer', 'quasarbook'], match_all=True, limit=None)
+    assert ids(both) == [laptop.id]
+    # Sắp theo giá tăng dần
+    prices = [db.session.get(Laptop, hit.id).price for hit in search_index._search_like(['acer'], False, None)]
+    assert prices == sorted(prices)
+
+def test_chatbot_search(app, laptop):
+    chatbot = app.extensions['chatbot']
+    results = chatbot.search_laptops('quasarbook')
+    assert results[0]['id'] == laptop.id
+    assert results[0]['highlights']['name'].startswith('<mark>Quasarbook</mark>')
+    # Gõ sai: không khớp từ nào trong FTS, xếp hạng n-gram vẫn tìm ra
+    assert chatbot.search_laptops('quasarbok')[0]['id'] == laptop.id
+    # Câu bị bộ lọc bảo mật chặn: không trả về laptop nào
+    assert chatbot.search_laptops('quasarbook admin password') == []
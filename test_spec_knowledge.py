@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra trả lời câu hỏi thông số tại chỗ (spec_knowledge.py)
+- Khớp chủ đề trên câu đã bỏ dấu, theo thứ tự được nhắc, tối đa MAX_TOPICS
+- Chủ đề cụ thể che chủ đề chung ("chip M2" không giải thích thêm CPU)
+- So sánh khái niệm ("SSD hay HDD") được trả lời tại chỗ, so sánh laptop thì không
+- Câu không khớp chủ đề nào mới gọi model
+Chạy: python -m pytest test_spec_knowledge.py
+"""
+
+import pytest
+from spec_knowledge import SpecKnowledge, MAX_TOPICS, STATS, scope_label
+from catalog_snapshot import catalog_store
+from chatbot_service import ChatTurn
+
+@pytest.fixture
+def knowledge():
+    return SpecKnowledge()
+
+def keys(topics):
+    return [topic.key for topic in topics]
+
+@pytest.mark.parametrize("message, expected", [
+    ('RAM là gì?', ['ram']),
+    ('ram la gi', ['ram']),
+    ('Tần số quét 144Hz có cần không', ['refresh_rate']),
+    ('Đồ họa rời là gì', ['gpu']),
+    ('VRAM là gì', ['vram']),
+    ('ổ cứng SSD là gì', ['ssd']),
+    ('eMMC là gì', ['emmc']),
+    ('What is an OLED screen?', ['oled']),
+    ('CPU dòng H là gì', ['cpu_suffix']),
+    ('chip M2 là gì', ['apple_silicon']),
+])
+def test_explain_topics(knowledge, message, expected):
+    assert keys(knowledge.match(message)) == expected
+
+def test_topics_in_mention_order(knowledge):
+    assert keys(knowledge.match('SSD và RAM là gì')) == ['ssd', 'ram']
+    assert keys(knowledge.match('RAM và SSD là gì')) == ['ram', 'ssd']
+    assert len(knowledge.match('RAM, SSD, GPU và pin là gì')) == MAX_TOPICS
+
+@pytest.mark.parametrize("message, expected", [
+    ('SSD hay HDD', ['ssd']),
+    ('H vs U', ['cpu_suffix']),
+    ('Intel hay AMD tốt hơn', ['intel_amd']),
+    ('màn OLED với IPS', ['oled']),
+    ('i5 hay i7', ['cpu_tier']),
+])
+def test_compare_topics(knowledge, message, expected):
+    assert keys(knowledge.match(message, comparison=True)) == expected
+
+def test_compare_needs_compare_pattern(knowledge):
+    # "RAM" chỉ có pattern giải thích: câu so sánh không dùng được
+    assert knowledge.match('RAM 8GB hay 16GB', comparison=True) == []
+
+@pytest.mark.parametrize("message", ['laptop này có tốt không', 'bảo hành bao lâu', ''])
+def test_no_match(knowledge, message):
+    assert knowledge.match(message) == []
+
+def test_counters(knowledge):
+    knowledge.record('explain', knowledge.match('RAM là gì'))
+    knowledge.record('explain', knowledge.match('bảo hành bao lâu'))
+    knowledge.record('compare', knowledge.match('SSD hay HDD', comparison=True))
+    stats = knowledge.stats()
+    assert stats['explain_hits'] == 1 and stats['explain_misses'] == 1 and stats['compare_hits'] == 1
+    assert stats['explain_hit_rate'] == 0.5
+    assert stats['topics'] == {'ram': 1, 'ssd': 1}
+
+def test_scope_label():
+    assert scope_label({'budget_min': 16000000, 'budget_max': 24000000, 'category': None, 'brand': None}) \
+        == "tầm giá 16-24 triệu"
+    assert scope_label({'budget_max': 30000000, 'brand': 'Dell'}) == "tầm giá dưới 30 triệu, hãng Dell"
+    assert scope_label({}) == ""
+
+def test_statistics_count_scope(app, knowledge):
+    preferences = {'budget_max': 30000000}
+    with app.app_context():
+        snapshot = catalog_store.get()
+        positions = snapshot.filter(price_max=30000000)
+        expected = sum(1 for pos in positions if STATS['ram_16'][0](snapshot, pos))
+        lines = knowledge.statistics(snapshot, knowledge.match('RAM là gì'), preferences)
+    assert lines == [f"Trong tầm giá dưới 30 triệu, **{expected}/{len(positions)}** laptop {STATS['ram_16'][1]}."]
+
+def test_empty_scope(app, knowledge):
+    with app.app_context():
+        snapshot = catalog_store.get()
+        lines = knowledge.statistics(snapshot, knowledge.match('RAM là gì'), {'budget_max': 1000})
+    assert len(lines) == 1 and "chưa có laptop nào" in lines[0]
+
+def test_local_answer_skips_model(client, monkeypatch):
+    chatbot = client.application.extensions['chatbot']
+    monkeypatch.setattr(chatbot, "_create_within_budget",
+                        lambda turn: pytest.fail("spec questions must be answered locally"))
+    response = client.post('/api/chat', json={'message': 'SSD và RAM là gì?'})
+    data = response.get_json()
+    assert data['success']
+    assert data['route'] == "knowledge_base"
+    assert data['model'] == "local-knowledge-base"
+    assert data['response'].index("**SSD là gì?**") < data['response'].index("**RAM là gì?**")
+
+def test_unmatched_goes_to_model(app):
+    chatbot = app.extensions['chatbot']
+    with app.app_context():
+        turn = ChatTurn('Thunderbolt 4 là gì?')
+        assert chatbot.prepare(turn)
+        assert turn.intent == 'explain'
+        assert turn.route != "knowledge_base"
+
+        # So sánh hai hãng laptop không phải câu hỏi khái niệm
+        turn = ChatTurn('so sánh Dell và HP')
+        assert chatbot.prepare(turn)
+        assert turn.intent == 'compare'
+        assert turn.route != "knowledge_base"
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra giới hạn và gộp lần gọi model (upstream_gate.py)
+- Slot có hạn, hàng đợi có hạn: vượt quá thì UpstreamBusy ngay, chờ quá lâu cũng UpstreamBusy
+- Prompt giống nhau đang chạy dùng chung một lần gọi; người chờ chiếm chỗ trong hàng đợi
+  và bỏ cuộc sau thời gian tối đa của lần gọi đầu
+- Stream chỉ giữ slot trong lúc gọi model
+Chạy: python -m pytest test_upstream_gate.py
+"""
+
+import threading
+import time
+import pytest
+from upstream_gate import UpstreamGate, UpstreamBusy
+from chatbot_service import ChatTurn
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def test_queue_limit_and_timeout():
+    gate = UpstreamGate(max_concurrent=1, max_queue=1, queue_timeout=0.2)
+    gate.acquire()
+    errors = []
+
+    def queued():
+        try:
+            gate.acquire()
+            gate.release()
+        except UpstreamBusy as e:
+            errors.append(e)
+
+    waiter = start(queued)
+    wait_until(lambda: gate.waiting == 1)
+    # Hàng đợi đã đầy: từ chối ngay
+    with pytest.raises(UpstreamBusy) as busy:
+        gate.acquire()
+    assert busy.value.retry_after == gate.retry_after
+    waiter.join()
+    assert len(errors) == 1
+    assert gate.counters['rejected'] == 1 and gate.counters['timed_out'] == 1
+
+    gate.release()
+    gate.acquire()
+    gate.release()
+    assert gate.stats()['active'] == 0 and gate.stats()['waiting'] == 0
+
+def test_identical_calls_coalesce():
+    gate = UpstreamGate(max_concurrent=2, max_queue=8)
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(2)
+        return 'answer'
+
+    threads = [start(lambda: results.append(gate.call('prompt', upstream))) for _ in range(5)]
+    wait_until(lambda: gate.counters['coalesced'] == 4)
+    assert gate.waiting == 4
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['answer'] * 5
+    assert len(calls) == 1
+    assert gate.stats()['in_flight_prompts'] == 0 and gate.waiting == 0
+
+def test_followers_share_errors():
+    gate = UpstreamGate()
+    release = threading.Event()
+    errors = []
+
+    def upstream():
+        release.wait(2)
+        raise RuntimeError('upstream down')
+
+    def caller():
+        try:
+            gate.call('prompt', upstream)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [start(caller) for _ in range(3)]
+    wait_until(lambda: gate.counters['coalesced'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3 and len({id(e) for e in errors}) == 1
+
+def test_followers_bounded_by_queue_and_timeout():
+    gate = UpstreamGate(max_concurrent=1, max_queue=1, queue_timeout=0.05, call_timeout=0.1)
+    release = threading.Event()
+    leader = start(lambda: gate.call('prompt', lambda: release.wait(2)))
+    wait_until(lambda: gate.active == 1)
+
+    outcomes = []
+
+    def follower():
+        started = time.monotonic()
+        try:
+            gate.call('prompt', lambda: None)
+        except UpstreamBusy:
+            outcomes.append(time.monotonic() - started)
+
+    first = start(follower)
+    wait_until(lambda: gate.waiting == 1)
+    # Người chờ thứ hai không còn chỗ trong hàng đợi
+    with pytest.raises(UpstreamBusy):
+        gate.call('prompt', lambda: None)
+    first.join()
+    # Bỏ cuộc sau queue_timeout + call_timeout thay vì chờ leader mãi
+    assert len(outcomes) == 1 and outcomes[0] < 1.0
+    assert gate.counters['timed_out'] == 1 and gate.counters['rejected'] == 1
+    release.set()
+    leader.join()
+    assert gate.waiting == 0 and gate.active == 0
+
+def test_stream_holds_slot_only_for_model_call(app, monkeypatch):
+    chatbot = app.extensions['chatbot']
+    gate = UpstreamGate(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(chatbot, "gate", gate)
+    seen = []
+
+    def fake_stream(turn):
+        seen.append(gate.active)
+        yield "token", {"text": "ok"}
+        chatbot.validate(turn, "ok")
+
+    monkeypatch.setattr(chatbot, "_stream_generate", fake_stream)
+    with app.app_context():
+        # Câu trả lời tại chỗ không lấy slot
+        events = list(chatbot.stream(ChatTurn('RAM là gì?')))
+        assert gate.counters['admitted'] == 0
+        assert events[-1][1]["route"] == "knowledge_base"
+
+        events = list(chatbot.stream(ChatTurn('tư vấn laptop gaming dưới 30 triệu')))
+        assert seen == [1] and gate.active == 0
+        assert events[-1][1]["route"] == "model"
+
+        # Gate đầy: header đã gửi nên trả lời bằng danh sách laptop thay vì 503
+        gate.acquire()
+        try:
+            events = list(chatbot.stream(ChatTurn('tư vấn laptop văn phòng dưới 20 triệu')))
+        finally:
+            gate.release()
+    assert events[-1][1]["fallback"] == "busy"
+    assert events[-1][1]["model"] == "local-fallback"
+    assert seen == [1]
@@ -0,0 +1,135 @@
+"""
+Admission control for upstream model calls
+A bounded semaphore caps how many worker threads wait on the model at once; a short
+wait queue absorbs bursts, and anything beyond it is rejected immediately (the app
+answers 503 with Retry-After) so chat traffic cannot tie up every worker thread.
+Identical in-flight prompts share one upstream call (singleflight); their waiters take
+queue places too and give up after the leader's worst-case time.
+State is per process, like the ChatbotService that owns it.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+class UpstreamBusy(Exception):
+    """No upstream slot within the queue limits; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Upstream busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class UpstreamGate:
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 16,
+                 queue_timeout: float = 5.0, retry_after: int = 2, call_timeout: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Upper bound of one upstream call (the caller's latency budget)
+        self.call_timeout = call_timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        self.active = 0
+        self.waiting = 0
+        self.counters = {'admitted': 0, 'queued': 0, 'coalesced': 0, 'rejected': 0, 'timed_out': 0}
+        self.peak_active = 0
+        self.peak_waiting = 0
+
+    # ---------- Slots ----------
+    def _enqueue(self) -> None:
+        """Take a queue place (caller holds the lock); raises UpstreamBusy when the queue is full"""
+        if self.waiting >= self.max_queue:
+            self.counters['rejected'] += 1
+            raise UpstreamBusy(self.retry_after)
+        self.waiting += 1
+        self.counters['queued'] += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+    def acquire(self) -> None:
+        """Take a slot, waiting in the queue if needed; raises UpstreamBusy instead of waiting too long"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._enqueue()
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self.counters['timed_out'] += 1
+                raise UpstreamBusy(self.retry_after)
+        with self._lock:
+            self.active += 1
+            self.counters['admitted'] += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+    # ---------- Singleflight ----------
+    def call(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn() in a slot, unless a call with the same key is already in flight:
+        then wait for it (in a queue place, at most as long as the leader can take)
+        and share its result (or its exception, including UpstreamBusy)
+        """
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+            else:
+                self._enqueue()
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            try:
+                finished = call.done.wait(self.queue_timeout + self.call_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not finished:
+                with self._lock:
+                    self.counters['timed_out'] += 1
+                raise UpstreamBusy(self.retry_after)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            self.acquire()
+            try:
+                call.result = fn()
+            finally:
+                self.release()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "waiting": self.waiting,
+                "in_flight_prompts": len(self._inflight),
+                "peak_active": self.peak_active,
+                "peak_waiting": self.peak_waiting,
+                **self.counters
+            }